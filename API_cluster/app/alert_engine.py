@@ -0,0 +1,383 @@
+# app/alert_engine.py
+import os
+import time
+import asyncio
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extras
+
+from app.db import get_pool, run_db
+from app.queries import label_param
+from app.notifications import get_dispatcher
+from app.metrics import ALERT_FIRINGS
+from app.logger_config import setup_logger
+
+# Configurar el logger
+logger = setup_logger(__name__)
+
+# Filtros opcionales de una regla y la columna de objects a la que se aplican
+RULE_FILTERS = ("color", "proximity", "video_name")
+
+RULE_COLUMNS = ("id", "name", "object_name", "color", "proximity", "video_name", "min_count", "enabled")
+
+
+def build_rule_filter(rule, alias):
+    """
+    Construye la condición WHERE de una regla sobre la tabla objects.
+
+    Args:
+        rule: Diccionario con los campos de la regla
+        alias: Alias de la tabla objects en la consulta
+
+    Returns:
+        Tupla (sql, parámetros)
+    """
+    conditions = [f"{alias}.object_name = {label_param('object_name')}"]
+    params = [rule["object_name"]]
+    for column in RULE_FILTERS:
+        if rule[column]:
+            conditions.append(f"{alias}.{column} = {label_param(column)}")
+            params.append(rule[column])
+    return " AND ".join(conditions), params
+
+
+def create_rule(rule):
+    """
+    Registra una regla de alerta persistente.
+
+    Si `backfill` es False la regla empieza en la marca de agua actual y solo
+    evalúa las filas que se ingieran a partir de ahora.
+
+    Args:
+        rule: Modelo AlertRule
+
+    Returns:
+        Diccionario con la regla creada
+
+    Raises:
+        ValueError: Si ya existe una regla con el mismo nombre
+    """
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            try:
+                cursor.execute(
+                    """
+                    INSERT INTO alert_rules (name, object_name, color, proximity, video_name, min_count, enabled)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                    """,
+                    (rule.name, rule.object_name, rule.color, rule.proximity, rule.video_name,
+                     rule.min_count, rule.enabled)
+                )
+            except psycopg2.errors.UniqueViolation:
+                raise ValueError(f"Ya existe una regla con el nombre {rule.name}")
+            rule_id = cursor.fetchone()[0]
+
+            watermark = 0
+            if not rule.backfill:
+                cursor.execute("SELECT COALESCE(MAX(ingest_id), 0) FROM objects")
+                watermark = cursor.fetchone()[0]
+            cursor.execute(
+                "INSERT INTO alert_rule_state (rule_id, watermark) VALUES (%s, %s)",
+                (rule_id, watermark)
+            )
+        conn.commit()
+    logger.info("Regla de alerta %s creada con id %d (marca de agua %d)", rule.name, rule_id, watermark)
+    return {"id": rule_id, **rule.dict(), "watermark": watermark}
+
+
+def list_rules():
+    """
+    Devuelve todas las reglas registradas.
+
+    Returns:
+        Lista de diccionarios con los campos de cada regla
+    """
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT {', '.join(RULE_COLUMNS)} FROM alert_rules ORDER BY id")
+            return [dict(zip(RULE_COLUMNS, row)) for row in cursor.fetchall()]
+
+
+def delete_rule(rule_id):
+    """
+    Elimina una regla y su estado.
+
+    Returns:
+        True si la regla existía
+    """
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM alert_rules WHERE id = %s", (rule_id,))
+            deleted = cursor.rowcount > 0
+        conn.commit()
+    return deleted
+
+
+def get_rule_status(rule_id):
+    """
+    Devuelve el estado de ejecución de una regla.
+
+    Args:
+        rule_id: Identificador de la regla
+
+    Returns:
+        Diccionario con la última ejecución, filas leídas y latencia, o None si no existe
+    """
+    columns = ("id", "name", "enabled", "watermark", "last_run", "last_rows_scanned", "last_latency_ms",
+               "last_fired", "last_error", "runs", "total_rows_scanned", "total_fired")
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT r.id, r.name, r.enabled, s.watermark, s.last_run, s.last_rows_scanned,
+                       s.last_latency_ms, s.last_fired, s.last_error, s.runs,
+                       s.total_rows_scanned, s.total_fired
+                FROM alert_rules r JOIN alert_rule_state s ON s.rule_id = r.id
+                WHERE r.id = %s
+                """,
+                (rule_id,)
+            )
+            row = cursor.fetchone()
+    return dict(zip(columns, row)) if row else None
+
+
+def list_enabled_rule_ids():
+    """Devuelve los ids de las reglas activas."""
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM alert_rules WHERE enabled ORDER BY id")
+            return [row[0] for row in cursor.fetchall()]
+
+
+def evaluate_rule(rule_id):
+    """
+    Evalúa una regla solo sobre las filas de objects ingeridas desde su marca de agua.
+
+    Primero se buscan los (video_name, sec) tocados por las filas nuevas que
+    cumplen la regla y después se cuentan todas las filas de esos grupos, así
+    que el coste depende de los datos nuevos y no del tamaño de la tabla.
+    Los grupos que ya se notificaron quedan en alert_rule_firings y no se repiten.
+
+    Una transacción de ingesta que aún no ha confirmado puede tener ids menores
+    que el máximo visible. Por eso la marca de agua solo avanza hasta donde
+    ninguna transacción en curso puede añadir filas: hasta el máximo leído si
+    no hay ninguna en curso, o hasta el máximo de la ejecución anterior cuando
+    ya terminaron todas las transacciones que estaban en curso entonces
+    (pg_snapshot_xmin). Mientras tanto solo se vuelve a leer ese tramo. Si no
+    hay filas por encima de la marca de agua la regla no se evalúa.
+
+    Args:
+        rule_id: Identificador de la regla
+
+    Returns:
+        Diccionario con el nombre de la regla, filas leídas y nuevas activaciones,
+        o None si la regla no está activa o la evalúa otro proceso
+    """
+    start = time.perf_counter()
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            # Instantánea y máximo visible en la misma sentencia, antes de
+            # bloquear nada para que la propia transacción no cuente como en curso
+            cursor.execute(
+                """
+                SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint,
+                       pg_snapshot_xmax(pg_current_snapshot())::text::bigint,
+                       (SELECT COALESCE(MAX(ingest_id), 0) FROM objects),
+                       (SELECT watermark FROM alert_rule_state WHERE rule_id = %s)
+                """,
+                (rule_id,)
+            )
+            snapshot_xmin, snapshot_xmax, high, current = cursor.fetchone()
+            if current is not None and high <= current:
+                conn.rollback()
+                return None
+
+            # Bloquear el estado de la regla; otro worker que la esté evaluando la salta
+            cursor.execute(
+                f"""
+                SELECT {', '.join('r.' + column for column in RULE_COLUMNS)},
+                       s.watermark, s.scanned_to, s.scanned_xmax
+                FROM alert_rules r JOIN alert_rule_state s ON s.rule_id = r.id
+                WHERE r.id = %s AND r.enabled
+                FOR UPDATE OF s SKIP LOCKED
+                """,
+                (rule_id,)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                conn.rollback()
+                return None
+            rule = dict(zip(RULE_COLUMNS, row))
+            watermark, scanned_to, scanned_xmax = row[-3:]
+            high = max(high, watermark)
+
+            # Tramo que se lee: todo lo posterior a la marca de agua, que ya es definitiva
+            scan_from = watermark
+            if snapshot_xmin == snapshot_xmax:
+                # Ninguna transacción en curso: todo lo visible es definitivo
+                new_watermark = high
+            elif scanned_xmax is not None and snapshot_xmin >= scanned_xmax:
+                # Terminaron las transacciones en curso en la ejecución anterior
+                new_watermark = max(watermark, scanned_to)
+            else:
+                new_watermark = watermark
+
+            cursor.execute(
+                "SELECT COUNT(*) FROM objects WHERE ingest_id > %s AND ingest_id <= %s",
+                (scan_from, high)
+            )
+            rows_scanned = cursor.fetchone()[0]
+
+            fired = []
+            if rows_scanned:
+                new_filter, new_params = build_rule_filter(rule, "n")
+                all_filter, all_params = build_rule_filter(rule, "o")
+                cursor.execute(
+                    f"""
+                    WITH touched AS (
+                        SELECT DISTINCT n.video_name, n.sec FROM objects n
+                        WHERE n.ingest_id > %s AND n.ingest_id <= %s AND {new_filter}
+                    )
+                    SELECT o.video_name, o.sec, COUNT(*) AS object_count
+                    FROM objects o JOIN touched t ON o.video_name = t.video_name AND o.sec = t.sec
+                    WHERE {all_filter}
+                    GROUP BY o.video_name, o.sec
+                    HAVING COUNT(*) >= %s
+                    """,
+                    [scan_from, high] + new_params + all_params + [rule["min_count"]]
+                )
+                candidates = cursor.fetchall()
+                if candidates:
+                    fired = psycopg2.extras.execute_values(
+                        cursor,
+                        """
+                        INSERT INTO alert_rule_firings (rule_id, video_name, sec, object_count)
+                        VALUES %s ON CONFLICT DO NOTHING
+                        RETURNING video_name, sec, object_count
+                        """,
+                        [(rule_id, video_name, sec, count) for video_name, sec, count in candidates],
+                        fetch=True
+                    )
+
+            latency_ms = (time.perf_counter() - start) * 1000
+            cursor.execute(
+                """
+                UPDATE alert_rule_state SET
+                    watermark = %s, scanned_to = %s, scanned_xmax = %s,
+                    last_run = now(), last_rows_scanned = %s,
+                    last_latency_ms = %s, last_fired = %s, last_error = NULL,
+                    runs = runs + 1,
+                    total_rows_scanned = total_rows_scanned + %s,
+                    total_fired = total_fired + %s
+                WHERE rule_id = %s
+                """,
+                (new_watermark, high, snapshot_xmax, rows_scanned, latency_ms, len(fired),
+                 rows_scanned, len(fired), rule_id)
+            )
+        conn.commit()
+
+    logger.info("Regla %s evaluada: %d filas leídas, %d activaciones, %.2f ms",
+                rule["name"], rows_scanned, len(fired), latency_ms)
+    return {
+        "name": rule["name"],
+        "rows_scanned": rows_scanned,
+        "fired": [{"video_name": v, "sec": s, "object_count": c} for v, s, c in fired],
+    }
+
+
+def record_rule_error(rule_id, error):
+    """Guarda el último error de evaluación de una regla."""
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "UPDATE alert_rule_state SET last_run = now(), last_error = %s WHERE rule_id = %s",
+                (str(error), rule_id)
+            )
+        conn.commit()
+
+
+class AlertRuleScheduler:
+    """
+    Evalúa periódicamente todas las reglas activas en segundo plano y encola
+    las nuevas activaciones en la cola de envío de correos.
+    """
+
+    def __init__(self, interval=10.0, concurrency=5):
+        """
+        Args:
+            interval: Segundos entre evaluaciones
+            concurrency: Número máximo de reglas evaluadas a la vez
+        """
+        self.interval = interval
+        self.concurrency = concurrency
+        self._task = None
+
+    async def _evaluate(self, semaphore, rule_id):
+        async with semaphore:
+            try:
+                result = await run_db(evaluate_rule, rule_id)
+            except Exception as e:
+                logger.error("Error al evaluar la regla %s: %s", rule_id, e)
+                try:
+                    await run_db(record_rule_error, rule_id, e)
+                except Exception:
+                    pass
+                return
+        if result and result["fired"]:
+            ALERT_FIRINGS.inc(("rule",))
+            get_dispatcher().submit(result["name"], result["fired"])
+
+    async def run_once(self):
+        """Evalúa todas las reglas activas una vez."""
+        rule_ids = await run_db(list_enabled_rule_ids)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._evaluate(semaphore, rule_id) for rule_id in rule_ids))
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Error en el planificador de reglas de alerta: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Arranca el planificador en el event loop actual."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Detiene el planificador."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Planificador global de reglas
+_scheduler = None
+
+
+async def start_rule_scheduler():
+    """Crea y arranca el planificador global si ALERT_RULES_ENABLED es true."""
+    global _scheduler
+    if os.environ.get("ALERT_RULES_ENABLED", "true").lower() != "true":
+        return
+    _scheduler = AlertRuleScheduler(
+        interval=float(os.environ.get("ALERT_RULE_INTERVAL", "10")),
+        concurrency=int(os.environ.get("ALERT_CONCURRENCY", "5")),
+    )
+    _scheduler.start()
+
+
+async def stop_rule_scheduler():
+    """Detiene el planificador global."""
+    global _scheduler
+    if _scheduler is not None:
+        await _scheduler.stop()
+        _scheduler = None
@@ -1,8 +1,15 @@
-from fastapi import APIRouter
-from app.models import ObjectDetection, FrameCharacteristics, Alert
-from app.services import start_frame_processing, execute_alerts
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from app.models import ObjectDetection, FrameCharacteristics, Alert, AlertRule, FrameDetections
+from app.services import (start_frame_processing, execute_alerts, stream_frame_results, fetch_frame_page,
+                          process_frame_batch)
+from app.queries import build_frame_query
+from app.alert_engine import create_rule, list_rules, delete_rule, get_rule_status
+from app.ingest import get_ingest_buffer, BufferFull, BatchTooLarge
 from app.logger_config import setup_logger 
+from app.db import run_db
 from typing import List
+import time
 
 # Configurar el logger con el nombre del archivo actual
 logger = setup_logger(__name__)
@@ -13,15 +20,67 @@ router = APIRouter()
 @router.post("/receive_characteristics")
 async def receive_frame(frame: FrameCharacteristics):
     """Recibe las características de un frame de video. Se tiene que clasificar
-    segun el tipo (1,2,3)"""
+    segun el tipo (1 a 8)"""
     
-    logger.info(f"Recibiendo video: {frame.video_name}")
-    logger.info(f"Datos completos del video: {frame.dict()}")
+    logger.debug("Recibiendo consulta tipo %s: %s", frame.type, frame, extra={"sample": "request"})
     
-    result = start_frame_processing(frame)
+    # La consulta bloqueante (y la codificación JSON) se ejecuta en el ejecutor de base de datos
+    body = await run_db(start_frame_processing, frame)
         
     #return {"message": "El procesamiento del frame está en marcha", "task_id": task_id}
-    return result
+    return Response(body, media_type="application/json")
+
+@router.post("/receive_characteristics/stream")
+async def receive_frame_stream(frame: FrameCharacteristics):
+    """Devuelve los resultados de la consulta como NDJSON (una fila JSON por línea)
+    leyendo la base de datos por bloques con un cursor del lado del servidor."""
+    
+    start = time.perf_counter()
+    query = build_frame_query(frame)
+    if query is None:
+        raise HTTPException(status_code=400, detail="Tipo de consulta no válido")
+    phases = {"validation": time.perf_counter() - start}
+    
+    logger.info("Streaming de resultados para: %s", query)
+    return StreamingResponse(stream_frame_results(frame, query, phases), media_type="application/x-ndjson")
+
+@router.post("/receive_characteristics/page")
+async def receive_frame_page(frame: FrameCharacteristics,
+                             limit: int = Query(100, ge=1, le=10000),
+                             cursor: str = None):
+    """Devuelve una página de resultados ordenada por (video_name, sec) y el
+    cursor opaco para pedir la siguiente página."""
+    
+    try:
+        body = await run_db(fetch_frame_page, frame, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(body, media_type="application/json")
+
+@router.post("/receive_characteristics/batch")
+async def receive_frame_batch(frames: List[FrameCharacteristics]):
+    """Recibe varias consultas en una sola solicitud y devuelve sus resultados
+    en el mismo orden. Las consultas repetidas se ejecutan una sola vez."""
+    
+    logger.info("Recibiendo lote de %d consultas", len(frames))
+    return Response(await run_db(process_frame_batch, frames), media_type="application/json")
+
+@router.post("/ingest/detections")
+async def ingest_detections(frames: List[FrameDetections]):
+    """Recibe las detecciones por frame de los nodos detectores. Las filas se
+    acumulan en memoria y se escriben en lotes con COPY; si el buffer está
+    lleno se responde 503 para que el nodo reintente más tarde, y si la
+    solicitud no cabe en el buffer, 413 para que la divida."""
+    
+    try:
+        accepted = await get_ingest_buffer().add(frames)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except BatchTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except BufferFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return {"accepted_rows": accepted}
 
 @router.post("/execute_alerts")
 async def execute_alerts_endpoint(alerts: List[Alert]):
@@ -30,6 +89,43 @@ async def execute_alerts_endpoint(alerts: List[Alert]):
     """
     return await execute_alerts(alerts)
 
+@router.post("/alert_rules")
+async def create_alert_rule(rule: AlertRule):
+    """
+    Registra una regla de alerta persistente que se evalúa de forma continua
+    solo sobre los datos ingeridos desde su última ejecución.
+    """
+    try:
+        return await run_db(create_rule, rule)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.get("/alert_rules")
+async def list_alert_rules():
+    """
+    Lista las reglas de alerta registradas.
+    """
+    return await run_db(list_rules)
+
+@router.get("/alert_rules/{rule_id}/status")
+async def alert_rule_status(rule_id: int):
+    """
+    Estado de una regla: última ejecución, filas leídas, latencia y activaciones.
+    """
+    status = await run_db(get_rule_status, rule_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Regla no encontrada")
+    return status
+
+@router.delete("/alert_rules/{rule_id}")
+async def delete_alert_rule(rule_id: int):
+    """
+    Elimina una regla de alerta y su estado.
+    """
+    if not await run_db(delete_rule, rule_id):
+        raise HTTPException(status_code=404, detail="Regla no encontrada")
+    return {"message": "Regla eliminada"}
+
 # Ruta para consultar el estado de la tarea de procesamiento de un frame
 # @router.post("/task_status/{task_id}")
 # async def frame_status(task_id: str):
@@ -0,0 +1,236 @@
+# app/cache.py
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import psycopg2
+
+from app.db import get_pool, PoolTimeout
+from app.logger_config import setup_logger
+
+# Configurar el logger
+logger = setup_logger(__name__)
+
+
+def parse_ttls(value):
+    """
+    Convierte una cadena "1:300,2:60,3:60" en un diccionario {tipo: segundos}.
+
+    Args:
+        value: Cadena con pares tipo:segundos separados por comas
+
+    Returns:
+        Diccionario con el TTL de cada tipo de consulta
+    """
+    ttls = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        query_type, seconds = item.split(":")
+        ttls[int(query_type)] = float(seconds)
+    return ttls
+
+
+class ResultCache:
+    """
+    Caché LRU en memoria para los resultados de /receive_characteristics.
+
+    La memoria está acotada por número de entradas y por número total de filas.
+    Cada tipo de consulta tiene su propio TTL y toda la caché se invalida cuando
+    cambia la versión de datos de PostgreSQL.
+    """
+
+    def __init__(self, max_entries=256, max_rows=200000, ttls=None, default_ttl=60.0,
+                 version_check_interval=1.0):
+        """
+        Args:
+            max_entries: Número máximo de entradas
+            max_rows: Número máximo de filas sumando todas las entradas
+            ttls: Diccionario {tipo: segundos} con el TTL de cada tipo de consulta
+            default_ttl: TTL para los tipos que no aparecen en `ttls`
+            version_check_interval: Segundos entre comprobaciones de la versión de datos
+        """
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.version_check_interval = version_check_interval
+
+        self._entries = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._version_checked_at = 0.0
+
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._stale_puts = 0
+
+    def _remove(self, key):
+        _, _, value = self._entries.pop(key)
+        self._rows -= len(value)
+
+    def get(self, key):
+        """
+        Busca un resultado en la caché.
+
+        Args:
+            key: Clave normalizada de la consulta
+
+        Returns:
+            Resultado almacenado o None si no existe o ha caducado
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, _, value = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                self._expired += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    @property
+    def data_version(self):
+        """Versión de datos con la que se comprobó la caché por última vez."""
+        with self._lock:
+            return self._data_version
+
+    def put(self, key, query_type, value, version=None):
+        """
+        Guarda un resultado, expulsando las entradas menos usadas si hace falta.
+
+        Una consulta puede empezar antes de una invalidación y terminar después:
+        su resultado se descarta si la versión de datos leída antes de
+        ejecutarla (`version`) ya no es la actual.
+
+        Args:
+            key: Clave normalizada de la consulta
+            query_type: Tipo de consulta (para elegir el TTL)
+            value: Lista de resultados
+            version: Valor de `data_version` antes de ejecutar la consulta
+        """
+        size = len(value)
+        if size > self.max_rows:
+            return
+        ttl = self.ttls.get(query_type, self.default_ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if version is not None and version != self._data_version:
+                self._stale_puts += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and (len(self._entries) >= self.max_entries
+                                     or self._rows + size > self.max_rows):
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._rows -= len(evicted)
+                self._evictions += 1
+            self._entries[key] = (time.monotonic() + ttl, query_type, value)
+            self._rows += size
+
+    def invalidate(self):
+        """Vacía la caché."""
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+            self._invalidations += 1
+
+    def check_data_version(self, read_version):
+        """
+        Comprueba la versión de datos como máximo una vez por intervalo y
+        vacía la caché si ha cambiado.
+
+        Args:
+            read_version: Función que devuelve la versión actual de los datos (o None)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._version_checked_at < self.version_check_interval:
+                return
+            self._version_checked_at = now
+
+        version = read_version()
+        if version is None:
+            return
+        with self._lock:
+            changed = self._data_version is not None and version != self._data_version
+            self._data_version = version
+        if changed:
+            logger.info("Versión de datos cambiada a %s: invalidando caché", version)
+            self.invalidate()
+
+    def stats(self):
+        """
+        Devuelve las métricas de la caché.
+
+        Returns:
+            Diccionario con aciertos, fallos, expulsiones y ocupación
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "rows": self._rows,
+                "max_entries": self.max_entries,
+                "max_rows": self.max_rows,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "stale_puts": self._stale_puts,
+                "data_version": self._data_version,
+            }
+
+
+def read_data_version():
+    """
+    Lee la versión de datos de PostgreSQL. La secuencia data_version_seq
+    avanza con cada sentencia que modifica objects, scenarios o features.
+
+    Returns:
+        Versión actual o None si no se puede leer
+    """
+    try:
+        with get_pool().connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT last_value FROM data_version_seq")
+                return cursor.fetchone()[0]
+    except (PoolTimeout, psycopg2.Error) as e:
+        logger.warning("No se pudo leer la versión de datos: %s", e)
+        return None
+
+
+# Caché global de resultados
+_result_cache = None
+
+
+def get_result_cache():
+    """
+    Devuelve la caché global, creándola con la configuración de variables de entorno.
+
+    Returns:
+        ResultCache o None si la caché está desactivada
+    """
+    global _result_cache
+    if os.environ.get("CACHE_ENABLED", "true").lower() != "true":
+        return None
+    if _result_cache is None:
+        _result_cache = ResultCache(
+            max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", "256")),
+            max_rows=int(os.environ.get("CACHE_MAX_ROWS", "200000")),
+            ttls=parse_ttls(os.environ.get("CACHE_TTLS", "1:300,2:60,3:60")),
+            default_ttl=float(os.environ.get("CACHE_DEFAULT_TTL", "60")),
+            version_check_interval=float(os.environ.get("CACHE_VERSION_CHECK_INTERVAL", "1")),
+        )
+    return _result_cache
@@ -0,0 +1,468 @@
+# app/columnar.py
+import os
+import time
+import asyncio
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él el motor columnar queda desactivado
+    np = None
+
+from app.db import get_pool, run_db
+from app.cache import read_data_version
+from app.logger_config import setup_logger
+
+# Configurar el logger
+logger = setup_logger(__name__)
+
+# Filas leídas por lote del cursor de servidor al cargar columnas
+FETCH_BATCH_SIZE = 50000
+
+# Bytes por fila de objects en memoria: cinco columnas int32 e ingest_id int64
+OBJECT_ROW_BYTES = 5 * 4 + 8
+
+OBJECT_COLUMNS = ("object", "video", "color", "proximity", "sec", "ingest_id")
+
+# Tipos de consulta que el motor resuelve en memoria; el resto va a SQL
+COLUMNAR_TYPES = (1, 2, 3)
+
+# Valor de sec que representa NULL (los segundos negativos son valores válidos)
+NULL_SEC = -2**31
+
+
+class Dictionary:
+    """
+    Codificación de cadenas como enteros int32 (None se codifica como -1).
+    Solo crece: los códigos asignados no cambian, así que las consultas
+    pueden leerlo mientras otra carga añade valores.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, values):
+        """Devuelve un array int32 con el código de cada valor, asignando códigos nuevos."""
+        codes = self.codes
+        out = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if value is None:
+                out[i] = -1
+                continue
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values)
+                self.values.append(value)
+            out[i] = code
+        return out
+
+    def lookup(self, value):
+        """Devuelve el código de un valor o None si no existe."""
+        return self.codes.get(value)
+
+    def decode(self, codes):
+        """Devuelve la lista de valores de un array de códigos."""
+        values = self.values
+        return [values[code] if code >= 0 else None for code in codes.tolist()]
+
+
+class ColumnarSnapshot:
+    """
+    Copia en memoria de las columnas de objects y scenarios que usan las
+    consultas tipo 1, 2 y 3.
+
+    Las filas de objects cargadas en la carga completa están ordenadas por
+    object_name, con `offsets` indicando dónde empieza cada uno, así que una
+    consulta solo recorre las filas de su object_name. Las filas añadidas por
+    refrescos incrementales se guardan aparte (`delta`) sin ordenar hasta que
+    se vuelven a mezclar con la parte ordenada.
+
+    `watermark` es el ingest_id hasta el que no puede aparecer ninguna fila
+    más; `scanned_to` y `scanned_xmax` son el máximo leído y el xmax de la
+    instantánea de la última lectura, con los que se decide cuándo avanzarla.
+    """
+
+    def __init__(self, dictionaries, scenarios, base, delta, table_oid, data_version, rewrite_version,
+                 watermark, scanned_to, scanned_xmax):
+        self.dictionaries = dictionaries
+        self.scenarios = scenarios
+        self.base = base
+        self.delta = delta
+        self.table_oid = table_oid
+        self.data_version = data_version
+        self.rewrite_version = rewrite_version
+        self.watermark = watermark
+        self.scanned_to = scanned_to
+        self.scanned_xmax = scanned_xmax
+        self.offsets = np.searchsorted(
+            base["object"], np.arange(len(dictionaries["object"].values) + 1), side="left"
+        )
+        self.loaded_at = time.monotonic()
+
+    @property
+    def rows(self):
+        return len(self.base["object"]) + len(self.delta["object"])
+
+    @property
+    def nbytes(self):
+        arrays = list(self.base.values()) + list(self.delta.values()) + list(self.scenarios.values())
+        return sum(array.nbytes for array in arrays) + self.offsets.nbytes
+
+    def _object_rows(self, code):
+        """Columnas de las filas de un object_name: su tramo ordenado más las filas del delta."""
+        if code + 1 < len(self.offsets):
+            start, end = self.offsets[code], self.offsets[code + 1]
+        else:
+            start = end = 0
+        mask = self.delta["object"] == code
+        if not mask.any():
+            return {name: column[start:end] for name, column in self.base.items()}
+        return {
+            name: np.concatenate((self.base[name][start:end], self.delta[name][mask]))
+            for name in self.base
+        }
+
+    def query(self, frame):
+        """
+        Resuelve un FrameCharacteristics con el mismo resultado que la consulta SQL.
+
+        Returns:
+            Lista de tuplas con el formato de las filas de PostgreSQL
+        """
+        videos = self.dictionaries["video"]
+
+        if frame.type == 1:
+            code = self.dictionaries["environment"].lookup(frame.environment_type)
+            if code is None:
+                return []
+            return [(video,) for video in videos.decode(
+                self.scenarios["video"][self.scenarios["environment"] == code])]
+
+        code = self.dictionaries["object"].lookup(frame.object_name)
+        if code is None:
+            return []
+        rows = self._object_rows(code)
+
+        if frame.type == 2:
+            mask = np.ones(len(rows["object"]), dtype=bool)
+            for column, value in (("color", frame.color), ("proximity", frame.proximity)):
+                if value:
+                    value_code = self.dictionaries[column].lookup(value)
+                    if value_code is None:
+                        return []
+                    mask &= rows[column] == value_code
+            secs = [None if sec == NULL_SEC else sec for sec in rows["sec"][mask].tolist()]
+            return list(zip(videos.decode(rows["video"][mask]), secs))
+
+        # Tipo 3: conteo por (video_name, sec) codificando el par en un único entero
+        valid = (rows["video"] >= 0) & (rows["sec"] != NULL_SEC)
+        video, sec = rows["video"][valid].astype(np.int64), rows["sec"][valid].astype(np.int64)
+        if not len(video):
+            return []
+        low = int(sec.min())
+        stride = int(sec.max()) - low + 1
+        keys, counts = np.unique(video * stride + (sec - low), return_counts=True)
+        order = np.argsort(-counts, kind="stable")
+        keys, counts = keys[order], counts[order]
+        return list(zip(videos.decode(keys // stride), (keys % stride + low).tolist(), counts.tolist()))
+
+
+class ColumnarEngine:
+    """
+    Motor de consultas en memoria para los tipos 1, 2 y 3.
+
+    Carga las columnas necesarias de objects y scenarios en arrays de NumPy
+    con las cadenas codificadas como enteros y resuelve las consultas con
+    máscaras y agrupaciones vectorizadas, sin ir a la base de datos. Un worker
+    en segundo plano comprueba la versión de datos y trae solo las filas de
+    objects con ingest_id mayor que la marca de agua; si la tabla se sustituyó
+    (recarga o particionado), cambió por algo distinto de un añadido (UPDATE,
+    DELETE o retención, que avanzan data_rewrite_seq) o pasa
+    `full_refresh_interval`, la recarga entera. Si los
+    datos no caben en `memory_budget_mb` el motor se desactiva y las
+    consultas vuelven a SQL. Los resultados pueden ir hasta un intervalo de
+    refresco por detrás de PostgreSQL.
+
+    La marca de agua avanza igual que la de las reglas de alerta
+    (alert_engine.evaluate_rule): una transacción de ingesta que aún no ha
+    confirmado puede tener ids menores que el máximo visible, así que solo
+    avanza hasta donde ninguna transacción en curso puede añadir filas.
+    Mientras quede un tramo pendiente se refresca en cada intervalo aunque la
+    versión de datos no cambie, porque la versión avanza antes de la
+    confirmación.
+    """
+
+    def __init__(self, memory_budget_mb=256, refresh_interval=5.0, full_refresh_interval=600.0,
+                 merge_ratio=0.1):
+        """
+        Args:
+            memory_budget_mb: Memoria máxima de los arrays en MB
+            refresh_interval: Segundos entre comprobaciones de la versión de datos
+            full_refresh_interval: Segundos máximos entre cargas completas
+            merge_ratio: Proporción del delta respecto a la parte ordenada a partir de la que se mezclan
+        """
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.refresh_interval = refresh_interval
+        self.full_refresh_interval = full_refresh_interval
+        self.merge_ratio = merge_ratio
+        self.snapshot = None
+        self.disabled_reason = None
+        self._disabled_at = 0.0
+        self._task = None
+
+        self.stats = {
+            "queries": 0,
+            "full_loads": 0,
+            "incremental_loads": 0,
+            "rows_loaded": 0,
+            "last_refresh_ms": 0.0,
+        }
+
+    def query(self, frame):
+        """
+        Resuelve un FrameCharacteristics en memoria.
+
+        Returns:
+            Lista de filas o None si el motor no tiene datos cargados o no resuelve ese tipo
+        """
+        snapshot = self.snapshot
+        if snapshot is None or frame.type not in COLUMNAR_TYPES:
+            return None
+        self.stats["queries"] += 1
+        return snapshot.query(frame)
+
+    def _fetch_objects(self, conn, dictionaries, after):
+        """Lee con un cursor de servidor las filas de objects con ingest_id mayor que `after`."""
+        chunks = {name: [] for name in OBJECT_COLUMNS}
+        with conn.cursor(name="columnar_objects") as cursor:
+            cursor.itersize = FETCH_BATCH_SIZE
+            cursor.execute(
+                """
+                SELECT object_name::text, video_name::text, color::text, proximity::text, sec, ingest_id
+                FROM objects WHERE ingest_id > %s
+                """,
+                (after,)
+            )
+            while True:
+                rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+                if not rows:
+                    break
+                object_names, video_names, colors, proximities, secs, ingest_ids = zip(*rows)
+                chunks["object"].append(dictionaries["object"].encode(object_names))
+                chunks["video"].append(dictionaries["video"].encode(video_names))
+                chunks["color"].append(dictionaries["color"].encode(colors))
+                chunks["proximity"].append(dictionaries["proximity"].encode(proximities))
+                chunks["sec"].append(np.array([NULL_SEC if s is None else s for s in secs], dtype=np.int32))
+                chunks["ingest_id"].append(np.array(ingest_ids, dtype=np.int64))
+        conn.rollback()
+        return {
+            name: np.concatenate(parts) if parts else np.empty(0, dtype=np.int64 if name == "ingest_id" else np.int32)
+            for name, parts in chunks.items()
+        }
+
+    def _fetch_scenarios(self, conn, dictionaries):
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT environment_type::text, video_name::text FROM scenarios")
+            rows = cursor.fetchall()
+        environments, video_names = zip(*rows) if rows else ((), ())
+        return {
+            "environment": dictionaries["environment"].encode(environments),
+            "video": dictionaries["video"].encode(video_names),
+        }
+
+    def _estimated_bytes(self, cursor):
+        cursor.execute(
+            """
+            SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)
+            FROM pg_partition_tree('objects') p JOIN pg_class c ON c.oid = p.relid
+            WHERE p.isleaf
+            """
+        )
+        return int(cursor.fetchone()[0]) * OBJECT_ROW_BYTES
+
+    def _sorted(self, columns):
+        order = np.argsort(columns["object"], kind="stable")
+        return {name: column[order] for name, column in columns.items()}
+
+    def refresh(self):
+        """
+        Actualiza las columnas si la versión de datos cambió.
+
+        Returns:
+            True si se cargaron datos nuevos
+        """
+        # Tras superar el presupuesto no se reintenta hasta la siguiente carga completa
+        if self.disabled_reason and time.monotonic() - self._disabled_at < self.full_refresh_interval:
+            return False
+
+        version = read_data_version()
+        snapshot = self.snapshot
+        if snapshot is not None and version is not None and version == snapshot.data_version:
+            # Con un tramo pendiente de transacciones en curso se sigue leyendo
+            if (snapshot.watermark >= snapshot.scanned_to
+                    and time.monotonic() - snapshot.loaded_at < self.full_refresh_interval):
+                return False
+
+        start = time.perf_counter()
+        with get_pool().connection() as conn:
+            with conn.cursor() as cursor:
+                # Instantánea y máximo visible en la misma sentencia
+                cursor.execute(
+                    """
+                    SELECT to_regclass('objects')::oid,
+                           pg_sequence_last_value(to_regclass('data_rewrite_seq')),
+                           pg_snapshot_xmin(pg_current_snapshot())::text::bigint,
+                           pg_snapshot_xmax(pg_current_snapshot())::text::bigint,
+                           (SELECT COALESCE(MAX(ingest_id), 0) FROM objects)
+                    """
+                )
+                table_oid, rewrite_version, snapshot_xmin, snapshot_xmax, high = cursor.fetchone()
+                # Los ids de una tabla sustituida no se comparan con los de la nueva
+                if snapshot is not None and table_oid == snapshot.table_oid:
+                    watermark, scanned_to, scanned_xmax = (
+                        snapshot.watermark, snapshot.scanned_to, snapshot.scanned_xmax)
+                else:
+                    watermark, scanned_to, scanned_xmax = 0, 0, None
+                full = (snapshot is None or table_oid != snapshot.table_oid
+                        or rewrite_version != snapshot.rewrite_version
+                        or time.monotonic() - snapshot.loaded_at >= self.full_refresh_interval)
+                if full and self._estimated_bytes(cursor) > self.memory_budget:
+                    self._disable("los datos estimados superan el presupuesto de memoria")
+                    return False
+
+            if full:
+                dictionaries = {name: Dictionary() for name in
+                                ("object", "video", "color", "proximity", "environment")}
+                base = self._sorted(self._fetch_objects(conn, dictionaries, 0))
+                delta = {name: column[:0] for name, column in base.items()}
+                new_rows = len(base["object"])
+                self.stats["full_loads"] += 1
+            else:
+                dictionaries = snapshot.dictionaries
+                fetched = self._fetch_objects(conn, dictionaries, watermark)
+                # Descartar las filas del tramo pendiente que ya estaban cargadas
+                seen = np.concatenate((
+                    snapshot.base["ingest_id"][snapshot.base["ingest_id"] > watermark],
+                    snapshot.delta["ingest_id"][snapshot.delta["ingest_id"] > watermark],
+                ))
+                fresh = ~np.isin(fetched["ingest_id"], seen)
+                fetched = {name: column[fresh] for name, column in fetched.items()}
+                new_rows = len(fetched["object"])
+                base = snapshot.base
+                delta = {name: np.concatenate((snapshot.delta[name], fetched[name])) for name in OBJECT_COLUMNS}
+                # Mezclar el delta con la parte ordenada cuando crece demasiado
+                if len(delta["object"]) > self.merge_ratio * max(len(base["object"]), 1):
+                    base = self._sorted({name: np.concatenate((base[name], delta[name])) for name in base})
+                    delta = {name: column[:0] for name, column in base.items()}
+                self.stats["incremental_loads"] += 1
+
+            scenarios = self._fetch_scenarios(conn, dictionaries)
+
+        high = max(high, watermark)
+        if snapshot_xmin == snapshot_xmax:
+            # Ninguna transacción en curso: todo lo visible es definitivo
+            new_watermark = high
+        elif scanned_xmax is not None and snapshot_xmin >= scanned_xmax:
+            # Terminaron las transacciones en curso en la lectura anterior
+            new_watermark = max(watermark, scanned_to)
+        else:
+            new_watermark = watermark
+        new_snapshot = ColumnarSnapshot(dictionaries, scenarios, base, delta, table_oid, version,
+                                        rewrite_version, new_watermark, high, snapshot_xmax)
+        if not full:
+            new_snapshot.loaded_at = snapshot.loaded_at
+        if new_snapshot.nbytes > self.memory_budget:
+            self._disable("las columnas superan el presupuesto de memoria")
+            return False
+
+        self.snapshot = new_snapshot
+        self.disabled_reason = None
+        self.stats["rows_loaded"] += new_rows
+        self.stats["last_refresh_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        logger.info("Motor columnar %s: %d filas nuevas, %d en memoria, %.1f MB",
+                    "cargado" if full else "actualizado", new_rows, new_snapshot.rows,
+                    new_snapshot.nbytes / 1024 / 1024)
+        return True
+
+    def _disable(self, reason):
+        if self.disabled_reason != reason:
+            logger.warning("Motor columnar desactivado: %s", reason)
+        self.snapshot = None
+        self.disabled_reason = reason
+        self._disabled_at = time.monotonic()
+
+    async def _run(self):
+        while True:
+            try:
+                await run_db(self.refresh)
+            except Exception as e:
+                logger.error("Error al refrescar el motor columnar: %s", e)
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """Arranca el worker de refresco en el event loop actual."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Detiene el worker de refresco."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self):
+        """Devuelve las métricas del motor."""
+        snapshot = self.snapshot
+        return {
+            **self.stats,
+            "ready": snapshot is not None,
+            "disabled_reason": self.disabled_reason,
+            "rows": snapshot.rows if snapshot else 0,
+            "delta_rows": len(snapshot.delta["object"]) if snapshot else 0,
+            "memory_mb": round(snapshot.nbytes / 1024 / 1024, 2) if snapshot else 0.0,
+            "memory_budget_mb": round(self.memory_budget / 1024 / 1024, 2),
+            "data_version": snapshot.data_version if snapshot else None,
+        }
+
+
+# Motor columnar global
+_engine = None
+
+
+def get_columnar_engine():
+    """
+    Devuelve el motor columnar global o None si está desactivado
+    (COLUMNAR_ENABLED distinto de true o NumPy no instalado).
+
+    Returns:
+        ColumnarEngine o None
+    """
+    return _engine
+
+
+async def start_columnar_engine():
+    """Crea y arranca el motor columnar global si COLUMNAR_ENABLED es true."""
+    global _engine
+    if os.environ.get("COLUMNAR_ENABLED", "false").lower() != "true":
+        return
+    if np is None:
+        logger.warning("COLUMNAR_ENABLED=true pero NumPy no está instalado: se usa SQL")
+        return
+    _engine = ColumnarEngine(
+        memory_budget_mb=float(os.environ.get("COLUMNAR_MEMORY_MB", "256")),
+        refresh_interval=float(os.environ.get("COLUMNAR_REFRESH_INTERVAL", "5")),
+        full_refresh_interval=float(os.environ.get("COLUMNAR_FULL_REFRESH_INTERVAL", "600")),
+    )
+    _engine.start()
+
+
+async def stop_columnar_engine():
+    """Detiene el motor columnar global."""
+    global _engine
+    if _engine is not None:
+        await _engine.stop()
+        _engine = None
@@ -0,0 +1,364 @@
+# app/db.py
+import os
+import time
+import asyncio
+import functools
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+from app.logger_config import setup_logger
+
+# Configurar el logger
+logger = setup_logger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Se lanza cuando no hay conexiones libres antes de agotar el tiempo de espera."""
+
+
+class PoolClosed(Exception):
+    """Se lanza al intentar usar un pool que ya fue cerrado."""
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """
+    Conexión de psycopg2 con los metadatos que necesita el pool
+    (antigüedad, último uso y sentencias preparadas en la sesión).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.prepared = set()
+
+
+def get_db_params():
+    """
+    Obtiene los parámetros de conexión de variables de entorno o usa valores predeterminados.
+
+    Returns:
+        Diccionario con host, port, user, password y dbname
+    """
+    return {
+        "host": os.environ.get("DB_HOST", "postgres"),
+        "port": os.environ.get("DB_PORT", "5432"),
+        "user": os.environ.get("DB_USER", "postgres"),
+        "password": os.environ.get("DB_PASSWORD", "postgres"),
+        "dbname": os.environ.get("DB_NAME", "videodata"),
+    }
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones a PostgreSQL seguro para hilos.
+
+    Mantiene entre `minconn` y `maxconn` conexiones abiertas, limita el tiempo de
+    espera al pedir una conexión, comprueba las conexiones inactivas antes de
+    entregarlas y recicla las conexiones rotas o demasiado antiguas.
+    """
+
+    def __init__(self, db_params, minconn=1, maxconn=10, acquire_timeout=5.0,
+                 max_lifetime=3600.0, check_idle=30.0):
+        """
+        Args:
+            db_params: Parámetros para psycopg2.connect
+            minconn: Número de conexiones que se abren al iniciar
+            maxconn: Número máximo de conexiones simultáneas
+            acquire_timeout: Segundos máximos de espera por una conexión libre
+            max_lifetime: Segundos tras los que una conexión se recicla
+            check_idle: Segundos de inactividad a partir de los que se hace un ping antes de entregarla
+        """
+        if maxconn < 1 or minconn > maxconn:
+            raise ValueError("Tamaño de pool no válido")
+
+        self.db_params = db_params
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        self.check_idle = check_idle
+
+        self._idle = deque()
+        self._in_use = set()
+        self._opening = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # Estadísticas para dimensionar el pool
+        self._acquires = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+
+    def _connect(self):
+        conn = psycopg2.connect(connection_factory=PooledConnection, **self.db_params)
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def open(self):
+        """
+        Abre las conexiones mínimas. Si la base de datos no está disponible
+        se registra el error y las conexiones se crearán bajo demanda.
+        """
+        for _ in range(self.minconn):
+            try:
+                conn = self._connect()
+            except psycopg2.Error as e:
+                logger.error("No se pudo precargar el pool de conexiones: %s", e)
+                break
+            with self._cond:
+                self._idle.append(conn)
+        logger.info("Pool de conexiones iniciado (min=%d, max=%d)", self.minconn, self.maxconn)
+
+    def _is_stale(self, conn):
+        if conn.closed:
+            return True
+        return time.monotonic() - conn.created_at > self.max_lifetime
+
+    def _is_alive(self, conn):
+        """Hace un ping a la conexión si ha estado inactiva demasiado tiempo."""
+        if time.monotonic() - conn.last_used < self.check_idle:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._recycled += 1
+
+    def getconn(self, timeout=None):
+        """
+        Obtiene una conexión del pool.
+
+        Args:
+            timeout: Segundos máximos de espera (por defecto acquire_timeout)
+
+        Returns:
+            Conexión lista para usarse
+
+        Raises:
+            PoolTimeout: Si no se libera ninguna conexión a tiempo
+            PoolClosed: Si el pool ya se cerró
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolClosed("El pool de conexiones está cerrado")
+                    if self._idle:
+                        conn = self._idle.pop()
+                        self._in_use.add(conn)
+                        break
+                    if len(self._in_use) + self._opening < self.maxconn:
+                        self._opening += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"No hay conexiones libres tras {timeout:.1f}s")
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                finally:
+                    with self._cond:
+                        self._opening -= 1
+                        if conn is not None:
+                            self._in_use.add(conn)
+                        else:
+                            self._cond.notify()
+            elif self._is_stale(conn) or not self._is_alive(conn):
+                # Conexión rota o antigua: se recicla y se vuelve a intentar
+                with self._cond:
+                    self._in_use.discard(conn)
+                    self._cond.notify()
+                self._discard(conn)
+                continue
+
+            wait = time.monotonic() - start
+            with self._cond:
+                self._acquires += 1
+                if waited:
+                    self._waits += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """
+        Devuelve una conexión al pool.
+
+        Args:
+            conn: Conexión obtenida con getconn
+            discard: Si es True la conexión se cierra en lugar de reutilizarse
+        """
+        if not conn.closed and not discard:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._cond:
+            self._in_use.discard(conn)
+            reuse = not (discard or conn.closed or self._closed or self._is_stale(conn))
+            if reuse:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+        if not reuse:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager que obtiene una conexión y la devuelve al terminar.
+        Las conexiones que fallan con errores de conexión se descartan.
+        """
+        conn = self.getconn(timeout)
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def close(self):
+        """Cierra todas las conexiones inactivas; las que están en uso se cierran al devolverse."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close()
+        logger.info("Pool de conexiones cerrado")
+
+    def stats(self):
+        """
+        Devuelve estadísticas de uso del pool.
+
+        Returns:
+            Diccionario con conexiones en uso, inactivas y tiempos de espera
+        """
+        with self._cond:
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "opening": self._opening,
+                "acquires": self._acquires,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "wait_ms_avg": round(self._wait_total * 1000 / self._acquires, 3) if self._acquires else 0.0,
+                "wait_ms_max": round(self._wait_max * 1000, 3),
+                "connections_created": self._created,
+                "connections_recycled": self._recycled,
+            }
+
+
+# Pool global de la aplicación, creado en el arranque de FastAPI
+_pool = None
+
+# Ejecutor acotado para las llamadas bloqueantes a psycopg2
+_executor = None
+
+
+def init_pool():
+    """
+    Crea el pool global usando la configuración de variables de entorno.
+
+    Returns:
+        Pool de conexiones iniciado
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    _pool = ConnectionPool(
+        get_db_params(),
+        minconn=int(os.environ.get("DB_POOL_MIN", "1")),
+        maxconn=int(os.environ.get("DB_POOL_MAX", "10")),
+        acquire_timeout=float(os.environ.get("DB_POOL_TIMEOUT", "5")),
+        max_lifetime=float(os.environ.get("DB_POOL_MAX_LIFETIME", "3600")),
+        check_idle=float(os.environ.get("DB_POOL_CHECK_IDLE", "30")),
+    )
+    _pool.open()
+    return _pool
+
+
+def get_executor():
+    """
+    Devuelve el ejecutor de hilos para operaciones de base de datos.
+    Por defecto tiene tantos hilos como conexiones máximas del pool.
+    """
+    global _executor
+    if _executor is None:
+        workers = int(os.environ.get("DB_EXECUTOR_WORKERS", os.environ.get("DB_POOL_MAX", "10")))
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+    return _executor
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    Ejecuta una función bloqueante de base de datos en el ejecutor acotado
+    para no bloquear el event loop.
+
+    Args:
+        func: Función síncrona a ejecutar
+        *args, **kwargs: Argumentos de la función
+
+    Returns:
+        Resultado de la función
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def get_pool():
+    """Devuelve el pool global, creándolo si todavía no existe."""
+    if _pool is None:
+        return init_pool()
+    return _pool
+
+
+def close_pool():
+    """Cierra el pool global y el ejecutor de base de datos."""
+    global _pool, _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    if _pool is not None:
+        _pool.close()
+        _pool = None
@@ -0,0 +1,516 @@
+# app/ingest.py
+import io
+import os
+import csv
+import time
+import struct
+import asyncio
+
+from app.db import get_pool, run_db
+from app.logger_config import setup_logger
+
+# Configurar el logger
+logger = setup_logger(__name__)
+
+# Columnas que se ingieren en cada tabla y su tipo en el formato binario de COPY
+INGEST_COLUMNS = {
+    "objects": [
+        ("object_name", "text"), ("video_name", "text"),
+        ("x1", "int4"), ("y1", "int4"), ("x2", "int4"), ("y2", "int4"),
+        ("color", "text"), ("proximity", "text"), ("sec", "int4"),
+    ],
+    "features": [
+        ("video_name", "text"), ("sec", "int4"), ("object_name", "text"), ("description", "text"),
+        ("color1", "text"), ("color2", "text"), ("size", "text"), ("orientation", "text"), ("type", "text"),
+    ],
+}
+
+# Columnas de cada tabla que el almacenamiento compacto convierte en enum
+# (mismas que COMPACT_COLUMNS en deploy_postgres.py) y longitud máxima de
+# una etiqueta de enum en bytes
+LABEL_COLUMNS = {
+    "objects": ("object_name", "video_name", "color", "proximity"),
+    "features": ("video_name", "object_name", "color1", "color2", "size", "orientation", "type"),
+}
+MAX_LABEL_BYTES = 63
+
+# Cabecera y fin del formato binario de COPY de PostgreSQL
+COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_BINARY_TRAILER = struct.pack(">h", -1)
+
+_INT4 = struct.Struct(">ii")
+_NULL = struct.pack(">i", -1)
+
+# Clave de particionado de cada tabla (None si no está particionada) y
+# particiones ya garantizadas por este proceso
+_partition_keys = {}
+_known_partitions = set()
+
+# Columnas enum de cada tabla (almacenamiento compacto) y etiquetas conocidas de cada tipo
+_label_types = {}
+_known_labels = {}
+
+# Primera etiqueta de un enum que sigue a un valor en el orden del texto
+_NEXT_LABEL_SQL = """
+    SELECT enumlabel::text FROM pg_enum
+    WHERE enumtypid = to_regtype(%s) AND enumlabel::text COLLATE "default" > %s
+    ORDER BY enumlabel::text COLLATE "default"
+    LIMIT 1
+"""
+
+
+class BufferFull(Exception):
+    """Se lanza cuando el buffer de ingesta sigue lleno tras esperar."""
+
+
+class BatchTooLarge(Exception):
+    """Se lanza cuando una solicitud tiene más filas de las que caben en el buffer."""
+
+
+def encode_row_binary(row, types):
+    """
+    Codifica una fila en el formato binario de COPY (sin cabecera).
+
+    Args:
+        row: Tupla con los valores de la fila
+        types: Lista de tipos ("text" o "int4") de cada columna
+
+    Returns:
+        Bytes de la fila
+
+    Raises:
+        ValueError: Si un entero no cabe en int4 o un texto no se puede codificar
+    """
+    parts = [struct.pack(">h", len(types))]
+    for value, kind in zip(row, types):
+        if value is None:
+            parts.append(_NULL)
+        elif kind == "int4":
+            try:
+                parts.append(_INT4.pack(4, value))
+            except struct.error:
+                raise ValueError(f"El valor {value} no cabe en un entero de 4 bytes")
+        else:
+            data = value.encode("utf-8")
+            parts.append(struct.pack(">i", len(data)))
+            parts.append(data)
+    return b"".join(parts)
+
+
+def encode_row_csv(row):
+    """Codifica una fila como una línea CSV para COPY en formato texto."""
+    out = io.StringIO()
+    csv.writer(out).writerow(row)
+    return out.getvalue().encode("utf-8")
+
+
+def encode_rows(table, rows, binary=True):
+    """
+    Codifica cada fila de un lote por separado y comprueba que sus etiquetas
+    caben en un enum, de modo que una fila no válida se rechaza al recibirla
+    y nunca hace fallar el COPY de un lote compartido con otros clientes.
+
+    Args:
+        table: Nombre de la tabla (clave de INGEST_COLUMNS)
+        rows: Filas en el orden de INGEST_COLUMNS[table]
+        binary: Codificar en el formato binario de COPY en lugar de CSV
+
+    Returns:
+        Lista de bytes, una entrada por fila
+
+    Raises:
+        ValueError: Si alguna fila no se puede escribir en la tabla
+    """
+    columns = INGEST_COLUMNS[table]
+    types = [kind for _, kind in columns]
+    labels = [position for position, (name, _) in enumerate(columns) if name in LABEL_COLUMNS[table]]
+    encoded = []
+    for row in rows:
+        for position in labels:
+            value = row[position]
+            if value is not None and not 0 < len(value.encode("utf-8")) <= MAX_LABEL_BYTES:
+                raise ValueError(f"{columns[position][0]} debe tener entre 1 y {MAX_LABEL_BYTES} bytes")
+        encoded.append(encode_row_binary(row, types) if binary else encode_row_csv(row))
+    return encoded
+
+
+def encode_copy_binary(rows, types):
+    """
+    Codifica filas en el formato binario de COPY.
+
+    Args:
+        rows: Lista de tuplas con los valores de cada fila
+        types: Lista de tipos ("text" o "int4") de cada columna
+
+    Returns:
+        Bytes listos para COPY ... FROM STDIN WITH (FORMAT binary)
+    """
+    out = io.BytesIO()
+    out.write(COPY_BINARY_HEADER)
+    for row in rows:
+        out.write(encode_row_binary(row, types))
+    out.write(COPY_BINARY_TRAILER)
+    out.seek(0)
+    return out
+
+
+def encode_copy_csv(rows):
+    """Codifica filas como CSV para COPY en formato texto."""
+    out = io.StringIO()
+    csv.writer(out).writerows(rows)
+    out.seek(0)
+    return out
+
+
+def frames_to_rows(frames):
+    """
+    Convierte una lista de FrameDetections en filas de objects y features.
+
+    Args:
+        frames: Lista de FrameDetections
+
+    Returns:
+        Tupla (filas de objects, filas de features)
+    """
+    objects, features = [], []
+    for frame in frames:
+        for obj in frame.objects:
+            # Esquinas ordenadas igual que en la carga de los CSV: (x1, y1) arriba a la izquierda
+            objects.append((obj.object_name, frame.video_name,
+                            min(obj.x1, obj.x2), min(obj.y1, obj.y2), max(obj.x1, obj.x2), max(obj.y1, obj.y2),
+                            obj.color, obj.proximity, frame.sec))
+        for feature in frame.features:
+            features.append((frame.video_name, frame.sec, feature.object_name, feature.description,
+                             feature.color1, feature.color2, feature.size, feature.orientation, feature.type))
+    return objects, features
+
+
+def copy_rows(conn, table, encoded, binary=True):
+    """
+    Inserta filas ya codificadas con encode_rows en una tabla con COPY FROM STDIN.
+
+    Args:
+        conn: Conexión a PostgreSQL
+        table: Nombre de la tabla (clave de INGEST_COLUMNS)
+        encoded: Lista de filas codificadas (bytes)
+        binary: Las filas están en el formato binario de COPY en lugar de CSV
+    """
+    column_list = ", ".join(name for name, _ in INGEST_COLUMNS[table])
+    with conn.cursor() as cursor:
+        if binary:
+            data = io.BytesIO(b"".join([COPY_BINARY_HEADER, *encoded, COPY_BINARY_TRAILER]))
+            cursor.copy_expert(f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT binary)", data)
+        else:
+            data = io.BytesIO(b"".join(encoded))
+            cursor.copy_expert(f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)", data)
+
+
+def ensure_labels(conn, table, rows):
+    """
+    Registra antes del COPY las etiquetas nuevas de las columnas enum de una
+    tabla con almacenamiento compacto.
+
+    Una etiqueta añadida con ALTER TYPE no puede usarse en la misma
+    transacción, así que si hay etiquetas nuevas se confirman antes de cargar.
+
+    Args:
+        conn: Conexión a PostgreSQL (sin transacción pendiente)
+        table: Nombre de la tabla (clave de INGEST_COLUMNS)
+        rows: Filas del lote en el orden de INGEST_COLUMNS[table]
+    """
+    names = [name for name, _ in INGEST_COLUMNS[table]]
+    added = []
+    with conn.cursor() as cursor:
+        if table not in _label_types:
+            cursor.execute(
+                """
+                SELECT a.attname, t.typname
+                FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid
+                WHERE a.attrelid = to_regclass(%s) AND a.attnum > 0
+                  AND NOT a.attisdropped AND t.typtype = 'e'
+                """,
+                (table,)
+            )
+            _label_types[table] = dict(cursor.fetchall())
+
+        for column, type_name in _label_types[table].items():
+            if column not in names:
+                continue
+            if type_name not in _known_labels:
+                cursor.execute("SELECT enumlabel FROM pg_enum WHERE enumtypid = to_regtype(%s)", (type_name,))
+                _known_labels[type_name] = {row[0] for row in cursor.fetchall()}
+            position = names.index(column)
+            values = {row[position] for row in rows if row[position] is not None}
+            missing = list(values - _known_labels[type_name])
+            if not missing:
+                continue
+            # Igual que add_labels en deploy_postgres.py: cada etiqueta delante
+            # de la que la sigue en el orden del texto, para que ORDER BY no cambie
+            cursor.execute("SELECT value FROM unnest(%s::text[]) value ORDER BY value", (missing,))
+            for (value,) in cursor.fetchall():
+                cursor.execute(_NEXT_LABEL_SQL, (type_name, value))
+                following = cursor.fetchone()
+                if following is None:
+                    cursor.execute(f"ALTER TYPE {type_name} ADD VALUE IF NOT EXISTS %s", (value,))
+                else:
+                    cursor.execute(f"ALTER TYPE {type_name} ADD VALUE IF NOT EXISTS %s BEFORE %s",
+                                   (value, following[0]))
+                added.append((type_name, value))
+
+    conn.commit()
+    for type_name, value in added:
+        _known_labels[type_name].add(value)
+    if added:
+        logger.info("%d etiquetas nuevas registradas para %s", len(added), table)
+
+
+def ensure_partitions(conn, table, rows):
+    """
+    Crea antes del COPY las particiones que faltan para las filas de un lote.
+
+    Con particiones por lista se garantiza una partición por cada valor nuevo
+    de la clave; con particiones por rango, la del mes actual. Cada partición
+    se comprueba una sola vez por proceso; las filas que lleguen sin partición
+    caen en la partición por defecto.
+
+    Args:
+        conn: Conexión a PostgreSQL
+        table: Nombre de la tabla (clave de INGEST_COLUMNS)
+        rows: Filas del lote en el orden de INGEST_COLUMNS[table]
+    """
+    with conn.cursor() as cursor:
+        if table not in _partition_keys:
+            cursor.execute("SELECT pg_get_partkeydef(to_regclass(%s))", (table,))
+            _partition_keys[table] = cursor.fetchone()[0]
+        partition_key = _partition_keys[table]
+        if partition_key is None:
+            return
+
+        if partition_key.startswith("LIST"):
+            column = partition_key[partition_key.index("(") + 1:-1]
+            position = [name for name, _ in INGEST_COLUMNS[table]].index(column)
+            keys = {(row[position], row[position]) for row in rows if row[position] is not None}
+        else:
+            keys = {(time.strftime("%Y-%m"), time.strftime("%Y-%m-%d %H:%M:%S"))}
+
+        for cache_key, key in keys:
+            if (table, cache_key) in _known_partitions:
+                continue
+            cursor.execute("SELECT ensure_partition(%s, %s)", (table, key))
+            _known_partitions.add((table, cache_key))
+
+
+def flush_to_postgres(objects, features, binary=True):
+    """
+    Escribe un lote de filas en objects y features en una sola transacción.
+
+    Args:
+        objects: Pares (fila, fila codificada) de objects
+        features: Pares (fila, fila codificada) de features
+        binary: Las filas están en el formato binario de COPY
+    """
+    with get_pool().connection() as conn:
+        for table, pairs in (("objects", objects), ("features", features)):
+            ensure_labels(conn, table, [row for row, _ in pairs])
+        for table, pairs in (("objects", objects), ("features", features)):
+            if pairs:
+                ensure_partitions(conn, table, [row for row, _ in pairs])
+                copy_rows(conn, table, [data for _, data in pairs], binary)
+        conn.commit()
+
+
+class IngestBuffer:
+    """
+    Buffer en memoria para las detecciones que envían los nodos detectores.
+
+    Cada fila se codifica al recibirla, así que una fila que no se puede
+    escribir se rechaza en su solicitud y no hace fallar el lote de otros
+    clientes. Las filas se acumulan y se escriben con COPY cuando el buffer alcanza
+    `flush_rows` filas o pasa `flush_interval` segundos. Mientras un lote se
+    escribe sus filas siguen contando como ocupadas; si el buffer está lleno,
+    `add` espera a que haya espacio y, si no lo hay a tiempo, lanza BufferFull.
+    """
+
+    def __init__(self, flush_rows=5000, max_rows=50000, flush_interval=1.0,
+                 backpressure_timeout=5.0, binary=True, max_retries=3):
+        """
+        Args:
+            flush_rows: Filas a partir de las que se escribe un lote
+            max_rows: Filas máximas en memoria (incluidas las que se están escribiendo)
+            flush_interval: Segundos máximos que una fila espera en el buffer
+            backpressure_timeout: Segundos que `add` espera por espacio libre
+            binary: Usar el formato binario de COPY
+            max_retries: Intentos de escritura de cada lote
+        """
+        self.flush_rows = flush_rows
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.backpressure_timeout = backpressure_timeout
+        self.binary = binary
+        self.max_retries = max_retries
+
+        self._objects = []
+        self._features = []
+        self._occupied = 0
+        self._space = asyncio.Condition()
+        self._flush_needed = asyncio.Event()
+        self._task = None
+
+        self.stats = {
+            "rows_accepted": 0,
+            "rows_flushed": 0,
+            "rows_dropped": 0,
+            "flushes": 0,
+            "flush_failures": 0,
+            "rejected_requests": 0,
+            "last_flush_ms": 0.0,
+            "last_flush_rows": 0,
+        }
+
+    async def add(self, frames):
+        """
+        Añade las detecciones de varios frames al buffer.
+
+        Args:
+            frames: Lista de FrameDetections
+
+        Returns:
+            Número de filas aceptadas
+
+        Raises:
+            ValueError: Si alguna fila no se puede escribir (no se acepta ninguna)
+            BatchTooLarge: Si la solicitud supera max_rows (reintentarla no sirve)
+            BufferFull: Si no se libera espacio antes de backpressure_timeout
+        """
+        objects, features = frames_to_rows(frames)
+        objects = list(zip(objects, encode_rows("objects", objects, self.binary)))
+        features = list(zip(features, encode_rows("features", features, self.binary)))
+        size = len(objects) + len(features)
+        if size > self.max_rows:
+            self.stats["rejected_requests"] += 1
+            raise BatchTooLarge(
+                f"La solicitud tiene {size} filas y el máximo por solicitud es {self.max_rows}"
+            )
+
+        async with self._space:
+            try:
+                await asyncio.wait_for(
+                    self._space.wait_for(lambda: self._occupied + size <= self.max_rows),
+                    self.backpressure_timeout
+                )
+            except asyncio.TimeoutError:
+                self.stats["rejected_requests"] += 1
+                raise BufferFull("Buffer de ingesta lleno")
+            self._objects.extend(objects)
+            self._features.extend(features)
+            self._occupied += size
+
+        self.stats["rows_accepted"] += size
+        if len(self._objects) + len(self._features) >= self.flush_rows:
+            self._flush_needed.set()
+        return size
+
+    async def flush(self):
+        """Escribe en PostgreSQL todas las filas pendientes."""
+        objects, features = self._objects, self._features
+        if not objects and not features:
+            return
+        self._objects, self._features = [], []
+        size = len(objects) + len(features)
+
+        start = time.perf_counter()
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await run_db(flush_to_postgres, objects, features, self.binary)
+                self.stats["flushes"] += 1
+                self.stats["rows_flushed"] += size
+                self.stats["last_flush_rows"] = size
+                self.stats["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 3)
+                break
+            except Exception as e:
+                self.stats["flush_failures"] += 1
+                logger.error("Error al escribir lote de ingesta (intento %d/%d): %s",
+                             attempt, self.max_retries, e)
+                if attempt < self.max_retries:
+                    await asyncio.sleep(0.5 * attempt)
+        else:
+            self.stats["rows_dropped"] += size
+            logger.error("Se descartan %d filas de ingesta tras %d intentos", size, self.max_retries)
+
+        # Liberar el espacio del lote y despertar a los productores que esperan
+        async with self._space:
+            self._occupied -= size
+            self._space.notify_all()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Error en el worker de ingesta: %s", e)
+
+    def start(self):
+        """Arranca el worker de escritura en el event loop actual."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Detiene el worker y escribe las filas pendientes."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def get_stats(self):
+        """Devuelve las métricas del buffer."""
+        return {
+            **self.stats,
+            "rows_buffered": len(self._objects) + len(self._features),
+            "rows_occupied": self._occupied,
+            "max_rows": self.max_rows,
+        }
+
+
+# Buffer global de ingesta
+_ingest_buffer = None
+
+
+def get_ingest_buffer():
+    """
+    Devuelve el buffer global, creándolo con la configuración de variables de entorno.
+
+    Returns:
+        IngestBuffer
+    """
+    global _ingest_buffer
+    if _ingest_buffer is None:
+        _ingest_buffer = IngestBuffer(
+            flush_rows=int(os.environ.get("INGEST_FLUSH_ROWS", "5000")),
+            max_rows=int(os.environ.get("INGEST_MAX_ROWS", "50000")),
+            flush_interval=float(os.environ.get("INGEST_FLUSH_INTERVAL", "1")),
+            backpressure_timeout=float(os.environ.get("INGEST_BACKPRESSURE_TIMEOUT", "5")),
+            binary=os.environ.get("INGEST_COPY_FORMAT", "binary").lower() == "binary",
+        )
+    return _ingest_buffer
+
+
+async def start_ingest_buffer():
+    """Crea y arranca el buffer global de ingesta."""
+    get_ingest_buffer().start()
+
+
+async def stop_ingest_buffer():
+    """Escribe las filas pendientes y detiene el buffer global."""
+    global _ingest_buffer
+    if _ingest_buffer is not None:
+        await _ingest_buffer.stop()
+        _ingest_buffer = None
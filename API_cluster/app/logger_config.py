@@ -1,41 +1,158 @@
 # app/logger_config.py
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import threading
+
+# Formato del log: timestamp - nombre - nivel - mensaje
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Cola compartida por todos los loggers, el hilo que escribe en la consola y
+# el handler que se añade a cada logger (el de la cola mientras el hilo funciona)
+_log_queue = None
+_listener = None
+_handler = None
+_lock = threading.Lock()
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no formatea el mensaje en el hilo que registra el evento.
+    El formateo (%-args, fecha, excepción) se hace en el hilo del QueueListener.
+    """
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Con la cola llena se descarta el registro para no bloquear la petición
+            pass
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Deja pasar solo una fracción de los registros marcados con `extra={"sample": tipo}`.
+    Los registros sin marca pasan siempre.
+    """
+
+    def __init__(self, rates):
+        """
+        Args:
+            rates: Diccionario {tipo de muestreo: fracción entre 0 y 1}
+        """
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        sample = getattr(record, "sample", None)
+        if sample is None:
+            return True
+        return random.random() < self.rates.get(sample, 1.0)
+
+
+def _get_level():
+    # Configuración de nivel de log desde variable de entorno o predeterminado INFO
+    log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    return getattr(logging, log_level, logging.INFO)
+
+
+def _sampling_filter():
+    """Filtro de muestreo con las fracciones de las variables de entorno."""
+    return SamplingFilter({
+        "row": float(os.environ.get('LOG_SAMPLE_ROWS', '0.01')),
+        "request": float(os.environ.get('LOG_SAMPLE_REQUESTS', '0.1')),
+    })
+
+
+def _start_pipeline():
+    """Crea la cola, el handler de consola y el hilo que vacía la cola."""
+    global _log_queue, _listener, _handler
+
+    _log_queue = queue.Queue(maxsize=int(os.environ.get('LOG_QUEUE_SIZE', '10000')))
+
+    # Crear un handler para la consola, usado solo desde el hilo del listener
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    _handler = LazyQueueHandler(_log_queue)
+    _handler.addFilter(_sampling_filter())
+
+    _listener = logging.handlers.QueueListener(_log_queue, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Vacía la cola de logs y detiene el hilo de escritura. A partir de ahí
+    nadie vaciaría la cola, así que los loggers pasan a escribir directamente
+    en la consola.
+    """
+    global _listener, _handler
+    with _lock:
+        if _listener is None:
+            return
+
+        # Cambiar primero de handler para que ningún registro quede en la cola sin escribir
+        direct_handler = logging.StreamHandler()
+        direct_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        direct_handler.addFilter(_sampling_filter())
+        queue_handler, _handler = _handler, direct_handler
+        for logger in list(logging.Logger.manager.loggerDict.values()):
+            if isinstance(logger, logging.Logger) and queue_handler in logger.handlers:
+                logger.addHandler(direct_handler)
+                logger.removeHandler(queue_handler)
+
+        _listener.stop()
+        _listener = None
+
 
 def setup_logger(name):
     """
     Configura y devuelve un logger con el formato especificado.
-    
+
+    Los registros se envían a una cola y un único hilo los formatea y los
+    escribe, de modo que el hilo de la petición no espera a la consola.
+
     Args:
         name: Nombre del logger, generalmente __name__ del módulo
-        
+
     Returns:
         Logger configurado
     """
-    # Configuración de nivel de log desde variable de entorno o predeterminado INFO
-    log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
-    logging_level = getattr(logging, log_level, logging.INFO)
-    
-    # Formato del log: timestamp - nombre - nivel - mensaje
-    log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    
+    with _lock:
+        if _handler is None:
+            _start_pipeline()
+
     # Configurar el logger
     logger = logging.getLogger(name)
-    
+
     # Evitar duplicación de handlers si el logger ya está configurado
     if not logger.handlers:
-        # Configurar el nivel del logger
-        logger.setLevel(logging_level)
-        
-        # Crear un handler para la consola
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging_level)
-        
-        # Formato para el handler
-        formatter = logging.Formatter(log_format)
-        console_handler.setFormatter(formatter)
-        
-        # Agregar el handler al logger
-        logger.addHandler(console_handler)
-    
-    return logger
\ No newline at end of file
+        logger.setLevel(_get_level())
+        logger.addHandler(_handler)
+        logger.propagate = False
+
+    return logger
+
+
+def log_request_summary(logger, query_type, rows, db_ms, total_ms, source="db"):
+    """
+    Registra una única línea de resumen por petición en lugar de una por fila.
+
+    Args:
+        logger: Logger del módulo
+        query_type: Tipo de consulta
+        rows: Número de filas devueltas
+        db_ms: Milisegundos en la base de datos
+        total_ms: Milisegundos totales de la petición
+        source: Origen del resultado (db, cache...)
+    """
+    logger.info("consulta type=%s rows=%d source=%s db_ms=%.2f total_ms=%.2f",
+                query_type, rows, source, db_ms, total_ms)
@@ -0,0 +1,228 @@
+# app/mailer.py
+import os
+import ssl
+import time
+import smtplib
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+from app.logger_config import setup_logger
+
+# Configurar el logger
+logger = setup_logger(__name__)
+
+# Errores tras los que la sesión SMTP se descarta y se abre una nueva
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError)
+
+
+def env_flag(name, default):
+    """Lee una variable de entorno booleana ("true"/"false")."""
+    return os.environ.get(name, default).lower() == "true"
+
+
+class SMTPTransport:
+    """
+    Transporte SMTP con sesiones autenticadas reutilizables.
+
+    Las sesiones (conexión, STARTTLS y login) se abren una vez y se reutilizan
+    entre envíos. Si el servidor cierra una sesión se abre otra y se reintenta
+    el envío. El número de sesiones simultáneas está limitado por `max_sessions`.
+    """
+
+    def __init__(self, host, port=587, username=None, password=None, sender=None,
+                 starttls=True, ssl_tls=False, validate_certs=True, timeout=30.0,
+                 max_sessions=2, idle_check=60.0, suppress=False):
+        """
+        Args:
+            host: Servidor SMTP
+            port: Puerto del servidor
+            username: Usuario (None para no autenticarse)
+            password: Contraseña
+            sender: Dirección del remitente
+            starttls: Usar STARTTLS tras conectar
+            ssl_tls: Conectar directamente con TLS (SMTPS)
+            validate_certs: Validar el certificado del servidor
+            timeout: Segundos máximos de espera del socket
+            max_sessions: Número máximo de sesiones SMTP abiertas a la vez
+            idle_check: Segundos de inactividad tras los que se hace NOOP antes de reutilizar una sesión
+            suppress: Si es True los mensajes no se envían (solo se cuentan)
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender
+        self.starttls = starttls
+        self.ssl_tls = ssl_tls
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self.idle_check = idle_check
+        self.suppress = suppress
+
+        self._ssl_context = ssl.create_default_context()
+        if not validate_certs:
+            self._ssl_context.check_hostname = False
+            self._ssl_context.verify_mode = ssl.CERT_NONE
+
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_sessions)
+        self._executor = ThreadPoolExecutor(max_workers=max_sessions, thread_name_prefix="smtp")
+
+        self.stats = {"sessions_opened": 0, "messages_sent": 0, "reconnects": 0, "suppressed": 0}
+
+    def _open(self):
+        """Abre y autentica una sesión SMTP."""
+        if self.ssl_tls:
+            session = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=self._ssl_context)
+        else:
+            session = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            session.ehlo()
+            if self.starttls and not self.ssl_tls:
+                session.starttls(context=self._ssl_context)
+                session.ehlo()
+            if self.username:
+                session.login(self.username, self.password)
+        except Exception:
+            # No dejar abierto el socket de una sesión a medio autenticar
+            self._close(session)
+            raise
+        with self._lock:
+            self.stats["sessions_opened"] += 1
+        session.last_used = time.monotonic()
+        return session
+
+    def _close(self, session):
+        try:
+            session.quit()
+        except OSError:
+            session.close()
+
+    def _checkout(self):
+        """Obtiene una sesión inactiva o abre una nueva."""
+        while True:
+            with self._lock:
+                session = self._idle.pop() if self._idle else None
+            if session is None:
+                return self._open()
+            if time.monotonic() - session.last_used < self.idle_check:
+                return session
+            # Sesión inactiva hace tiempo: comprobar que el servidor no la cerró
+            try:
+                if session.noop()[0] == 250:
+                    return session
+            except OSError:
+                # smtplib.SMTPException también es un OSError
+                pass
+            self._close(session)
+
+    def send(self, message):
+        """
+        Envía un mensaje reutilizando una sesión abierta.
+
+        Args:
+            message: EmailMessage con Subject y To
+
+        Raises:
+            smtplib.SMTPException u OSError si el envío falla también tras reconectar
+        """
+        if not message["From"] and self.sender:
+            message["From"] = self.sender
+        if self.suppress:
+            with self._lock:
+                self.stats["suppressed"] += 1
+            return
+
+        with self._slots:
+            session = self._checkout()
+            try:
+                session.send_message(message)
+            except RECONNECT_ERRORS:
+                # El servidor cerró la sesión: reconectar y reintentar una vez
+                self._close(session)
+                with self._lock:
+                    self.stats["reconnects"] += 1
+                session = self._open()
+                try:
+                    session.send_message(message)
+                except Exception:
+                    # La sesión nueva no vuelve a las inactivas: cerrarla antes de liberar el hueco
+                    self._close(session)
+                    raise
+            except Exception:
+                self._close(session)
+                raise
+            session.last_used = time.monotonic()
+            with self._lock:
+                self._idle.append(session)
+                self.stats["messages_sent"] += 1
+
+    async def send_async(self, message):
+        """Envía un mensaje sin bloquear el event loop."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.send, message)
+
+    def close(self):
+        """Cierra todas las sesiones abiertas."""
+        with self._lock:
+            sessions = list(self._idle)
+            self._idle.clear()
+        for session in sessions:
+            self._close(session)
+        self._executor.shutdown(wait=True)
+
+    def get_stats(self):
+        """Devuelve las métricas del transporte."""
+        with self._lock:
+            return {**self.stats, "idle_sessions": len(self._idle), "max_sessions": self.max_sessions}
+
+
+def build_message(subject, recipient, html, sender=None):
+    """
+    Construye un correo HTML.
+
+    Args:
+        subject: Asunto
+        recipient: Dirección de destino
+        html: Cuerpo HTML
+        sender: Dirección del remitente (opcional)
+
+    Returns:
+        EmailMessage
+    """
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["To"] = recipient
+    if sender:
+        message["From"] = sender
+    message.set_content(html, subtype="html")
+    return message
+
+
+def transport_from_env():
+    """
+    Crea un SMTPTransport con la configuración de variables de entorno.
+    Con MAIL_STARTTLS=false y MAIL_USE_CREDENTIALS=false se puede apuntar a un
+    servidor SMTP local (ver app.smtp_stub).
+
+    Returns:
+        SMTPTransport
+    """
+    use_credentials = env_flag("MAIL_USE_CREDENTIALS", "true")
+    return SMTPTransport(
+        host=os.environ.get("MAIL_SERVER"),
+        port=int(os.environ.get("MAIL_PORT", "587")),
+        username=os.environ.get("MAIL_USERNAME") if use_credentials else None,
+        password=os.environ.get("MAIL_PASSWORD") if use_credentials else None,
+        sender=os.environ.get("MAIL_FROM"),
+        starttls=env_flag("MAIL_STARTTLS", "true"),
+        ssl_tls=env_flag("MAIL_SSL_TLS", "false"),
+        validate_certs=env_flag("MAIL_VALIDATE_CERTS", "true"),
+        max_sessions=int(os.environ.get("MAIL_MAX_SESSIONS", "2")),
+        idle_check=float(os.environ.get("MAIL_IDLE_CHECK", "60")),
+        suppress=env_flag("MAIL_SUPPRESS_SEND", "false"),
+    )
@@ -0,0 +1,253 @@
+# app/metrics.py
+import time
+import bisect
+import threading
+
+from app.db import get_pool
+
+# Métricas registradas, en el orden en que se muestran
+REGISTRY = []
+
+# Límites de los buckets de latencia en segundos (de 0.5 ms a 10 s)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """
+    Base de las métricas: nombre, ayuda, nombres de etiquetas y valores por
+    combinación de etiquetas. Cada métrica tiene su propio lock, que solo se
+    toma para actualizar un número, así que medir cuesta unos microsegundos.
+    """
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        """Devuelve las líneas de la métrica en el formato de texto de Prometheus."""
+        with self._lock:
+            values = dict(self._values)
+        lines = self._header()
+        for labels, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Contador que solo crece."""
+
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    Valor que sube y baja. Con `callback` el valor se lee al generar /metrics
+    (una función que devuelve {etiquetas: valor}) en lugar de mantenerse.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=(), callback=None):
+        super().__init__(name, help_text, labelnames)
+        self.callback = callback
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+    def render(self):
+        if self.callback is not None:
+            try:
+                values = self.callback()
+            except Exception:
+                values = {}
+            with self._lock:
+                self._values = dict(values)
+        return super().render()
+
+
+class Histogram(Metric):
+    """Histograma con buckets fijos, la suma y el número de observaciones."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Un contador por bucket más el de +Inf, suma y número de observaciones
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._values.items()}
+        lines = self._header()
+        for labels, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+def render_metrics():
+    """
+    Genera el texto de /metrics con todas las métricas registradas.
+
+    Returns:
+        Texto en el formato de exposición de Prometheus (versión 0.0.4)
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def _pool_connections():
+    stats = get_pool().stats()
+    return {("in_use",): stats["in_use"], ("idle",): stats["idle"], ("opening",): stats["opening"]}
+
+
+def _pool_max_connections():
+    return {(): get_pool().stats()["max_size"]}
+
+
+REQUEST_DURATION = Histogram(
+    "api_request_duration_seconds", "Latencia de las peticiones HTTP por endpoint",
+    ("endpoint", "method", "status"))
+QUERY_DURATION = Histogram(
+    "api_query_duration_seconds", "Latencia de /receive_characteristics por tipo de consulta y origen",
+    ("type", "source"))
+QUERY_PHASE_DURATION = Histogram(
+    "api_query_phase_duration_seconds",
+    "Tiempo de cada fase de las consultas de frames por endpoint y tipo "
+    "(validation, acquire, execute, fetch, format, serialize); en los lotes el tipo es mixed",
+    ("endpoint", "type", "phase"))
+ROWS_RETURNED = Counter("api_rows_returned_total", "Filas devueltas por tipo de consulta", ("type",))
+ALERT_FIRINGS = Counter(
+    "api_alert_firings_total", "Alertas activadas (request: /execute_alerts, rule: reglas continuas)",
+    ("origin",))
+MAIL_SENDS = Counter("api_mail_sends_total", "Intentos de envío de correo por resultado", ("result",))
+REQUESTS_IN_FLIGHT = Gauge("api_requests_in_flight", "Peticiones HTTP en curso")
+POOL_CONNECTIONS = Gauge(
+    "api_db_pool_connections", "Conexiones del pool por estado", ("state",), callback=_pool_connections)
+POOL_MAX_CONNECTIONS = Gauge(
+    "api_db_pool_max_connections", "Tamaño máximo del pool de conexiones", callback=_pool_max_connections)
+
+
+def observe_phases(endpoint, query_type, phases):
+    """
+    Registra el tiempo de cada fase de una consulta de frames.
+
+    Args:
+        endpoint: Ruta del endpoint (la misma etiqueta que api_request_duration_seconds)
+        query_type: Tipo de consulta o "mixed" en los lotes
+        phases: Diccionario {fase: segundos} con las fases medidas
+    """
+    query_type = str(query_type)
+    for phase, seconds in phases.items():
+        QUERY_PHASE_DURATION.observe(seconds, (endpoint, query_type, phase))
+
+
+def observe_query(query_type, source, elapsed, phases, rows):
+    """
+    Registra una solicitud de /receive_characteristics resuelta.
+
+    Args:
+        query_type: Tipo de consulta (FrameCharacteristics.type)
+        source: Origen del resultado ("db", "cache" o "columnar")
+        elapsed: Segundos totales de la solicitud
+        phases: Diccionario {fase: segundos} con las fases medidas
+        rows: Número de filas devueltas
+    """
+    QUERY_DURATION.observe(elapsed, (str(query_type), source))
+    observe_phases("/receive_characteristics", query_type, phases)
+    ROWS_RETURNED.inc((str(query_type),), rows)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide la latencia de cada petición por endpoint (la
+    ruta declarada, no la URL, para no crear una serie por cada id) y cuenta
+    las peticiones en curso.
+
+    Es un middleware ASGI simple y no un BaseHTTPMiddleware, que añade una
+    tarea y un canal por petición. El tiempo se toma al enviar el último
+    fragmento del cuerpo, así que las respuestas en streaming se miden enteras.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        state = {"status": 500, "done": False}
+
+        def observe():
+            state["done"] = True
+            # El router guarda en el scope la ruta que atendió la petición
+            route = scope.get("route")
+            endpoint = route.path if route is not None else "unmatched"
+            REQUEST_DURATION.observe(time.perf_counter() - start,
+                                     (endpoint, scope["method"], str(state["status"])))
+
+        async def send_and_measure(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                observe()
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            if not state["done"]:
+                observe()
+            REQUESTS_IN_FLIGHT.dec()
@@ -1,5 +1,5 @@
 # app/models.py
-from pydantic import BaseModel
+from pydantic import BaseModel, conint, constr
 from typing import List
 from typing import Optional
 
@@ -56,6 +56,26 @@ Tipo2 (Objeto):
 Tipo3 (Prioridad):
     - video_name
     - object_name
+Tipo4 (Texto en las descripciones):
+    - text
+    - limit
+Tipo5 (Región de la imagen):
+    - object_name
+    - video_name
+    - region o polygon
+    - spatial_op
+Tipo6 (Ventana temporal):
+    - video_name
+    - object_name (opcional)
+    - sec_from, sec_to
+Tipo7 (Coincidencia temporal):
+    - object_name
+    - other_object
+    - window
+Tipo8 (Escenario y objeto combinados):
+    - object_name, color, proximity
+    - environment_type, weather, time_of_day, crowd_level, lighting
+    - size, orientation
 """
 class FrameCharacteristics(BaseModel):
     type: int
@@ -64,8 +84,71 @@ class FrameCharacteristics(BaseModel):
     object_name: Optional[str]  
     color: Optional[str] 
     proximity: Optional[str]
+    text: Optional[str] = None                  # Términos de búsqueda (tipo 4)
+    limit: Optional[int] = None                 # Máximo de resultados (tipo 4)
+    region: Optional[List[float]] = None        # Rectángulo [x1, y1, x2, y2] (tipo 5)
+    polygon: Optional[List[List[float]]] = None # Vértices [[x, y], ...] (tipo 5)
+    spatial_op: Optional[str] = None            # "inside" (por defecto) u "overlaps" (tipo 5)
+    sec_from: Optional[int] = None              # Primer segundo del rango (tipo 6)
+    sec_to: Optional[int] = None                # Último segundo del rango (tipo 6)
+    other_object: Optional[str] = None          # Objeto que debe coincidir (tipo 7)
+    window: Optional[int] = None                # Segundos máximos de separación (tipo 7)
+    weather: Optional[str] = None               # Atributos del escenario (tipo 8)
+    time_of_day: Optional[str] = None
+    crowd_level: Optional[str] = None
+    lighting: Optional[str] = None
+    size: Optional[str] = None                  # Filtros de features (tipo 8)
+    orientation: Optional[str] = None
 
 
 class Alert(BaseModel):
     alert: str
     sql: str
+
+
+# Regla de alerta persistente evaluada de forma continua sobre los datos nuevos
+class AlertRule(BaseModel):
+    name: str                                   # Nombre único de la regla
+    object_name: str                            # Objeto a vigilar
+    color: Optional[str] = None                 # Filtro opcional de color
+    proximity: Optional[str] = None             # Filtro opcional de proximidad
+    video_name: Optional[str] = None            # Filtro opcional de video
+    min_count: int = 1                          # Objetos mínimos en el mismo segundo
+    enabled: bool = True
+    backfill: bool = False                      # Evaluar también los datos ya existentes
+
+
+# Tipos de la ingesta: enteros que caben en int4 y etiquetas que caben en
+# un enum del almacenamiento compacto; lo que no cabe se rechaza con 422
+Int4 = conint(ge=-2**31, le=2**31 - 1)
+Label = constr(min_length=1, max_length=63)
+
+
+# Detección de un objeto en un frame, tal como la envían los nodos detectores
+class Detection(BaseModel):
+    object_name: Label                          # Clase del objeto detectado
+    x1: Int4                                    # Esquina del bounding box
+    y1: Int4
+    x2: Int4                                    # Esquina opuesta del bounding box
+    y2: Int4
+    color: Optional[Label] = None               # Color dominante
+    proximity: Optional[Label] = None           # Proximidad (near, middle, far)
+
+
+# Descripción de un objeto en un frame
+class FeatureDetection(BaseModel):
+    object_name: Label
+    description: Optional[str] = None
+    color1: Optional[Label] = None
+    color2: Optional[Label] = None
+    size: Optional[Label] = None
+    orientation: Optional[Label] = None
+    type: Optional[Label] = None
+
+
+# Detecciones de un segundo de video para la ingesta
+class FrameDetections(BaseModel):
+    video_name: Label                           # Nombre del video
+    sec: Int4                                   # Segundo del video
+    objects: List[Detection] = []               # Objetos detectados (tabla objects)
+    features: List[FeatureDetection] = []       # Descripciones (tabla features)
@@ -0,0 +1,229 @@
+# app/notifications.py
+import os
+import json
+import time
+import asyncio
+
+from app.mailer import build_message, transport_from_env
+from app.metrics import MAIL_SENDS
+from app.logger_config import setup_logger
+
+# Configurar el logger
+logger = setup_logger(__name__)
+
+
+def build_digest(firings, recipient):
+    """
+    Construye un único correo con todas las alertas activadas de un lote.
+
+    Args:
+        firings: Lista de diccionarios {"alert": nombre, "result": filas}
+        recipient: Dirección de destino
+
+    Returns:
+        EmailMessage listo para enviarse
+    """
+    if len(firings) == 1:
+        subject = f"Alerta activada: {firings[0]['alert']}"
+    else:
+        subject = f"{len(firings)} alertas activadas"
+
+    sections = []
+    for firing in firings:
+        sections.append(f"""
+                <h3>Se activó una alerta:</h3>
+                <p><strong>{firing['alert']}</strong></p>
+                <pre>{json.dumps(firing['result'], indent=2, default=str)}</pre>
+                """)
+
+    return build_message(subject, recipient, "<hr>".join(sections))
+
+
+class AlertDispatcher:
+    """
+    Cola de envío de correos de alertas en segundo plano.
+
+    Las alertas activadas se encolan sin esperar al SMTP. Un worker agrupa las
+    que llegan dentro de una ventana de tiempo en un único correo resumen y lo
+    envía con reintentos. La cola tiene tamaño máximo: cuando está llena las
+    nuevas alertas se rechazan en lugar de acumular memoria sin límite.
+    """
+
+    def __init__(self, send, recipient, maxsize=1000, batch_window=2.0, max_batch=50,
+                 max_retries=3, retry_backoff=1.0):
+        """
+        Args:
+            send: Corrutina que recibe un EmailMessage y lo envía
+            recipient: Dirección de destino de los correos
+            maxsize: Número máximo de alertas en cola
+            batch_window: Segundos que se esperan para agrupar alertas en un correo
+            max_batch: Número máximo de alertas por correo
+            max_retries: Reintentos de envío de cada correo
+            retry_backoff: Segundos de espera base entre reintentos (crece exponencialmente)
+        """
+        self.send = send
+        self.recipient = recipient
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self._task = None
+
+        self.stats = {
+            "queued": 0,
+            "rejected": 0,
+            "emails_sent": 0,
+            "alerts_sent": 0,
+            "send_failures": 0,
+            "alerts_dropped": 0,
+        }
+
+    def submit(self, alert, result):
+        """
+        Encola una alerta activada sin bloquear.
+
+        Args:
+            alert: Nombre de la alerta
+            result: Filas que activaron la alerta
+
+        Returns:
+            True si se encoló, False si la cola está llena
+        """
+        try:
+            self.queue.put_nowait({"alert": alert, "result": result, "queued_at": time.monotonic()})
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            logger.warning("Cola de alertas llena: se rechaza la alerta %s", alert)
+            return False
+        self.stats["queued"] += 1
+        return True
+
+    async def _collect_batch(self):
+        """Espera la primera alerta y agrupa las que lleguen durante la ventana."""
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _deliver(self, batch):
+        try:
+            message = build_digest(batch, self.recipient)
+        except Exception as e:
+            # Un lote que no se puede convertir en correo no se reintenta
+            logger.error("Error al construir el correo de %d alertas: %s", len(batch), e)
+            self.stats["alerts_dropped"] += len(batch)
+            return False
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await self.send(message)
+                self.stats["emails_sent"] += 1
+                MAIL_SENDS.inc(("sent",))
+                self.stats["alerts_sent"] += len(batch)
+                logger.info("Correo con %d alertas enviado a: %s", len(batch), self.recipient)
+                return True
+            except Exception as e:
+                self.stats["send_failures"] += 1
+                MAIL_SENDS.inc(("failed",))
+                logger.error("Error al enviar correo (intento %d/%d): %s", attempt, self.max_retries, e)
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+        self.stats["alerts_dropped"] += len(batch)
+        return False
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            try:
+                await self._deliver(batch)
+            except Exception as e:
+                # Un lote que falla no debe detener el worker: la cola se llenaría sin vaciarse
+                logger.error("Error al entregar un lote de %d alertas: %s", len(batch), e)
+                self.stats["alerts_dropped"] += len(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def start(self):
+        """Arranca el worker de envío en el event loop actual."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, timeout=10.0):
+        """
+        Espera a que se envíen las alertas pendientes y detiene el worker.
+
+        Args:
+            timeout: Segundos máximos de espera para vaciar la cola
+        """
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Quedaron %d alertas sin enviar al detener la cola", self.queue.qsize())
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_stats(self):
+        """Devuelve las métricas de la cola de envío."""
+        return {**self.stats, "pending": self.queue.qsize()}
+
+
+# Cola global de envío de alertas y transporte SMTP de la aplicación
+_dispatcher = None
+_transport = None
+
+
+def get_dispatcher():
+    """
+    Devuelve la cola global de envío, creándola con la configuración de variables de entorno.
+
+    Returns:
+        AlertDispatcher
+    """
+    global _dispatcher, _transport
+    if _dispatcher is None:
+        # Transporte con sesiones SMTP persistentes creado una vez por aplicación
+        _transport = transport_from_env()
+        _dispatcher = AlertDispatcher(
+            _transport.send_async,
+            os.environ.get("MAIL_TO"),
+            maxsize=int(os.environ.get("ALERT_QUEUE_SIZE", "1000")),
+            batch_window=float(os.environ.get("ALERT_BATCH_WINDOW", "2")),
+            max_batch=int(os.environ.get("ALERT_MAX_BATCH", "50")),
+            max_retries=int(os.environ.get("ALERT_MAIL_RETRIES", "3")),
+        )
+    return _dispatcher
+
+
+async def start_dispatcher():
+    """Crea y arranca la cola global de envío."""
+    get_dispatcher().start()
+
+
+async def stop_dispatcher():
+    """Vacía y detiene la cola global de envío y cierra las sesiones SMTP."""
+    global _dispatcher, _transport
+    if _dispatcher is not None:
+        await _dispatcher.stop()
+        _dispatcher = None
+    if _transport is not None:
+        _transport.close()
+        _transport = None
+
+
+def get_transport_stats():
+    """Devuelve las métricas del transporte SMTP o None si no se ha creado."""
+    return _transport.get_stats() if _transport is not None else None
@@ -0,0 +1,577 @@
+# app/queries.py
+import os
+import re
+import json
+import time
+import base64
+import binascii
+import threading
+
+import psycopg2
+import psycopg2.errors
+
+from app.logger_config import setup_logger
+
+# Configurar el logger
+logger = setup_logger(__name__)
+
+# Formas fijas de las consultas de FrameCharacteristics. Cada combinación de tipo
+# y filtros opcionales tiene un nombre y un texto SQL parametrizado, de forma que
+# PostgreSQL solo analiza y planifica cada forma una vez por conexión.
+STATEMENTS = {
+    # Tipo 1 (escenarios)
+    "frame_t1": "SELECT video_name FROM scenarios WHERE environment_type = %s",
+    # Tipo 2 (objetos) con sus filtros opcionales
+    "frame_t2": "SELECT video_name, sec FROM objects WHERE object_name = %s",
+    "frame_t2_color": "SELECT video_name, sec FROM objects WHERE object_name = %s AND color = %s",
+    "frame_t2_proximity": "SELECT video_name, sec FROM objects WHERE object_name = %s AND proximity = %s",
+    "frame_t2_color_proximity": (
+        "SELECT video_name, sec FROM objects "
+        "WHERE object_name = %s AND color = %s AND proximity = %s"
+    ),
+    # Tipo 3 (conteo de objetos por segundo): se lee de la tabla resumen
+    # object_counts, ya ordenada por el índice (object_name, object_count DESC)
+    "frame_t3": (
+        "SELECT video_name, sec, object_count FROM object_counts "
+        "WHERE object_name = %s ORDER BY object_count DESC"
+    ),
+}
+
+# Claves de orden para la paginación por keyset de cada tipo de consulta
+PAGE_KEYS = {
+    1: ("video_name",),
+    2: ("video_name", "sec"),
+    3: ("video_name", "sec"),
+    5: ("video_name", "sec"),
+    6: ("video_name", "sec"),
+    7: ("video_name", "sec"),
+    8: ("video_name", "sec"),
+}
+
+# Tipos en los que cada clave de página aparece una sola vez
+UNIQUE_PAGE_KEYS = {3, 7, 8}
+
+# Tipo 6 (ventana temporal): detecciones de un video entre dos segundos,
+# opcionalmente de un solo objeto. Son rangos sobre los índices
+# (video_name, sec) y (object_name, video_name, sec).
+STATEMENTS.update({
+    "frame_t6": (
+        "SELECT video_name, sec, object_name FROM objects "
+        "WHERE video_name = %s AND sec BETWEEN %s AND %s ORDER BY sec"
+    ),
+    "frame_t6_object": (
+        "SELECT video_name, sec, object_name FROM objects "
+        "WHERE object_name = %s AND video_name = %s AND sec BETWEEN %s AND %s ORDER BY sec"
+    ),
+    # Tipo 7 (coincidencia temporal): segundos en los que aparece un objeto
+    # con otro objeto a `window` segundos o menos en el mismo video, y el
+    # segundo más cercano del otro objeto. Se leen de object_counts, con una
+    # fila por (objeto, video, segundo): por cada segundo del primer objeto se
+    # recorre solo el rango [sec - window, sec + window] de la clave primaria.
+    "frame_t7": (
+        "SELECT video_name, sec, other_sec FROM object_counts a "
+        "CROSS JOIN LATERAL ("
+        "SELECT b.sec AS other_sec FROM object_counts b "
+        "WHERE b.object_name = %s AND b.video_name = a.video_name "
+        "AND b.sec BETWEEN a.sec - %s AND a.sec + %s "
+        "ORDER BY abs(b.sec - a.sec), b.sec LIMIT 1"
+        ") nearest "
+        "WHERE a.object_name = %s ORDER BY video_name, sec"
+    ),
+})
+
+# Tipo 5 (consultas espaciales): región de la consulta como rectángulo o
+# polígono. El rectángulo se compara directamente con el índice GiST de bbox;
+# el polígono primero por su rectángulo envolvente (con el índice) y después
+# de forma exacta.
+SPATIAL_REGIONS = ("box", "polygon")
+SPATIAL_OPS = {
+    # Detección completamente dentro de la región
+    "inside": {
+        "box": "bbox <@ box(point(%s, %s), point(%s, %s))",
+        "polygon": "bbox <@ box(%s::polygon) AND polygon(bbox) <@ %s::polygon",
+    },
+    # Detección que comparte algún punto con la región
+    "overlaps": {
+        "box": "bbox && box(point(%s, %s), point(%s, %s))",
+        "polygon": "bbox && box(%s::polygon) AND polygon(bbox) && %s::polygon",
+    },
+}
+
+
+def _add_spatial_statements():
+    """Genera las formas del tipo 5 para cada operación, región y filtro opcional de video."""
+    for op, predicates in SPATIAL_OPS.items():
+        for region in SPATIAL_REGIONS:
+            base = "SELECT video_name, sec, x1, y1, x2, y2 FROM objects WHERE object_name = %s"
+            STATEMENTS[f"frame_t5_{op}_{region}"] = f"{base} AND {predicates[region]}"
+            STATEMENTS[f"frame_t5_{op}_{region}_video"] = f"{base} AND video_name = %s AND {predicates[region]}"
+
+
+_add_spatial_statements()
+
+
+def _page_statements(name, sql):
+    """
+    Genera las formas paginadas de una consulta: primera página (`_page`),
+    páginas siguientes (`_page_after`) y, para los tipos cuyas claves se
+    repiten (fuera de UNIQUE_PAGE_KEYS), la consulta que completa el último
+    grupo de una página (`_key`).
+
+    Returns:
+        Diccionario {nombre de la forma: SQL}
+    """
+    query_type = int(name[len("frame_t")])
+    keys = PAGE_KEYS[query_type]
+    columns = ", ".join(keys)
+    order = f" ORDER BY {columns} LIMIT %s"
+    after = f" AND ({columns}) > ({', '.join(['%s'] * len(keys))})"
+    equal = "".join(f" AND {key} = %s" for key in keys)
+
+    # Solo se sustituye el ORDER BY final (el tipo 7 tiene otro en una subconsulta)
+    base = sql.rsplit(" ORDER BY ", 1)[0]
+    forms = {name + "_page": base + order, name + "_page_after": base + after + order}
+    # En los tipos de UNIQUE_PAGE_KEYS cada clave aparece una sola vez
+    if query_type not in UNIQUE_PAGE_KEYS:
+        forms[name + "_key"] = base + equal
+    return forms
+
+
+def _add_page_statements():
+    """Añade a STATEMENTS las formas paginadas de todas las consultas."""
+    for name in list(STATEMENTS):
+        STATEMENTS.update(_page_statements(name, STATEMENTS[name]))
+
+
+_add_page_statements()
+
+# Límites del rango de segundos del tipo 6 cuando la solicitud no los indica
+TIMELINE_START = 0
+TIMELINE_END = 2 ** 31 - 1
+
+# Configuración de búsqueda de texto: la misma con la que deploy_postgres.py
+# genera las columnas description_tsv de scenarios y features
+TEXT_SEARCH_CONFIG = "english"
+
+# Filas que devuelve el tipo 4 si la solicitud no indica `limit`, y máximo permitido
+TEXT_SEARCH_LIMIT = int(os.environ.get("TEXT_SEARCH_LIMIT", "100"))
+TEXT_SEARCH_MAX_LIMIT = int(os.environ.get("TEXT_SEARCH_MAX_LIMIT", "1000"))
+
+# Tipo 4 (búsqueda de texto en las descripciones): los índices GIN sobre
+# description_tsv devuelven solo las filas que contienen los términos. Se
+# ordena por relevancia con un límite, así que no tiene paginación por keyset.
+# Las descripciones de escenario no tienen segundo (sec es NULL).
+STATEMENTS["frame_t4"] = (
+    "SELECT video_name, sec, MAX(score) AS score FROM ("
+    "SELECT f.video_name::text AS video_name, f.sec, ts_rank(f.description_tsv, query) AS score "
+    f"FROM features f, websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', %s) query "
+    "WHERE f.description_tsv @@ query "
+    "UNION ALL "
+    "SELECT s.video_name::text, NULL::int, ts_rank(s.description_tsv, query) "
+    f"FROM scenarios s, websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', %s) query "
+    "WHERE s.description_tsv @@ query"
+    ") hits GROUP BY video_name, sec ORDER BY score DESC, video_name, sec LIMIT %s"
+)
+
+# Consultas combinadas para lotes: resuelven varios valores de filtro en una sola ejecución
+STATEMENTS.update({
+    "batch_t1": (
+        "SELECT environment_type, video_name FROM scenarios "
+        "WHERE environment_type = ANY(%s)"
+    ),
+    "batch_t3": (
+        "SELECT object_name, video_name, sec, object_count FROM object_counts "
+        "WHERE object_name = ANY(%s) ORDER BY object_name, object_count DESC"
+    ),
+})
+
+# Forma simple que puede combinarse en lote para cada tipo de consulta
+BATCH_COMBINABLE = {"frame_t1": "batch_t1", "frame_t3": "batch_t3"}
+
+# Texto SQL original de cada forma, antes de adaptarlo al almacenamiento compacto
+_BASE_STATEMENTS = dict(STATEMENTS)
+
+# Columnas de objects guardadas como etiquetas enum (almacenamiento compacto) y su tipo
+LABEL_COLUMNS = {}
+
+# Tipo 8 (escenario y objeto combinados): filtros opcionales de objects, de
+# atributos del escenario del video y de features sobre la misma detección
+OBJECT_FILTERS = ("color", "proximity")
+SCENARIO_FILTERS = ("environment_type", "weather", "time_of_day", "crowd_level", "lighting")
+FEATURE_FILTERS = ("size", "orientation")
+COMBINED_FILTERS = OBJECT_FILTERS + SCENARIO_FILTERS + FEATURE_FILTERS
+
+# Las formas del tipo 8 (una por combinación de filtros) se generan al usarse por primera vez
+_register_lock = threading.Lock()
+
+# Contadores de uso de las sentencias preparadas
+_stats_lock = threading.Lock()
+_stats = {"prepares": 0, "executions": 0, "reuses": 0, "by_statement": {}}
+
+
+class FrameQuery:
+    """Consulta parametrizada lista para ejecutarse: nombre de la forma, SQL y parámetros."""
+
+    def __init__(self, name, params):
+        self.name = name
+        self.sql = STATEMENTS[name]
+        self.params = tuple(params)
+
+    def __repr__(self):
+        return f"FrameQuery({self.name}, {self.params})"
+
+
+def build_frame_query(frame):
+    """
+    Construye la consulta parametrizada para un FrameCharacteristics.
+
+    Args:
+        frame: Objeto FrameCharacteristics con los parámetros de consulta
+
+    Returns:
+        FrameQuery o None si el tipo no es válido
+    """
+    if frame.type == 1:
+        return FrameQuery("frame_t1", [frame.environment_type])
+
+    if frame.type == 2:
+        name = "frame_t2"
+        params = [frame.object_name]
+        # Agregar filtros opcionales
+        if frame.color:
+            name += "_color"
+            params.append(frame.color)
+        if frame.proximity:
+            name += "_proximity"
+            params.append(frame.proximity)
+        return FrameQuery(name, params)
+
+    if frame.type == 3:
+        return FrameQuery("frame_t3", [frame.object_name])
+
+    if frame.type == 5:
+        return build_spatial_query(frame)
+
+    if frame.type == 6:
+        if not frame.video_name:
+            return None
+        sec_range = [TIMELINE_START if frame.sec_from is None else frame.sec_from,
+                     TIMELINE_END if frame.sec_to is None else frame.sec_to]
+        if frame.object_name:
+            return FrameQuery("frame_t6_object", [frame.object_name, frame.video_name] + sec_range)
+        return FrameQuery("frame_t6", [frame.video_name] + sec_range)
+
+    if frame.type == 7:
+        window = frame.window or 0
+        if not frame.object_name or not frame.other_object or window < 0:
+            return None
+        return FrameQuery("frame_t7", [frame.other_object, window, window, frame.object_name])
+
+    if frame.type == 8:
+        return build_combined_query(frame)
+
+    if frame.type == 4:
+        if not frame.text:
+            return None
+        limit = min(max(frame.limit or TEXT_SEARCH_LIMIT, 1), TEXT_SEARCH_MAX_LIMIT)
+        return FrameQuery("frame_t4", [frame.text, frame.text, limit])
+
+    return None
+
+
+def build_spatial_query(frame):
+    """
+    Construye la consulta tipo 5: detecciones de un objeto dentro de una región
+    (`spatial_op` "inside", por defecto) o que se solapan con ella ("overlaps").
+    La región es un rectángulo `region` [x1, y1, x2, y2], en cualquier orden de
+    esquinas, o un polígono `polygon` [[x, y], ...] con al menos tres vértices.
+
+    Args:
+        frame: Objeto FrameCharacteristics con los parámetros de consulta
+
+    Returns:
+        FrameQuery o None si faltan parámetros o no son válidos
+    """
+    op = frame.spatial_op or "inside"
+    if not frame.object_name or op not in SPATIAL_OPS:
+        return None
+
+    if frame.region is not None:
+        if frame.polygon is not None or len(frame.region) != 4:
+            return None
+        region = "box"
+        region_params = list(frame.region)
+    elif frame.polygon is not None:
+        if len(frame.polygon) < 3 or any(len(point) != 2 for point in frame.polygon):
+            return None
+        region = "polygon"
+        polygon = "(" + ", ".join(f"({float(x)}, {float(y)})" for x, y in frame.polygon) + ")"
+        # El polígono se usa dos veces: rectángulo envolvente y comparación exacta
+        region_params = [polygon, polygon]
+    else:
+        return None
+
+    name = f"frame_t5_{op}_{region}"
+    params = [frame.object_name]
+    if frame.video_name:
+        name += "_video"
+        params.append(frame.video_name)
+    return FrameQuery(name, params + region_params)
+
+
+def _combined_sql(used):
+    """
+    SQL del tipo 8 para los filtros de COMBINED_FILTERS indicados en `used`.
+
+    Es una sola consulta sobre objects (por el índice de object_name) con
+    semi-joins: los videos cuyo escenario cumple los atributos y, si hay
+    filtros de features, la existencia de una descripción del mismo objeto
+    en el mismo segundo. Las columnas se comparan como texto porque scenarios
+    y features pueden no usar las mismas etiquetas enum que objects.
+    """
+    sql = "SELECT DISTINCT video_name, sec FROM objects WHERE object_name = %s"
+    sql += "".join(f" AND {column} = %s" for column in OBJECT_FILTERS if column in used)
+    scenario = [f"s.{column} = %s" for column in SCENARIO_FILTERS if column in used]
+    if scenario:
+        sql += (" AND video_name::text IN (SELECT s.video_name FROM scenarios s "
+                f"WHERE {' AND '.join(scenario)})")
+    feature = [f"f.{column}::text = %s" for column in FEATURE_FILTERS if column in used]
+    if feature:
+        sql += (" AND EXISTS (SELECT 1 FROM features f WHERE f.video_name::text = objects.video_name::text "
+                "AND f.sec = objects.sec AND f.object_name::text = objects.object_name::text "
+                f"AND {' AND '.join(feature)})")
+    return sql + " ORDER BY video_name, sec"
+
+
+def _register_statement(name, sql):
+    """Añade una forma generada bajo demanda y sus formas paginadas."""
+    with _register_lock:
+        if name in STATEMENTS:
+            return
+        forms = {name: sql, **_page_statements(name, sql)}
+        _BASE_STATEMENTS.update(forms)
+        STATEMENTS.update({form: _label_sql(form_sql) for form, form_sql in forms.items()})
+
+
+def build_combined_query(frame):
+    """
+    Construye la consulta tipo 8: pares (video_name, sec) en los que aparece
+    un objeto con sus filtros opcionales, en videos cuyo escenario cumple
+    los atributos indicados y, opcionalmente, con una descripción en features
+    del mismo objeto y segundo que cumple los filtros de features.
+
+    Args:
+        frame: Objeto FrameCharacteristics con los parámetros de consulta
+
+    Returns:
+        FrameQuery o None si falta object_name
+    """
+    if not frame.object_name:
+        return None
+    used = [column for column in COMBINED_FILTERS if getattr(frame, column)]
+    # El nombre codifica los filtros usados como máscara de bits (corto, por el límite de
+    # longitud de los nombres de PostgreSQL)
+    mask = sum(1 << index for index, column in enumerate(COMBINED_FILTERS) if column in used)
+    name = f"frame_t8_{mask:x}"
+    if name not in STATEMENTS:
+        _register_statement(name, _combined_sql(used))
+    return FrameQuery(name, [frame.object_name] + [getattr(frame, column) for column in used])
+
+
+def build_page_query(frame, after, limit):
+    """
+    Construye la consulta de una página ordenada por la clave keyset del tipo.
+
+    Args:
+        frame: Objeto FrameCharacteristics con los parámetros de consulta
+        after: Valores de la clave de la última fila de la página anterior (o None)
+        limit: Número máximo de filas de la página
+
+    Returns:
+        FrameQuery o None si el tipo no es válido o no admite paginación
+    """
+    query = build_frame_query(frame)
+    if query is None or query.name + "_page" not in STATEMENTS:
+        return None
+    if after is None:
+        return FrameQuery(query.name + "_page", list(query.params) + [limit])
+    return FrameQuery(query.name + "_page_after", list(query.params) + list(after) + [limit])
+
+
+def build_key_query(frame, key):
+    """
+    Construye la consulta que devuelve todas las filas con una clave keyset concreta.
+
+    Args:
+        frame: Objeto FrameCharacteristics con los parámetros de consulta
+        key: Valores de la clave
+
+    Returns:
+        FrameQuery o None si el tipo no necesita completar grupos
+    """
+    query = build_frame_query(frame)
+    if query is None or query.name + "_key" not in STATEMENTS:
+        return None
+    return FrameQuery(query.name + "_key", list(query.params) + list(key))
+
+
+def encode_cursor(key):
+    """Codifica la clave keyset de la última fila como cursor opaco."""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode()
+
+
+def decode_cursor(cursor, query_type):
+    """
+    Decodifica un cursor opaco generado por encode_cursor.
+
+    Args:
+        cursor: Cursor recibido del cliente
+        query_type: Tipo de consulta, para validar el número de valores
+
+    Returns:
+        Tupla con los valores de la clave
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("Cursor no válido")
+    if not isinstance(key, list) or len(key) != len(PAGE_KEYS.get(query_type, ())):
+        raise ValueError("Cursor no válido")
+    return tuple(key)
+
+
+def label_param(column):
+    """
+    Devuelve el marcador con el que se compara una columna de objects con un texto.
+
+    Si la columna se guarda como etiqueta enum, el texto pasa por enum_label(),
+    que devuelve NULL para un valor desconocido: la consulta devuelve cero filas
+    en lugar de fallar, igual que con la columna de texto.
+    """
+    if column in LABEL_COLUMNS:
+        return f"enum_label(NULL::{LABEL_COLUMNS[column]}, %s)"
+    return "%s"
+
+
+def _label_sql(sql):
+    """Adapta una consulta sobre objects a las columnas enum de LABEL_COLUMNS."""
+    if " FROM objects " not in sql:
+        return sql
+    for column in LABEL_COLUMNS:
+        sql = sql.replace(f"{column} = %s", f"{column} = {label_param(column)}")
+    return sql.replace("(video_name, sec) > (%s, %s)", f"(video_name, sec) > ({label_param('video_name')}, %s)")
+
+
+def configure_label_columns(conn):
+    """
+    Detecta qué columnas de objects usan el almacenamiento compacto (tipos enum)
+    y adapta el texto de las consultas. Se llama una vez al arrancar la API,
+    antes de preparar ninguna sentencia.
+
+    Args:
+        conn: Conexión a PostgreSQL
+
+    Returns:
+        Diccionario {columna: tipo enum}
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT a.attname, t.typname
+            FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid
+            WHERE a.attrelid = to_regclass('objects') AND a.attnum > 0
+              AND NOT a.attisdropped AND t.typtype = 'e'
+            """
+        )
+        columns = dict(cursor.fetchall())
+    LABEL_COLUMNS.clear()
+    LABEL_COLUMNS.update(columns)
+    for name, sql in _BASE_STATEMENTS.items():
+        STATEMENTS[name] = _label_sql(sql)
+    if columns:
+        logger.info("Almacenamiento compacto en objects: %s", ", ".join(sorted(columns)))
+    return columns
+
+
+def to_prepare_sql(sql):
+    """Convierte los marcadores %s de psycopg2 en parámetros posicionales $1..$n."""
+    counter = iter(range(1, sql.count("%s") + 1))
+    return re.sub(r"%s", lambda _: f"${next(counter)}", sql)
+
+
+def _count(name, prepared):
+    with _stats_lock:
+        _stats["executions"] += 1
+        if prepared:
+            _stats["prepares"] += 1
+        else:
+            _stats["reuses"] += 1
+        entry = _stats["by_statement"].setdefault(name, {"prepares": 0, "executions": 0})
+        entry["executions"] += 1
+        if prepared:
+            entry["prepares"] += 1
+
+
+def execute_prepared(conn, cursor, query, timings=None):
+    """
+    Ejecuta una FrameQuery como sentencia preparada, preparándola solo la
+    primera vez que se usa en la conexión.
+
+    Args:
+        conn: Conexión del pool (PooledConnection)
+        cursor: Cursor de la conexión
+        query: FrameQuery a ejecutar
+        timings: Diccionario opcional donde se guardan los segundos de las
+            fases "execute" (preparación y ejecución) y "fetch" (lectura de filas)
+
+    Returns:
+        Filas devueltas por la consulta
+    """
+    start = time.perf_counter()
+    prepared = False
+    if query.name not in conn.prepared:
+        try:
+            cursor.execute(f"PREPARE {query.name} AS {to_prepare_sql(query.sql)}")
+            prepared = True
+        except psycopg2.errors.DuplicatePreparedStatement:
+            conn.rollback()
+        conn.prepared.add(query.name)
+
+    placeholders = ", ".join(["%s"] * len(query.params))
+    try:
+        cursor.execute(f"EXECUTE {query.name} ({placeholders})", query.params)
+    except psycopg2.errors.InvalidSqlStatementName:
+        # La sesión perdió la sentencia: se olvida para prepararla de nuevo
+        conn.rollback()
+        conn.prepared.discard(query.name)
+        raise
+
+    _count(query.name, prepared)
+    if timings is None:
+        return cursor.fetchall()
+    fetch_start = time.perf_counter()
+    rows = cursor.fetchall()
+    timings["execute"] = fetch_start - start
+    timings["fetch"] = time.perf_counter() - fetch_start
+    return rows
+
+
+def get_plan_cache_stats():
+    """
+    Devuelve los contadores de sentencias preparadas.
+
+    Returns:
+        Diccionario con preparaciones, ejecuciones, reutilizaciones y tasa de acierto
+    """
+    with _stats_lock:
+        executions = _stats["executions"]
+        return {
+            "prepares": _stats["prepares"],
+            "executions": executions,
+            "reuses": _stats["reuses"],
+            "hit_ratio": round(_stats["reuses"] / executions, 4) if executions else 0.0,
+            "by_statement": {name: dict(entry) for name, entry in _stats["by_statement"].items()},
+        }
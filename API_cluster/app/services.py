@@ -1,15 +1,24 @@
 # app/services.py
 import os
 import sys
+import time
 import logging
 import psycopg2
 from app.models import FrameCharacteristics, Alert
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
+from app.db import get_db_params, get_pool, run_db, PoolTimeout
+from app.queries import (build_frame_query, build_page_query, build_key_query, execute_prepared,
+                         encode_cursor, decode_cursor, PAGE_KEYS, FrameQuery, BATCH_COMBINABLE)
+from app.cache import get_result_cache, read_data_version
+from app.columnar import get_columnar_engine
+from app.notifications import get_dispatcher
+from app.metrics import observe_query, observe_phases, ALERT_FIRINGS
+import asyncio
 import json
 
+from app.logger_config import setup_logger, log_request_summary
+
 # Configurar el logger
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
+logger = setup_logger(__name__)
 
 def connect_to_postgres():
     """
@@ -20,141 +29,405 @@ def connect_to_postgres():
         Conexión a la base de datos PostgreSQL
     """
     try:
-        # Obtener parámetros de conexión de variables de entorno o usar valores predeterminados
-        host = os.environ.get("DB_HOST", "postgres")
-        port = os.environ.get("DB_PORT", "5432")
-        user = os.environ.get("DB_USER", "postgres")
-        password = os.environ.get("DB_PASSWORD", "postgres")
-        dbname = os.environ.get("DB_NAME", "videodata")
-        
         # Establecer la conexión
-        conn = psycopg2.connect(
-            host=host,
-            port=port,
-            user=user,
-            password=password,
-            dbname=dbname
-        )
+        conn = psycopg2.connect(**get_db_params())
         logger.info("Conexión exitosa a PostgreSQL.")
         return conn
     except Exception as e:
-        logger.error(f"Error al conectar con PostgreSQL: {e}")
+        logger.error("Error al conectar con PostgreSQL: %s", e)
         return None
 
-def execute_query(cursor, query):
+def execute_prepared_query(conn, cursor, query, timings=None):
     """
-    Ejecuta una consulta SQL en PostgreSQL.
+    Ejecuta una consulta parametrizada como sentencia preparada en PostgreSQL.
     
     Args:
+        conn: Conexión del pool donde se prepara la sentencia
         cursor: Cursor de la conexión PostgreSQL
-        query: Consulta SQL a ejecutar
+        query: FrameQuery construida por build_frame_query
+        timings: Diccionario opcional donde se guardan los tiempos de ejecución y lectura
         
     Returns:
-        Resultados de la consulta o lista vacía en caso de error
+        Resultados de la consulta o None en caso de error. Tras un error la
+        transacción se deshace, así que la conexión puede seguir usándose
     """
     try:
-        # Ejecutar la consulta
-        logger.info(f"Ejecutando consulta: {query}")
-        cursor.execute(query)
-        # Obtener los resultados
-        resultados = cursor.fetchall()
-        return resultados
+        logger.debug("Ejecutando consulta preparada: %s", query, extra={"sample": "request"})
+        return execute_prepared(conn, cursor, query, timings)
+    except psycopg2.OperationalError:
+        raise
     except Exception as e:
-        logger.error(f"Error al ejecutar la consulta: {e}")
-        return []
+        logger.error("Error al ejecutar la consulta: %s", e)
+        # Las consultas son de solo lectura: deshacer la transacción abortada
+        # no pierde nada y evita que fallen las siguientes de la conexión
+        conn.rollback()
+        return None
+
+def format_row(query_type, row):
+    """
+    Formatea una fila de la consulta en JSON según el tipo de consulta.
+    
+    Args:
+        query_type: Tipo de consulta (1 a 8)
+        row: Fila devuelta por PostgreSQL
+        
+    Returns:
+        Diccionario con la fila formateada
+    """
+    if query_type == 1:
+        # Formato para consulta tipo 1 (escenarios)
+        return {"video_name": row[0]}
+
+    if query_type in (2, 8):
+        # Formato para consulta tipo 2 (objetos) y tipo 8 (escenario y objeto)
+        return {"video_name": row[0], "sec": row[1]}
+
+    if query_type == 6:
+        # Formato para consulta tipo 6 (ventana temporal)
+        return {"video_name": row[0], "sec": row[1], "object_name": row[2]}
+
+    if query_type == 7:
+        # Formato para consulta tipo 7 (coincidencia): segundo más cercano del otro objeto
+        return {"video_name": row[0], "sec": row[1], "other_sec": row[2]}
+
+    if query_type == 5:
+        # Formato para consulta tipo 5 (región): detección con su bounding box
+        return {"video_name": row[0], "sec": row[1], "x1": row[2], "y1": row[3], "x2": row[4], "y2": row[5]}
+
+    if query_type == 4:
+        # Formato para consulta tipo 4 (búsqueda de texto, sec es None en escenarios)
+        return {"video_name": row[0], "sec": row[1], "score": float(row[2])}
+
+    # Formato para consulta tipo 3 (conteo de objetos)
+    return {"video_name": row[0], "sec": row[1], "object_count": row[2]}
+
+def format_results(query_type, resultados):
+    """
+    Formatea las filas de la consulta en JSON según el tipo de consulta.
+    
+    Args:
+        query_type: Tipo de consulta (1 a 8)
+        resultados: Filas devueltas por PostgreSQL
+        
+    Returns:
+        Lista de diccionarios con los resultados
+    """
+    return [format_row(query_type, row) for row in resultados]
+
+def encode_json(data, phases=None):
+    """
+    Codifica la respuesta en JSON igual que JSONResponse de FastAPI.
+    
+    Args:
+        data: Resultado de la consulta
+        phases: Diccionario opcional donde se guarda el tiempo de la fase serialize
+        
+    Returns:
+        Cuerpo de la respuesta en bytes
+    """
+    start = time.perf_counter()
+    body = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    if phases is not None:
+        phases["serialize"] = time.perf_counter() - start
+    return body
 
 def start_frame_processing(frame: FrameCharacteristics):
     """
     Procesa una solicitud de análisis de frame según sus características.
     Ejecuta consultas SQL en PostgreSQL según el tipo de frame solicitado.
     
+    La respuesta se codifica aquí, en el hilo de la consulta, para medir la
+    codificación JSON como fase serialize junto con el resto de fases.
+    
     Args:
         frame: Objeto FrameCharacteristics con los parámetros de consulta
         
     Returns:
-        Lista de resultados formateados según el tipo de consulta
+        Cuerpo JSON con los resultados formateados según el tipo de consulta
     """
+    start = time.perf_counter()
+    # Segundos de cada fase de la solicitud para /metrics
+    phases = {}
     try:
-        # Conectar a PostgreSQL
-        conn = connect_to_postgres()
-        if not conn:
-            return {"message": "Error de conexión a la base de datos"}
-            
-        cursor = conn.cursor()
+        # Construir la consulta parametrizada según el tipo de frame
+        query = build_frame_query(frame)
+        phases["validation"] = time.perf_counter() - start
 
-        # Construir la consulta según el tipo de frame
-        query = ''
+        # Si no se ha construido una consulta válida
+        if query is None:
+            logger.error("Tipo de frame no reconocido: %s", frame.type)
+            return encode_json({"message": "Tipo de consulta no válido"})
 
-        if frame.type == 1:
-            # Consulta para escenarios (Tipo 1)
-            query = f"SELECT video_name FROM scenarios WHERE environment_type = '{frame.environment_type}'"
+        # Resolver en memoria con el motor columnar si está activado y cargado
+        engine = get_columnar_engine()
+        if engine is not None:
+            resultados = engine.query(frame)
+            if resultados is not None:
+                format_start = time.perf_counter()
+                response_data = format_results(frame.type, resultados)
+                phases["format"] = time.perf_counter() - format_start
+                body = encode_json(response_data, phases)
+                elapsed = time.perf_counter() - start
+                observe_query(frame.type, "columnar", elapsed, phases, len(response_data))
+                log_request_summary(logger, frame.type, len(response_data), 0.0,
+                                    elapsed * 1000, source="columnar")
+                return body
 
-        elif frame.type == 2:
-            # Consulta para objetos (Tipo 2)
-            query = f"SELECT video_name, sec FROM objects WHERE object_name = '{frame.object_name}'"
+        # Buscar el resultado en la caché (clave: forma de la consulta y parámetros)
+        cache = get_result_cache()
+        cache_key = (query.name, query.params)
+        if cache is not None:
+            cache.check_data_version(read_data_version)
+            # Versión antes de ejecutar la consulta: si cambia, el resultado no se guarda
+            data_version = cache.data_version
+            cached = cache.get(cache_key)
+            if cached is not None:
+                body = encode_json(cached, phases)
+                elapsed = time.perf_counter() - start
+                observe_query(frame.type, "cache", elapsed, phases, len(cached))
+                log_request_summary(logger, frame.type, len(cached), 0.0,
+                                    elapsed * 1000, source="cache")
+                return body
 
-            # Agregar filtros opcionales
-            if frame.color:
-                query += f" AND color = '{frame.color}'"
+        # Obtener los resultados de la consulta con una conexión del pool
+        db_start = time.perf_counter()
+        try:
+            with get_pool().connection() as conn:
+                phases["acquire"] = time.perf_counter() - db_start
+                with conn.cursor() as cursor:
+                    resultados = execute_prepared_query(conn, cursor, query, phases)
+        except (PoolTimeout, psycopg2.OperationalError) as e:
+            logger.error("Error al obtener conexión del pool: %s", e)
+            return encode_json({"message": "Error de conexión a la base de datos"})
+        db_ms = (time.perf_counter() - db_start) * 1000
 
-            if frame.proximity:
-                query += f" AND proximity = '{frame.proximity}'"
+        # Los errores de consulta devuelven una lista vacía que no se guarda en caché
+        cacheable = resultados is not None
+        resultados = resultados or []
 
-        elif frame.type == 3:   
-            # Consulta para contar objetos por video (Tipo 3)
-            query = f"SELECT video_name, sec, COUNT(*) AS object_count FROM objects WHERE object_name = '{frame.object_name}' GROUP BY video_name, sec ORDER BY object_count DESC"
-    
-        # Si no se ha construido una consulta válida
-        if not query:
-            logger.error(f"Tipo de frame no reconocido: {frame.type}")
-            return {"message": "Tipo de consulta no válido"}
+        # Las filas solo se registran en DEBUG y muestreadas
+        if logger.isEnabledFor(logging.DEBUG):
+            for fila in resultados:
+                logger.debug("Resultado: %s", fila, extra={"sample": "row"})
 
-        # Obtener los resultados de la consulta
-        resultados = execute_query(cursor, query)
+        # Formatear el resultado en JSON según el tipo de consulta
+        format_start = time.perf_counter()
+        response_data = format_results(frame.type, resultados)
+        phases["format"] = time.perf_counter() - format_start
 
-        if resultados:
-            logger.info(f"Se encontraron {len(resultados)} resultados")
-            for fila in resultados:
-                logger.info(f"Resultado: {fila}")
-        else:
-            logger.info("No se encontraron resultados.")
+        if cache is not None and cacheable:
+            cache.put(cache_key, frame.type, response_data, data_version)
 
-        # Cerrar la conexión a PostgreSQL
-        cursor.close()
-        conn.close()
+        body = encode_json(response_data, phases)
+        elapsed = time.perf_counter() - start
+        observe_query(frame.type, "db", elapsed, phases, len(response_data))
+        log_request_summary(logger, frame.type, len(response_data), db_ms, elapsed * 1000)
+        return body
+    
+    except Exception as e:
+        logger.error("Error al procesar el frame: %s", e)
+        return encode_json({"message": "Error en el procesamiento", "error": str(e)})
 
-        # Formatear el resultado en JSON según el tipo de consulta
-        response_data = []
+def stream_frame_results(frame: FrameCharacteristics, query, phases=None):
+    """
+    Genera los resultados de una consulta como NDJSON usando un cursor del
+    lado del servidor, de modo que la memoria usada no depende del número de filas.
+    
+    Las fases de cada bloque se suman y se registran al terminar el stream.
+    
+    Args:
+        frame: Objeto FrameCharacteristics con los parámetros de consulta
+        query: FrameQuery construida por build_frame_query
+        phases: Diccionario opcional con las fases ya medidas (validation)
+        
+    Yields:
+        Bloques de líneas JSON separadas por saltos de línea
+    """
+    batch_size = int(os.environ.get("STREAM_BATCH_SIZE", "2000"))
+    phases = dict(phases or {}, fetch=0.0, format=0.0, serialize=0.0)
+    total = 0
+    start = time.perf_counter()
+    with get_pool().connection() as conn:
+        phases["acquire"] = time.perf_counter() - start
+        # Los cursores con nombre se declaran en el servidor y se leen por bloques
+        with conn.cursor(name=f"stream_{query.name}") as cursor:
+            cursor.itersize = batch_size
+            # Con un cursor con nombre la consulta se ejecuta en el primer FETCH,
+            # así que su tiempo cuenta en fetch y execute solo mide el DECLARE
+            execute_start = time.perf_counter()
+            cursor.execute(query.sql, query.params)
+            phases["execute"] = time.perf_counter() - execute_start
+            while True:
+                fetch_start = time.perf_counter()
+                rows = cursor.fetchmany(batch_size)
+                format_start = time.perf_counter()
+                phases["fetch"] += format_start - fetch_start
+                if not rows:
+                    break
+                total += len(rows)
+                items = [format_row(frame.type, row) for row in rows]
+                serialize_start = time.perf_counter()
+                phases["format"] += serialize_start - format_start
+                chunk = "".join(json.dumps(item) + "\n" for item in items)
+                phases["serialize"] += time.perf_counter() - serialize_start
+                yield chunk
+    observe_phases("/receive_characteristics/stream", frame.type, phases)
+    logger.info("Streaming completado: %d filas para %s", total, query)
+
+def fetch_frame_page(frame: FrameCharacteristics, limit: int, cursor_token=None):
+    """
+    Obtiene una página de resultados con paginación por keyset sobre
+    (video_name, sec), o video_name en el tipo 1.
+    
+    Una página nunca parte un grupo de filas con la misma clave: si la última
+    clave de la página se repite, se incluyen todas sus filas.
+    
+    Args:
+        frame: Objeto FrameCharacteristics con los parámetros de consulta
+        limit: Número máximo de filas por página
+        cursor_token: Cursor opaco devuelto en la página anterior (o None)
+        
+    Returns:
+        Cuerpo JSON con las filas de la página y el cursor de la siguiente
         
-        if frame.type == 1:
-            # Formato para consulta tipo 1 (escenarios)
-            for row in resultados:
-                response_data.append({
-                    "video_name": row[0]
-                })
-
-        elif frame.type == 2:
-            # Formato para consulta tipo 2 (objetos)
-            for row in resultados:
-                response_data.append({
-                    "video_name": row[0],
-                    "sec": row[1],
-                })
-
-        elif frame.type == 3:
-            # Formato para consulta tipo 3 (conteo de objetos)
-            for row in resultados:
-                response_data.append({
-                    "video_name": row[0],
-                    "sec": row[1],
-                    "object_count": row[2]
-                })
-
-        return response_data
+    Raises:
+        ValueError: Si el tipo o el cursor no son válidos
+    """
+    start = time.perf_counter()
+    phases = {}
+    after = decode_cursor(cursor_token, frame.type) if cursor_token else None
+    query = build_page_query(frame, after, limit)
+    if query is None:
+        raise ValueError("Tipo de consulta no válido")
+    phases["validation"] = time.perf_counter() - start
+
+    db_start = time.perf_counter()
+    with get_pool().connection() as conn:
+        phases["acquire"] = time.perf_counter() - db_start
+        with conn.cursor() as cursor:
+            rows = execute_prepared(conn, cursor, query, phases)
+            next_cursor = None
+            if len(rows) == limit:
+                key_size = len(PAGE_KEYS[frame.type])
+                last_key = tuple(rows[-1][:key_size])
+                # Completar el último grupo para no saltarse filas en la página siguiente
+                key_query = build_key_query(frame, last_key)
+                if key_query is not None:
+                    rows = [row for row in rows if tuple(row[:key_size]) != last_key]
+                    key_phases = {}
+                    rows.extend(execute_prepared(conn, cursor, key_query, key_phases))
+                    for phase, seconds in key_phases.items():
+                        phases[phase] += seconds
+                next_cursor = encode_cursor(last_key)
+
+    format_start = time.perf_counter()
+    items = format_results(frame.type, rows)
+    phases["format"] = time.perf_counter() - format_start
+    body = encode_json({"items": items, "next_cursor": next_cursor}, phases)
+    observe_phases("/receive_characteristics/page", frame.type, phases)
+    return body
+
+def process_frame_batch(frames):
+    """
+    Procesa un lote de FrameCharacteristics con una sola conexión.
     
-    except Exception as e:
-        logger.error(f"Error al procesar el frame: {e}")
-        return {"message": "Error en el procesamiento", "error": str(e)}
+    Las solicitudes idénticas se ejecutan una sola vez, las que están en caché
+    no llegan a la base de datos y las consultas tipo 1 y tipo 3 de todo el
+    lote se combinan en una única consulta por tipo. Si la consulta combinada
+    falla, sus solicitudes se ejecutan por separado; una consulta que falla
+    devuelve un mensaje de error en su posición y no afecta a las demás.
+    
+    Las fases del lote se suman para todas sus consultas y se registran con
+    el tipo mixed.
+    
+    Args:
+        frames: Lista de objetos FrameCharacteristics
+        
+    Returns:
+        Cuerpo JSON con la lista de resultados en el mismo orden que las solicitudes
+    """
+    start = time.perf_counter()
+    phases = {"execute": 0.0, "fetch": 0.0, "format": 0.0}
+    queries = [build_frame_query(frame) for frame in frames]
+
+    # Deduplicar por forma de consulta y parámetros
+    unique = {}
+    for frame, query in zip(frames, queries):
+        if query is not None:
+            unique.setdefault((query.name, query.params), (frame.type, query))
+    logger.info("Lote de %d solicitudes, %d consultas distintas", len(frames), len(unique))
+    phases["validation"] = time.perf_counter() - start
+
+    def run_query(conn, cursor, query):
+        timings = {}
+        rows = execute_prepared_query(conn, cursor, query, timings)
+        for phase, seconds in timings.items():
+            phases[phase] += seconds
+        return rows
+
+    def format_timed(query_type, rows):
+        format_start = time.perf_counter()
+        items = format_results(query_type, rows)
+        phases["format"] += time.perf_counter() - format_start
+        return items
+
+    results = {}
+    cache = get_result_cache()
+    if cache is not None:
+        cache.check_data_version(read_data_version)
+        data_version = cache.data_version
+        for key in unique:
+            cached = cache.get(key)
+            if cached is not None:
+                results[key] = cached
+
+    pending = {key: value for key, value in unique.items() if key not in results}
+    if pending:
+        db_start = time.perf_counter()
+        try:
+            with get_pool().connection() as conn:
+                phases["acquire"] = time.perf_counter() - db_start
+                with conn.cursor() as cursor:
+                    # Combinar las consultas simples del mismo tipo en una sola
+                    for single_name, batch_name in BATCH_COMBINABLE.items():
+                        keys = [key for key in pending if key[0] == single_name]
+                        if not keys:
+                            continue
+                        values = [key[1][0] for key in keys]
+                        rows = run_query(conn, cursor, FrameQuery(batch_name, [values]))
+                        if rows is None:
+                            continue
+                        grouped = {value: [] for value in values}
+                        for row in rows:
+                            grouped[row[0]].append(row[1:])
+                        for key in keys:
+                            query_type = pending.pop(key)[0]
+                            results[key] = format_timed(query_type, grouped[key[1][0]])
+                            if cache is not None:
+                                cache.put(key, query_type, results[key], data_version)
+
+                    # El resto de consultas se ejecutan una tras otra en la misma conexión
+                    for key, (query_type, query) in pending.items():
+                        rows = run_query(conn, cursor, query)
+                        if rows is None:
+                            results[key] = {"message": "Error al ejecutar la consulta"}
+                            continue
+                        results[key] = format_timed(query_type, rows)
+                        if cache is not None:
+                            cache.put(key, query_type, results[key], data_version)
+        except (PoolTimeout, psycopg2.OperationalError) as e:
+            logger.error("Error al obtener conexión del pool: %s", e)
+            return encode_json([{"message": "Error de conexión a la base de datos"} for _ in frames])
+
+    response = []
+    for query in queries:
+        if query is None:
+            response.append({"message": "Tipo de consulta no válido"})
+        else:
+            response.append(results[(query.name, query.params)])
+    body = encode_json(response, phases)
+    observe_phases("/receive_characteristics/batch", "mixed", phases)
+    return body
 
 # def get_frame_task_status(task_id: str):
 #     """
@@ -176,72 +449,71 @@ def start_frame_processing(frame: FrameCharacteristics):
 #         return {"status": "Fallido", "error": str(task.result)}
 #     return {"status": "Estado desconocido"}
 
+def evaluate_alert(alert: Alert):
+    """
+    Ejecuta la consulta SQL de una alerta con una conexión del pool.
+
+    Args:
+        alert: Alerta con SQL asociado
+
+    Returns:
+        Filas devueltas por la consulta (lista vacía si no se activa)
+
+    Raises:
+        Exception: El error de la consulta, para que execute_alerts lo
+        informe en la alerta en lugar de darla por no activada
+    """
+    logger.info("⚠️ Ejecutando alerta: %s", alert.alert)
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            logger.debug("Ejecutando consulta: %s", alert.sql)
+            cursor.execute(alert.sql)
+            return cursor.fetchall()
+
 async def execute_alerts(alerts):
     """
     Ejecuta las alertas recibidas, ejecutando las consultas SQL asociadas en la base de datos.
 
+    Las consultas se ejecutan en paralelo con un máximo de ALERT_CONCURRENCY a la vez,
+    cada una con su propia conexión del pool. Las alertas activadas se encolan para
+    enviarse por correo en segundo plano, así que la respuesta no espera al SMTP.
+
     Args:
         alerts: Lista de alertas con SQL asociado
 
     Returns:
         Resultado de las alertas procesadas.
     """
-        
-    results = []
-    conn = connect_to_postgres()
-    if not conn:
-        return {"message": "Error de conexión a la base de datos"}
-    
-    cursor = conn.cursor()
-
-    conf = ConnectionConfig(
-        MAIL_USERNAME=os.environ.get("MAIL_USERNAME"),
-        MAIL_PASSWORD=os.environ.get("MAIL_PASSWORD"),
-        MAIL_FROM=os.environ.get("MAIL_FROM"),
-        MAIL_PORT=587,
-        MAIL_SERVER=os.environ.get("MAIL_SERVER"),
-        MAIL_STARTTLS=True,     # En lugar de MAIL_TLS
-        MAIL_SSL_TLS=False,     # En lugar de MAIL_SSL
-        USE_CREDENTIALS=True,
-        VALIDATE_CERTS=True
-    )
-    fm = FastMail(conf)
-    print("Enviando correo a:", os.environ.get("MAIL_TO"))
-    logger.info(f"Enviando correo a: {os.environ.get('MAIL_TO')}")
+    semaphore = asyncio.Semaphore(int(os.environ.get("ALERT_CONCURRENCY", "5")))
+
+    async def evaluate(alert):
+        async with semaphore:
+            return await run_db(evaluate_alert, alert)
 
     try:
-        for alert in alerts:
-            logger.info(f"⚠️ Ejecutando alerta: {alert.alert}")
-            result = execute_query(cursor, alert.sql)
-            results.append({
-                "alert": alert.alert,
-                "sql": alert.sql,
-                "result": result
-            })
-
-            if result:
-                body = f"""
-                <h3>Se activó una alerta:</h3>
-                <p><strong>{alert.alert}</strong></p>
-                <pre>{json.dumps(result, indent=2)}</pre>
-                """
-                message = MessageSchema(
-                    subject=f"Alerta activada: {alert.alert}",
-                    recipients=[os.environ.get("MAIL_TO")],
-                    body=body,
-                    subtype="html"
-                )
-                await fm.send_message(message)
-                logger.info(f"Correo enviado a: {os.environ.get('MAIL_TO')}")
-            else:
-                logger.info(f"No se encontraron resultados para la alerta: {alert.alert}")
-                
-
-        return {"results": results}
-    
+        outcomes = await asyncio.gather(*(evaluate(alert) for alert in alerts), return_exceptions=True)
     except Exception as e:
-        logger.error(f"Error al ejecutar las alertas: {e}")
+        logger.error("Error al ejecutar las alertas: %s", e)
         return {"message": "Error al procesar las alertas", "error": str(e)}
-    
-    finally:
-        conn.close()
\ No newline at end of file
+
+    dispatcher = get_dispatcher()
+    results = []
+    for alert, outcome in zip(alerts, outcomes):
+        entry = {
+            "alert": alert.alert,
+            "sql": alert.sql,
+        }
+        if isinstance(outcome, Exception):
+            logger.error("Error al ejecutar la alerta %s: %s", alert.alert, outcome)
+            entry["result"] = []
+            entry["error"] = str(outcome)
+        elif outcome:
+            entry["result"] = outcome
+            ALERT_FIRINGS.inc(("request",))
+            entry["notification"] = "queued" if dispatcher.submit(alert.alert, outcome) else "rejected"
+        else:
+            logger.info("No se encontraron resultados para la alerta: %s", alert.alert)
+            entry["result"] = outcome
+        results.append(entry)
+
+    return {"results": results}
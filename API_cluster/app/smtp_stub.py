@@ -0,0 +1,137 @@
+# app/smtp_stub.py
+import asyncio
+import threading
+
+from app.logger_config import setup_logger
+
+# Configurar el logger
+logger = setup_logger(__name__)
+
+
+class LocalSMTPServer:
+    """
+    Servidor SMTP mínimo en memoria para pruebas y benchmarks.
+
+    Acepta EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP y QUIT sin TLS ni
+    autenticación y guarda cada mensaje recibido en `messages`. Se ejecuta en
+    un hilo con su propio event loop, así que puede usarse desde código síncrono.
+
+    Ejemplo:
+        server = LocalSMTPServer(port=1025)
+        server.start()
+        # MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_STARTTLS=false MAIL_USE_CREDENTIALS=false
+        server.stop()
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0):
+        """
+        Args:
+            host: Dirección donde escuchar
+            port: Puerto (0 para elegir uno libre)
+            delay: Segundos de espera en el saludo, para simular un servidor remoto
+        """
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.messages = []
+        self.sessions = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    async def _handle(self, reader, writer):
+        self.sessions += 1
+
+        async def reply(line):
+            writer.write((line + "\r\n").encode())
+            await writer.drain()
+
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        await reply("220 localhost SMTP stub")
+        sender, recipients = None, []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip()
+                verb = command[:4].upper()
+                if verb == "EHLO":
+                    await reply("250-localhost")
+                    await reply("250 8BITMIME")
+                elif verb == "HELO":
+                    await reply("250 localhost")
+                elif verb == "MAIL":
+                    sender, recipients = command[10:].strip(), []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    recipients.append(command[8:].strip())
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    while True:
+                        data = await reader.readline()
+                        if not data or data in (b".\r\n", b".\n"):
+                            break
+                        lines.append(data)
+                    self.messages.append({
+                        "from": sender,
+                        "to": recipients,
+                        "data": b"".join(lines).decode(errors="replace"),
+                    })
+                    await reply("250 OK")
+                elif verb == "RSET":
+                    sender, recipients = None, []
+                    await reply("250 OK")
+                elif verb == "NOOP":
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        finally:
+            writer.close()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._server.close()
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    def start(self):
+        """Arranca el servidor en un hilo y espera a que esté escuchando."""
+        self._thread = threading.Thread(target=self._run, name="smtp-stub", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        logger.info("Servidor SMTP local escuchando en %s:%d", self.host, self.port)
+        return self
+
+    def stop(self):
+        """Detiene el servidor."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+
+if __name__ == "__main__":
+    import os
+    import time
+
+    server = LocalSMTPServer(host="0.0.0.0", port=int(os.environ.get("SMTP_STUB_PORT", "1025"))).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+import argparse
+import os
+import random
+import sys
+import time
+
+# Permitir importar el paquete app desde la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "API_cluster"))
+
+from app.db import init_pool, get_pool, close_pool
+from app.models import FrameCharacteristics
+from app.queries import build_frame_query, execute_prepared, configure_label_columns
+from app.columnar import ColumnarEngine
+
+def make_frame(**fields):
+    """Crea un FrameCharacteristics con los campos no indicados a None."""
+    values = {"video_name": None, "environment_type": None, "object_name": None,
+              "color": None, "proximity": None}
+    values.update(fields)
+    return FrameCharacteristics(**values)
+
+def sample_frames(count, seed=42):
+    """Genera consultas tipo 1, 2 y 3 con valores existentes en la base de datos."""
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT DISTINCT environment_type::text FROM scenarios")
+            environments = [row[0] for row in cursor.fetchall()]
+            cursor.execute("SELECT DISTINCT object_name::text, color::text, proximity::text FROM objects LIMIT 1000")
+            objects = cursor.fetchall()
+    rng = random.Random(seed)
+    frames = {1: [], 2: [], 3: []}
+    for _ in range(count):
+        if environments:
+            frames[1].append(make_frame(type=1, environment_type=rng.choice(environments)))
+        if objects:
+            object_name, color, proximity = rng.choice(objects)
+            frames[2].append(make_frame(type=2, object_name=object_name,
+                                        color=color if rng.random() < 0.5 else None,
+                                        proximity=proximity if rng.random() < 0.5 else None))
+            frames[3].append(make_frame(type=3, object_name=object_name))
+    return frames
+
+def bench_sql(frames):
+    timings = []
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            for frame in frames:
+                start = time.perf_counter()
+                execute_prepared(conn, cursor, build_frame_query(frame))
+                cursor.fetchall()
+                timings.append(time.perf_counter() - start)
+    return timings
+
+def bench_columnar(engine, frames):
+    timings = []
+    for frame in frames:
+        start = time.perf_counter()
+        engine.query(frame)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def report(name, timings):
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2] * 1000
+    p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+    print(f"{name:<22} {len(timings):>6} consultas  p50 {p50:9.3f} ms  p95 {p95:9.3f} ms")
+
+def main():
+    """
+    Compara la latencia de las consultas tipo 1, 2 y 3 resueltas con SQL
+    (sentencias preparadas) frente al motor columnar en memoria.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark del motor columnar frente a SQL')
+    parser.add_argument('--queries', type=int, default=200, help='Consultas de cada tipo')
+    parser.add_argument('--memory-mb', type=float, default=1024, help='Presupuesto de memoria del motor')
+    args = parser.parse_args()
+
+    init_pool()
+    with get_pool().connection() as conn:
+        configure_label_columns(conn)
+
+    engine = ColumnarEngine(memory_budget_mb=args.memory_mb)
+    start = time.perf_counter()
+    engine.refresh()
+    stats = engine.get_stats()
+    print(f"Carga del motor columnar: {stats['rows']} filas, {stats['memory_mb']} MB "
+          f"en {time.perf_counter() - start:.2f} s")
+    if not stats["ready"]:
+        print(f"El motor no está disponible: {stats['disabled_reason']}")
+        close_pool()
+        return
+
+    frames = sample_frames(args.queries)
+    print("=== Latencia por tipo de consulta ===")
+    for query_type, type_frames in frames.items():
+        if not type_frames:
+            continue
+        report(f"tipo {query_type} SQL", bench_sql(type_frames))
+        report(f"tipo {query_type} columnar", bench_columnar(engine, type_frames))
+    close_pool()
+
+if __name__ == "__main__":
+    main()
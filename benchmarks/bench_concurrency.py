@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Consulta tipo 2 usada por defecto en la prueba
+DEFAULT_PAYLOAD = {
+    "type": 2,
+    "video_name": None,
+    "environment_type": None,
+    "object_name": "person",
+    "color": None,
+    "proximity": None
+}
+
+def run_level(url, payload, concurrency, total):
+    """
+    Lanza `total` solicitudes con `concurrency` solicitudes en vuelo a la vez.
+
+    Args:
+        url: URL completa del endpoint
+        payload: JSON a enviar
+        concurrency: Número de solicitudes simultáneas
+        total: Número total de solicitudes
+
+    Returns:
+        Diccionario con throughput y latencia media del nivel
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+
+    def send(_):
+        start = time.perf_counter()
+        response = session.post(url, json=payload, timeout=60)
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(send, range(total)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "latency_ms_avg": round(sum(latencies) * 1000 / len(latencies), 2),
+    }
+
+def main():
+    """
+    Mide cómo escala el throughput de /receive_characteristics con el número
+    de solicitudes en vuelo. Con el camino asíncrono el throughput debe crecer
+    con la concurrencia hasta el tamaño del pool de conexiones.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark de concurrencia para /receive_characteristics')
+    parser.add_argument('--url', type=str, default="localhost:8000",
+                        help='URL de la API (por defecto: localhost:8000)')
+    parser.add_argument('--levels', type=str, default="1,2,4,8,16,32",
+                        help='Niveles de concurrencia separados por comas')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Solicitudes por nivel')
+    parser.add_argument('--payload', type=str, default=None,
+                        help='Archivo JSON con el cuerpo de la solicitud')
+    args = parser.parse_args()
+
+    url = os.environ.get("API_URL", args.url)
+    full_url = f"http://{url}/receive_characteristics"
+    payload = DEFAULT_PAYLOAD
+    if args.payload:
+        with open(args.payload) as f:
+            payload = json.load(f)
+
+    print(f"=== Benchmark de concurrencia contra {full_url} ===")
+    results = []
+    for level in [int(x) for x in args.levels.split(",")]:
+        result = run_level(full_url, payload, level, args.requests)
+        results.append(result)
+        print(f"concurrencia={result['concurrency']:>3}  "
+              f"throughput={result['throughput_rps']:>8} req/s  "
+              f"latencia media={result['latency_ms_avg']:>8} ms")
+
+    base = results[0]["throughput_rps"]
+    print("\nEscalado respecto a concurrencia 1:")
+    for result in results:
+        print(f"  x{result['concurrency']}: {result['throughput_rps'] / base:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+import argparse
+import os
+import random
+import sys
+import time
+
+import psycopg2
+
+# Permitir importar el paquete app desde la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "API_cluster"))
+
+from app.db import get_db_params
+from app.ingest import INGEST_COLUMNS, encode_copy_binary, encode_copy_csv
+
+OBJECTS = ["person", "car", "tree", "umbrella", "bicycle", "truck"]
+COLORS = ["red", "blue", "gray", "black", "white", "silver"]
+PROXIMITY = ["near", "middle", "far"]
+
+def make_rows(count, seed=42):
+    """Genera filas sintéticas con el formato de la tabla objects."""
+    rng = random.Random(seed)
+    return [
+        (rng.choice(OBJECTS), f"video_{rng.randrange(100)}",
+         rng.randrange(1920), rng.randrange(1080), rng.randrange(1920), rng.randrange(1080),
+         rng.choice(COLORS), rng.choice(PROXIMITY), rng.randrange(600))
+        for _ in range(count)
+    ]
+
+def bench_insert(conn, rows):
+    columns = ", ".join(name for name, _ in INGEST_COLUMNS["objects"])
+    placeholders = ", ".join(["%s"] * len(INGEST_COLUMNS["objects"]))
+    with conn.cursor() as cursor:
+        for row in rows:
+            cursor.execute(f"INSERT INTO objects_bench ({columns}) VALUES ({placeholders})", row)
+    conn.commit()
+
+def bench_copy(conn, rows, batch_size, binary):
+    columns = INGEST_COLUMNS["objects"]
+    column_list = ", ".join(name for name, _ in columns)
+    types = [kind for _, kind in columns]
+    with conn.cursor() as cursor:
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            if binary:
+                cursor.copy_expert(f"COPY objects_bench ({column_list}) FROM STDIN WITH (FORMAT binary)",
+                                   encode_copy_binary(batch, types))
+            else:
+                cursor.copy_expert(f"COPY objects_bench ({column_list}) FROM STDIN WITH (FORMAT csv)",
+                                   encode_copy_csv(batch))
+            conn.commit()
+
+def run(conn, name, func, rows, *args):
+    with conn.cursor() as cursor:
+        cursor.execute("TRUNCATE objects_bench")
+    conn.commit()
+    start = time.perf_counter()
+    func(conn, rows, *args)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {len(rows):>9} filas  {elapsed:8.2f} s  {len(rows) / elapsed:>12,.0f} filas/s")
+
+def main():
+    """
+    Compara el throughput de ingesta con INSERT fila a fila frente a COPY por
+    lotes (binario y CSV) sobre una tabla temporal con la estructura de objects.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark de ingesta: INSERT fila a fila frente a COPY por lotes')
+    parser.add_argument('--rows', type=int, default=100000, help='Filas a insertar en cada escenario')
+    parser.add_argument('--insert-rows', type=int, default=10000,
+                        help='Filas para el escenario INSERT (es mucho más lento)')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Filas por lote de COPY')
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    conn = psycopg2.connect(**get_db_params())
+    with conn.cursor() as cursor:
+        cursor.execute("CREATE TEMP TABLE objects_bench (LIKE objects INCLUDING DEFAULTS)")
+    conn.commit()
+
+    print("=== Benchmark de ingesta en objects ===")
+    run(conn, "INSERT fila a fila", bench_insert, rows[:args.insert_rows])
+    run(conn, f"COPY csv (lotes de {args.batch_size})", bench_copy, rows, args.batch_size, False)
+    run(conn, f"COPY binario (lotes de {args.batch_size})", bench_copy, rows, args.batch_size, True)
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+# Solicitudes de cada tipo usadas por defecto (valores presentes en data_cluster/data_sd)
+DEFAULT_PAYLOADS = {
+    "type1": [
+        {"type": 1, "environment_type": "parking_lot"},
+        {"type": 1, "environment_type": "plaza"},
+    ],
+    "type2": [
+        {"type": 2, "object_name": "person"},
+        {"type": 2, "object_name": "car", "proximity": "near"},
+        {"type": 2, "object_name": "umbrella", "color": "black"},
+    ],
+    "type3": [
+        {"type": 3, "object_name": "person"},
+        {"type": 3, "object_name": "car"},
+    ],
+    # La consulta de la alerta no devuelve filas para no encolar correos en cada solicitud
+    "alert": [
+        [{"alert": "Benchmark: persona en segundo negativo",
+          "sql": "SELECT video_name, sec FROM objects WHERE object_name = 'person' AND sec < 0"}],
+    ],
+}
+
+# Endpoint de cada clase de solicitud
+ENDPOINTS = {
+    "type1": "/receive_characteristics",
+    "type2": "/receive_characteristics",
+    "type3": "/receive_characteristics",
+    "alert": "/execute_alerts",
+}
+
+def parse_mix(mix):
+    """
+    Convierte una mezcla "type1:40,type2:30,type3:20,alert:10" en una lista
+    de (clase, peso).
+
+    Raises:
+        ValueError: Si una clase no existe o un peso no es positivo
+    """
+    weights = []
+    for part in mix.split(","):
+        kind, _, weight = part.strip().partition(":")
+        if kind not in ENDPOINTS:
+            raise ValueError(f"Clase de solicitud desconocida: {kind}")
+        if float(weight or 1) <= 0:
+            raise ValueError(f"Peso no válido para {kind}: {weight}")
+        weights.append((kind, float(weight or 1)))
+    return weights
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    index = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+def summarize(samples, elapsed):
+    """
+    Resume las latencias (en segundos) y errores de una clase de solicitud.
+
+    Returns:
+        Diccionario con solicitudes, errores, throughput y latencias en ms
+    """
+    latencies = sorted(latency for latency, ok in samples if ok)
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms_mean": round(sum(latencies) * 1000 / len(latencies), 3) if latencies else 0.0,
+        "latency_ms_p50": round(percentile(latencies, 0.50) * 1000, 3),
+        "latency_ms_p95": round(percentile(latencies, 0.95) * 1000, 3),
+        "latency_ms_p99": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+def run_load(base_url, payloads, weights, concurrency, rate, duration, total, seed):
+    """
+    Lanza solicitudes con la mezcla indicada durante `duration` segundos o
+    hasta `total` solicitudes.
+
+    Con `rate` (solicitudes/s) las solicitudes se programan a intervalos fijos
+    (carga abierta) y la latencia se mide desde el instante programado, de
+    modo que las esperas por saturación del cliente cuentan como latencia.
+    Sin `rate`, `concurrency` hilos envían una solicitud tras otra (carga cerrada).
+
+    Returns:
+        Tupla (muestras por clase, segundos transcurridos)
+    """
+    rng = random.Random(seed)
+    kinds = [kind for kind, _ in weights]
+    kind_weights = [weight for _, weight in weights]
+    samples = {kind: [] for kind in kinds}
+    samples_lock = threading.Lock()
+    counter = iter(range(total)) if total else None
+    counter_lock = threading.Lock()
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+
+    def next_request():
+        with counter_lock:
+            if counter is not None and next(counter, None) is None:
+                return None
+            kind = rng.choices(kinds, kind_weights)[0]
+            return kind, rng.choice(payloads[kind])
+
+    def send(kind, payload, scheduled):
+        try:
+            response = session.post(base_url + ENDPOINTS[kind], json=payload, timeout=60)
+            body = response.json()
+            # Las consultas que fallan en la API responden 200 con {"message": ...}
+            ok = response.status_code == 200 and not (kind != "alert" and isinstance(body, dict) and "message" in body)
+        except (requests.RequestException, ValueError):
+            ok = False
+        with samples_lock:
+            samples[kind].append((time.perf_counter() - scheduled, ok))
+
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+
+    if rate:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = []
+            sent = 0
+            while True:
+                scheduled = start + sent / rate
+                if deadline is not None and scheduled >= deadline:
+                    break
+                request = next_request()
+                if request is None:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(executor.submit(send, *request, scheduled))
+                sent += 1
+            wait(futures)
+    else:
+        def worker():
+            while deadline is None or time.perf_counter() < deadline:
+                request = next_request()
+                if request is None:
+                    return
+                send(*request, time.perf_counter())
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    return samples, time.perf_counter() - start
+
+def git_commit():
+    """Commit actual del repositorio (o None fuera de git)."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_comparison(result, baseline_path):
+    """Muestra la variación de throughput y p95 respecto a un resultado anterior."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nComparación con {baseline_path} (commit {baseline.get('commit')}):")
+    for kind, current in result["by_type"].items():
+        previous = baseline.get("by_type", {}).get(kind)
+        if not previous:
+            continue
+        throughput = current["throughput_rps"] - previous["throughput_rps"]
+        p95 = current["latency_ms_p95"] - previous["latency_ms_p95"]
+        print(f"  {kind:<8} throughput {throughput:+10.2f} req/s   p95 {p95:+10.3f} ms")
+
+def main():
+    """
+    Prueba de carga de la API con una mezcla configurable de consultas tipo
+    1, 2 y 3 y de alertas, a una concurrencia fija o a un ritmo fijo de
+    solicitudes. Se ejecuta contra un servidor local (uvicorn main:app) con
+    su PostgreSQL y guarda el resultado en JSON para comparar commits.
+    """
+    parser = argparse.ArgumentParser(description='Prueba de carga de la API de análisis de video')
+    parser.add_argument('--url', type=str, default="localhost:8000",
+                        help='URL de la API (por defecto: localhost:8000)')
+    parser.add_argument('--mix', type=str, default="type1:30,type2:40,type3:20,alert:10",
+                        help='Mezcla de solicitudes clase:peso separadas por comas')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='Solicitudes en vuelo (hilos del cliente)')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='Solicitudes por segundo (carga abierta); sin indicar, carga cerrada')
+    parser.add_argument('--duration', type=float, default=30,
+                        help='Duración de la prueba en segundos (0 para usar --requests)')
+    parser.add_argument('--requests', type=int, default=0,
+                        help='Número total de solicitudes (0 para usar --duration)')
+    parser.add_argument('--payloads', type=str, default=None,
+                        help='Archivo JSON {clase: [cuerpos]} que sustituye a los cuerpos por defecto')
+    parser.add_argument('--warmup', type=int, default=20,
+                        help='Solicitudes previas que no se miden')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla de la mezcla')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Archivo JSON de resultados (por defecto benchmarks/results/load_<commit>_<fecha>.json)')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='Resultado JSON anterior con el que comparar')
+    args = parser.parse_args()
+
+    if not args.duration and not args.requests:
+        parser.error("Hay que indicar --duration o --requests")
+
+    url = os.environ.get("API_URL", args.url)
+    base_url = f"http://{url}"
+    weights = parse_mix(args.mix)
+    payloads = dict(DEFAULT_PAYLOADS)
+    if args.payloads:
+        with open(args.payloads) as f:
+            payloads.update(json.load(f))
+
+    if args.warmup:
+        run_load(base_url, payloads, weights, min(args.concurrency, 4), None, 0, args.warmup, args.seed)
+
+    mode = f"ritmo {args.rate} req/s" if args.rate else f"concurrencia {args.concurrency}"
+    print(f"=== Prueba de carga contra {base_url} ({mode}, mezcla {args.mix}) ===")
+    samples, elapsed = run_load(base_url, payloads, weights, args.concurrency, args.rate,
+                                args.duration if not args.requests else 0, args.requests, args.seed)
+
+    all_samples = [sample for kind_samples in samples.values() for sample in kind_samples]
+    result = {
+        "commit": git_commit(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "url": base_url,
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "duration": args.duration,
+            "requests": args.requests,
+            "seed": args.seed,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "overall": summarize(all_samples, elapsed),
+        "by_type": {kind: summarize(kind_samples, elapsed) for kind, kind_samples in samples.items()},
+    }
+
+    for kind, summary in [("total", result["overall"])] + list(result["by_type"].items()):
+        print(f"{kind:<8} {summary['requests']:>7} solicitudes  {summary['errors']:>5} errores  "
+              f"{summary['throughput_rps']:>9.2f} req/s  p50 {summary['latency_ms_p50']:>9.3f} ms  "
+              f"p95 {summary['latency_ms_p95']:>9.3f} ms  p99 {summary['latency_ms_p99']:>9.3f} ms")
+
+    output = args.output
+    if output is None:
+        results_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+        os.makedirs(results_dir, exist_ok=True)
+        output = os.path.join(results_dir, f"load_{result['commit'] or 'local'}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResultados guardados en {output}")
+
+    if args.baseline:
+        print_comparison(result, args.baseline)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+import argparse
+import os
+import sys
+import time
+
+# Permitir importar el paquete app desde la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "API_cluster"))
+
+from app.mailer import SMTPTransport, build_message
+from app.smtp_stub import LocalSMTPServer
+
+def measure(server, messages, reuse):
+    """
+    Envía `messages` correos al servidor local y mide la latencia de cada envío.
+
+    Args:
+        server: LocalSMTPServer en ejecución
+        messages: Número de correos
+        reuse: Si es True se reutiliza un único transporte (sesiones persistentes);
+               si es False se crea un transporte nuevo por correo
+
+    Returns:
+        Lista de latencias en milisegundos
+    """
+    latencies = []
+    transport = SMTPTransport(server.host, server.port, sender="bench@localhost", starttls=False)
+    for i in range(messages):
+        message = build_message(f"Alerta {i}", "destino@localhost", "<p>benchmark</p>")
+        if not reuse:
+            transport = SMTPTransport(server.host, server.port, sender="bench@localhost", starttls=False)
+        start = time.perf_counter()
+        transport.send(message)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not reuse:
+            transport.close()
+    transport.close()
+    return latencies
+
+def summarize(name, latencies):
+    ordered = sorted(latencies)
+    p50 = ordered[len(ordered) // 2]
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:<24} media={sum(latencies) / len(latencies):8.2f} ms  p50={p50:8.2f} ms  p95={p95:8.2f} ms")
+
+def main():
+    """
+    Compara la latencia por correo con sesiones SMTP reutilizadas frente a
+    una sesión nueva por correo, usando el servidor SMTP local de app.smtp_stub.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark de sesiones SMTP reutilizadas frente a nuevas')
+    parser.add_argument('--messages', type=int, default=200, help='Correos por escenario')
+    parser.add_argument('--handshake-delay', type=float, default=0.02,
+                        help='Segundos de espera del servidor en el saludo (simula la red y el TLS)')
+    args = parser.parse_args()
+
+    server = LocalSMTPServer(delay=args.handshake_delay).start()
+    try:
+        print(f"=== {args.messages} correos contra el servidor SMTP local (saludo {args.handshake_delay * 1000:.0f} ms) ===")
+        summarize("sesiones reutilizadas", measure(server, args.messages, reuse=True))
+        summarize("sesión nueva por correo", measure(server, args.messages, reuse=False))
+        print(f"Sesiones abiertas en el servidor: {server.sessions}, correos recibidos: {len(server.messages)}")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+import argparse
+import os
+import random
+import sys
+import time
+
+import psycopg2
+
+# Permitir importar el paquete app desde la raíz del repositorio
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "API_cluster"))
+
+from app.db import get_db_params
+from app.models import FrameCharacteristics
+from app.queries import build_frame_query
+
+# Esquema donde se crea la copia ampliada de objects y object_counts
+SCHEMA = "bench_temporal"
+
+# Consulta tipo 7 sin ventana indexada: autounión de objects con la distancia
+# en segundos calculada fila a fila
+NAIVE_COOCCURRENCE = """
+    SELECT a.video_name, a.sec, MIN(b.sec) FROM objects a
+    JOIN objects b ON b.video_name = a.video_name AND abs(b.sec - a.sec) <= %s
+    WHERE a.object_name = %s AND b.object_name = %s
+    GROUP BY a.video_name, a.sec
+"""
+
+def make_frame(**fields):
+    """Crea un FrameCharacteristics con los campos no indicados a None."""
+    values = {"video_name": None, "environment_type": None, "object_name": None,
+              "color": None, "proximity": None}
+    values.update(fields)
+    return FrameCharacteristics(**values)
+
+def build_scaled_dataset(cursor, scale):
+    """
+    Crea en SCHEMA una copia de objects repetida `scale` veces (cada copia con
+    otros nombres de video), su tabla object_counts y los mismos índices que
+    usan las consultas tipo 6 y 7.
+
+    Returns:
+        Número de filas de la copia de objects
+    """
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+    cursor.execute(f"""
+        CREATE TABLE {SCHEMA}.objects AS
+        SELECT o.object_name::text AS object_name, o.video_name::text || '_' || copy AS video_name, o.sec
+        FROM public.objects o, generate_series(1, %s) copy
+        WHERE o.object_name IS NOT NULL AND o.video_name IS NOT NULL AND o.sec IS NOT NULL
+    """, (scale,))
+    rows = cursor.rowcount
+    cursor.execute(f"""
+        CREATE TABLE {SCHEMA}.object_counts AS
+        SELECT object_name, video_name, sec, COUNT(*) AS object_count FROM {SCHEMA}.objects
+        GROUP BY object_name, video_name, sec
+    """)
+    cursor.execute(f"ALTER TABLE {SCHEMA}.object_counts ADD PRIMARY KEY (object_name, video_name, sec)")
+    cursor.execute(f"CREATE INDEX ON {SCHEMA}.objects (object_name, video_name, sec)")
+    cursor.execute(f"CREATE INDEX ON {SCHEMA}.objects (video_name, sec) INCLUDE (object_name)")
+    cursor.execute(f"ANALYZE {SCHEMA}.objects")
+    cursor.execute(f"ANALYZE {SCHEMA}.object_counts")
+    return rows
+
+def sample_frames(cursor, count, window, seed=42):
+    """Genera consultas tipo 6 y 7 con videos y pares de objetos existentes en la copia."""
+    cursor.execute("SELECT video_name, MAX(sec) FROM objects GROUP BY video_name")
+    videos = cursor.fetchall()
+    cursor.execute("SELECT object_name FROM object_counts GROUP BY object_name ORDER BY COUNT(*) DESC LIMIT 10")
+    objects = [row[0] for row in cursor.fetchall()]
+    rng = random.Random(seed)
+    frames = {6: [], 7: []}
+    for _ in range(count):
+        video_name, last_sec = rng.choice(videos)
+        start = rng.randint(0, max(last_sec, 0))
+        frames[6].append(make_frame(type=6, video_name=video_name, sec_from=start, sec_to=start + 60))
+        if len(objects) > 1:
+            object_name, other_object = rng.sample(objects, 2)
+            frames[7].append(make_frame(type=7, object_name=object_name, other_object=other_object,
+                                        window=window))
+    return frames
+
+def run_queries(cursor, statements):
+    timings = []
+    for sql, params in statements:
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def report(name, timings):
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2] * 1000
+    p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+    print(f"{name:<30} {len(timings):>6} consultas  p50 {p50:9.3f} ms  p95 {p95:9.3f} ms")
+
+def main():
+    """
+    Compara las consultas tipo 6 (ventana temporal) y tipo 7 (coincidencia
+    temporal) de la API con sus versiones sin índice sobre una copia ampliada
+    de objects: el tipo 6 con los recorridos por índice desactivados y el
+    tipo 7 frente a una autounión de objects.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark de las consultas temporales sobre datos ampliados')
+    parser.add_argument('--scale', type=int, default=50, help='Copias de objects en el conjunto ampliado')
+    parser.add_argument('--queries', type=int, default=50, help='Consultas de cada tipo')
+    parser.add_argument('--window', type=int, default=5, help='Ventana en segundos del tipo 7')
+    parser.add_argument('--keep', action='store_true', help='No borrar el esquema del benchmark al terminar')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**get_db_params())
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        start = time.perf_counter()
+        rows = build_scaled_dataset(cursor, args.scale)
+        print(f"Conjunto ampliado x{args.scale}: {rows} filas en {time.perf_counter() - start:.2f} s")
+        cursor.execute(f"SET search_path TO {SCHEMA}")
+
+        frames = sample_frames(cursor, args.queries, args.window)
+        queries = {query_type: [build_frame_query(frame) for frame in type_frames]
+                   for query_type, type_frames in frames.items()}
+
+        print("=== Latencia por tipo de consulta ===")
+        report("tipo 6 rango por índice", run_queries(cursor, [(q.sql, q.params) for q in queries[6]]))
+        cursor.execute("SET enable_indexscan = off")
+        cursor.execute("SET enable_indexonlyscan = off")
+        cursor.execute("SET enable_bitmapscan = off")
+        report("tipo 6 recorrido completo", run_queries(cursor, [(q.sql, q.params) for q in queries[6]]))
+        cursor.execute("RESET enable_indexscan")
+        cursor.execute("RESET enable_indexonlyscan")
+        cursor.execute("RESET enable_bitmapscan")
+
+        if frames[7]:
+            report("tipo 7 ventana indexada", run_queries(cursor, [(q.sql, q.params) for q in queries[7]]))
+            naive = [(NAIVE_COOCCURRENCE, (f.window, f.object_name, f.other_object)) for f in frames[7]]
+            report("tipo 7 autounión", run_queries(cursor, naive))
+    finally:
+        if not args.keep:
+            cursor.execute("RESET search_path")
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
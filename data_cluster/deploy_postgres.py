@@ -1,8 +1,12 @@
 #!/usr/bin/env python
 import os
+import csv
 import psycopg2
+import re
 import sys
 import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Función para conectarse a PostgreSQL y crear la base de datos si no existe
 def create_database_if_not_exists(host, port, user, password, dbname):
@@ -188,6 +192,544 @@ def create_tables(cursor):
     for query in table_queries:
         execute_query(cursor, query, fetch=False)
 
+# Configuración de búsqueda de texto de las descripciones (están en inglés).
+# La API usa la misma al construir las consultas tipo 4.
+TEXT_SEARCH_CONFIG = "english"
+
+# Migraciones versionadas del esquema: (versión, descripción, sentencias).
+# Se aplican antes de la carga: los cargadores quitan o construyen los índices
+# por su cuenta para no mantenerlos durante el COPY.
+MIGRATIONS = [
+    (1, "Índices para los predicados de las consultas tipo 1, 2 y 3", [
+        # Tipo 2/3: filtro por object_name, color y proximity; video_name y sec
+        # se incluyen para resolver la consulta solo con el índice
+        """
+        CREATE INDEX IF NOT EXISTS idx_objects_name_color_proximity
+            ON objects (object_name, color, proximity) INCLUDE (video_name, sec)
+        """,
+        # Tipo 1: filtro por environment_type
+        """
+        CREATE INDEX IF NOT EXISTS idx_scenarios_environment_type
+            ON scenarios (environment_type) INCLUDE (video_name)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_features_video_sec
+            ON features (video_name, sec)
+        """,
+        "ANALYZE objects",
+        "ANALYZE scenarios",
+        "ANALYZE features",
+    ]),
+    (2, "Versión de datos para invalidar la caché de resultados de la API", [
+        # Secuencia no transaccional: avanzar no bloquea a otras cargas concurrentes
+        "CREATE SEQUENCE IF NOT EXISTS data_version_seq",
+        """
+        CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+        BEGIN
+            PERFORM nextval('data_version_seq');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        # Un disparador por sentencia en cada tabla: cubre COPY, INSERT, UPDATE, DELETE y TRUNCATE
+        """
+        CREATE TRIGGER trg_objects_data_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON objects
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()
+        """,
+        """
+        CREATE TRIGGER trg_scenarios_data_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON scenarios
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()
+        """,
+        """
+        CREATE TRIGGER trg_features_data_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON features
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()
+        """,
+    ]),
+    (3, "Índice para la paginación por keyset de las consultas tipo 2 y 3", [
+        # Devuelve las filas de un object_name ya ordenadas por (video_name, sec)
+        """
+        CREATE INDEX IF NOT EXISTS idx_objects_name_video_sec
+            ON objects (object_name, video_name, sec)
+        """,
+        "ANALYZE objects",
+    ]),
+    (4, "Secuencia de ingesta y tablas del motor de alertas continuas", [
+        # Secuencia compartida: cada fila nueva de objects/features recibe un id creciente
+        "CREATE SEQUENCE IF NOT EXISTS ingest_seq",
+        "ALTER TABLE objects ADD COLUMN IF NOT EXISTS ingest_id BIGINT DEFAULT nextval('ingest_seq')",
+        "ALTER TABLE features ADD COLUMN IF NOT EXISTS ingest_id BIGINT DEFAULT nextval('ingest_seq')",
+        "CREATE INDEX IF NOT EXISTS idx_objects_ingest_id ON objects (ingest_id)",
+        "CREATE INDEX IF NOT EXISTS idx_features_ingest_id ON features (ingest_id)",
+        """
+        CREATE TABLE IF NOT EXISTS alert_rules (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(255) UNIQUE NOT NULL,
+            object_name VARCHAR(255) NOT NULL,
+            color VARCHAR(255),
+            proximity VARCHAR(255),
+            video_name VARCHAR(255),
+            min_count INT NOT NULL DEFAULT 1,
+            enabled BOOLEAN NOT NULL DEFAULT TRUE,
+            created_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS alert_rule_state (
+            rule_id INT PRIMARY KEY REFERENCES alert_rules (id) ON DELETE CASCADE,
+            watermark BIGINT NOT NULL DEFAULT 0,
+            last_run TIMESTAMP,
+            last_rows_scanned BIGINT,
+            last_latency_ms DOUBLE PRECISION,
+            last_fired INT,
+            last_error TEXT,
+            runs BIGINT NOT NULL DEFAULT 0,
+            total_rows_scanned BIGINT NOT NULL DEFAULT 0,
+            total_fired BIGINT NOT NULL DEFAULT 0
+        )
+        """,
+        # Lo que cada regla ya notificó, para no repetir avisos
+        """
+        CREATE TABLE IF NOT EXISTS alert_rule_firings (
+            rule_id INT NOT NULL REFERENCES alert_rules (id) ON DELETE CASCADE,
+            video_name VARCHAR(255) NOT NULL,
+            sec INT NOT NULL,
+            object_count BIGINT NOT NULL,
+            fired_at TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (rule_id, video_name, sec)
+        )
+        """,
+    ]),
+    (5, "Manifiesto de archivos cargados para la recarga incremental", [
+        # Hash del último archivo cargado en cada tabla: si no cambia, no se recarga
+        """
+        CREATE TABLE IF NOT EXISTS load_manifest (
+            table_name VARCHAR(255) PRIMARY KEY,
+            file_path TEXT NOT NULL,
+            sha256 CHAR(64) NOT NULL,
+            row_count BIGINT NOT NULL,
+            loaded_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+        """,
+    ]),
+    (6, "Hora de ingesta y creación automática de particiones", [
+        # Clave de las particiones por rango de objects/features
+        "ALTER TABLE objects ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMP NOT NULL DEFAULT now()",
+        "ALTER TABLE features ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMP NOT NULL DEFAULT now()",
+        # Crea (si no existe) la partición de `parent` que corresponde a `key`:
+        # un valor de la lista o una marca de tiempo cuyo mes forma el rango.
+        # Las filas de esa clave que ya estaban en la partición por defecto se
+        # mueven a la nueva antes de adjuntarla.
+        r"""
+        CREATE OR REPLACE FUNCTION ensure_partition(parent TEXT, key TEXT) RETURNS TEXT AS $$
+        DECLARE
+            keydef TEXT := pg_get_partkeydef(to_regclass(parent));
+            col TEXT := substring(keydef from '\((\w+)\)');
+            part TEXT;
+            bounds TEXT;
+            condition TEXT;
+            lower_ts TIMESTAMP;
+        BEGIN
+            IF keydef IS NULL THEN
+                RETURN NULL;
+            ELSIF keydef LIKE 'LIST%' THEN
+                part := parent || '_p_' || left(regexp_replace(lower(key), '[^a-z0-9]+', '_', 'g'), 30)
+                        || '_' || left(md5(key), 6);
+                bounds := format('FOR VALUES IN (%L)', key);
+                condition := format('%I = %L', col, key);
+            ELSE
+                lower_ts := date_trunc('month', key::timestamp);
+                part := parent || '_p_' || to_char(lower_ts, 'YYYY_MM');
+                bounds := format('FOR VALUES FROM (%L) TO (%L)', lower_ts, lower_ts + interval '1 month');
+                condition := format('%I >= %L AND %I < %L', col, lower_ts, col, lower_ts + interval '1 month');
+            END IF;
+
+            -- Serializar la creación de la misma partición entre sesiones
+            PERFORM pg_advisory_xact_lock(hashtext(part));
+            IF to_regclass(part) IS NOT NULL THEN
+                RETURN part;
+            END IF;
+
+            EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', part, parent);
+            IF to_regclass(parent || '_default') IS NOT NULL THEN
+                EXECUTE format('WITH moved AS (DELETE FROM %I WHERE %s RETURNING *) INSERT INTO %I SELECT * FROM moved',
+                               parent || '_default', condition, part);
+            END IF;
+            EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I %s', parent, part, bounds);
+            RETURN part;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+    ]),
+    (7, "Tabla resumen de conteos por (object_name, video_name, sec) para el tipo 3", [
+        """
+        CREATE TABLE IF NOT EXISTS object_counts (
+            object_name VARCHAR(255) NOT NULL,
+            video_name VARCHAR(255) NOT NULL,
+            sec INT NOT NULL,
+            object_count BIGINT NOT NULL,
+            PRIMARY KEY (object_name, video_name, sec)
+        )
+        """,
+        # El resultado del tipo 3 sale ya ordenado del índice, sin agregar ni ordenar
+        """
+        CREATE INDEX IF NOT EXISTS idx_object_counts_name_count
+            ON object_counts (object_name, object_count DESC) INCLUDE (video_name, sec)
+        """,
+        # Aplica a object_counts los cambios de cada sentencia sobre objects,
+        # agregados a partir de las tablas de transición
+        """
+        CREATE OR REPLACE FUNCTION maintain_object_counts() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM object_counts;
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE object_counts c SET object_count = c.object_count - gone.n
+                FROM (
+                    SELECT object_name, video_name, sec, COUNT(*) AS n FROM old_rows
+                    WHERE object_name IS NOT NULL AND video_name IS NOT NULL AND sec IS NOT NULL
+                    GROUP BY object_name, video_name, sec
+                ) gone
+                WHERE c.object_name = gone.object_name AND c.video_name = gone.video_name AND c.sec = gone.sec;
+                DELETE FROM object_counts c
+                WHERE c.object_count <= 0
+                  AND (c.object_name, c.video_name, c.sec) IN (SELECT object_name, video_name, sec FROM old_rows);
+            END IF;
+            IF TG_OP IN ('UPDATE', 'INSERT') THEN
+                INSERT INTO object_counts (object_name, video_name, sec, object_count)
+                SELECT object_name, video_name, sec, COUNT(*) FROM new_rows
+                WHERE object_name IS NOT NULL AND video_name IS NOT NULL AND sec IS NOT NULL
+                GROUP BY object_name, video_name, sec
+                ON CONFLICT (object_name, video_name, sec)
+                DO UPDATE SET object_count = object_counts.object_count + EXCLUDED.object_count;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        # Las tablas de transición solo se permiten con un evento por disparador
+        """
+        CREATE TRIGGER trg_objects_counts_insert
+            AFTER INSERT ON objects REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION maintain_object_counts()
+        """,
+        """
+        CREATE TRIGGER trg_objects_counts_update
+            AFTER UPDATE ON objects REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION maintain_object_counts()
+        """,
+        """
+        CREATE TRIGGER trg_objects_counts_delete
+            AFTER DELETE ON objects REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION maintain_object_counts()
+        """,
+        """
+        CREATE TRIGGER trg_objects_counts_truncate
+            AFTER TRUNCATE ON objects
+            FOR EACH STATEMENT EXECUTE FUNCTION maintain_object_counts()
+        """,
+        """
+        INSERT INTO object_counts (object_name, video_name, sec, object_count)
+        SELECT object_name, video_name, sec, COUNT(*) FROM objects
+        WHERE object_name IS NOT NULL AND video_name IS NOT NULL AND sec IS NOT NULL
+        GROUP BY object_name, video_name, sec
+        ON CONFLICT DO NOTHING
+        """,
+        "ANALYZE object_counts",
+    ]),
+    (8, "Soporte del almacenamiento compacto con tipos enum", [
+        # Devuelve la etiqueta del enum con ese texto o NULL si no existe, para
+        # que filtrar por un valor desconocido no devuelva un error sino cero filas
+        """
+        CREATE OR REPLACE FUNCTION enum_label(anyenum, text) RETURNS anyenum AS $$
+            SELECT e FROM unnest(enum_range($1)) e WHERE e::text = $2
+        $$ LANGUAGE sql STABLE
+        """,
+        # Igual que en la migración 7, comparando como texto: object_counts
+        # guarda texto aunque objects use etiquetas enum
+        """
+        CREATE OR REPLACE FUNCTION maintain_object_counts() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                DELETE FROM object_counts;
+                RETURN NULL;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE object_counts c SET object_count = c.object_count - gone.n
+                FROM (
+                    SELECT object_name::text, video_name::text, sec, COUNT(*) AS n FROM old_rows
+                    WHERE object_name IS NOT NULL AND video_name IS NOT NULL AND sec IS NOT NULL
+                    GROUP BY object_name, video_name, sec
+                ) gone
+                WHERE c.object_name = gone.object_name AND c.video_name = gone.video_name AND c.sec = gone.sec;
+                DELETE FROM object_counts c
+                WHERE c.object_count <= 0
+                  AND (c.object_name, c.video_name, c.sec) IN (
+                      SELECT object_name::text, video_name::text, sec FROM old_rows
+                  );
+            END IF;
+            IF TG_OP IN ('UPDATE', 'INSERT') THEN
+                INSERT INTO object_counts (object_name, video_name, sec, object_count)
+                SELECT object_name::text, video_name::text, sec, COUNT(*) FROM new_rows
+                WHERE object_name IS NOT NULL AND video_name IS NOT NULL AND sec IS NOT NULL
+                GROUP BY object_name, video_name, sec
+                ON CONFLICT (object_name, video_name, sec)
+                DO UPDATE SET object_count = object_counts.object_count + EXCLUDED.object_count;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+    ]),
+    (9, "Búsqueda de texto completo sobre las descripciones (consulta tipo 4)", [
+        # Columnas generadas: se calculan en cada COPY o INSERT, tanto en la
+        # carga de los CSV como en la ingesta de la API
+        f"""
+        ALTER TABLE scenarios ADD COLUMN IF NOT EXISTS description_tsv tsvector
+            GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(description, ''))) STORED
+        """,
+        f"""
+        ALTER TABLE features ADD COLUMN IF NOT EXISTS description_tsv tsvector
+            GENERATED ALWAYS AS (to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(description, ''))) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_scenarios_description_tsv ON scenarios USING gin (description_tsv)",
+        "CREATE INDEX IF NOT EXISTS idx_features_description_tsv ON features USING gin (description_tsv)",
+        # Igual que en la migración 6, copiando también las columnas generadas:
+        # las filas se mueven solo con las columnas que admiten valores
+        r"""
+        CREATE OR REPLACE FUNCTION ensure_partition(parent TEXT, key TEXT) RETURNS TEXT AS $$
+        DECLARE
+            keydef TEXT := pg_get_partkeydef(to_regclass(parent));
+            col TEXT := substring(keydef from '\((\w+)\)');
+            part TEXT;
+            bounds TEXT;
+            condition TEXT;
+            lower_ts TIMESTAMP;
+            columns TEXT;
+        BEGIN
+            IF keydef IS NULL THEN
+                RETURN NULL;
+            ELSIF keydef LIKE 'LIST%' THEN
+                part := parent || '_p_' || left(regexp_replace(lower(key), '[^a-z0-9]+', '_', 'g'), 30)
+                        || '_' || left(md5(key), 6);
+                bounds := format('FOR VALUES IN (%L)', key);
+                condition := format('%I = %L', col, key);
+            ELSE
+                lower_ts := date_trunc('month', key::timestamp);
+                part := parent || '_p_' || to_char(lower_ts, 'YYYY_MM');
+                bounds := format('FOR VALUES FROM (%L) TO (%L)', lower_ts, lower_ts + interval '1 month');
+                condition := format('%I >= %L AND %I < %L', col, lower_ts, col, lower_ts + interval '1 month');
+            END IF;
+
+            -- Serializar la creación de la misma partición entre sesiones
+            PERFORM pg_advisory_xact_lock(hashtext(part));
+            IF to_regclass(part) IS NOT NULL THEN
+                RETURN part;
+            END IF;
+
+            EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING GENERATED)', part, parent);
+            IF to_regclass(parent || '_default') IS NOT NULL THEN
+                SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) INTO columns
+                FROM pg_attribute
+                WHERE attrelid = to_regclass(parent) AND attnum > 0
+                  AND NOT attisdropped AND attgenerated = '';
+                EXECUTE format('WITH moved AS (DELETE FROM %I WHERE %s RETURNING *) INSERT INTO %I (%s) SELECT %s FROM moved',
+                               parent || '_default', condition, part, columns, columns);
+            END IF;
+            EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I %s', parent, part, bounds);
+            RETURN part;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        "ANALYZE scenarios",
+        "ANALYZE features",
+    ]),
+    (10, "Bounding box indexado para las consultas espaciales (tipo 5)", [
+        # Las esquinas de algunas filas de los CSV vienen en orden inverso (x2 < x1)
+        """
+        UPDATE objects SET x1 = LEAST(x1, x2), x2 = GREATEST(x1, x2),
+                           y1 = LEAST(y1, y2), y2 = GREATEST(y1, y2)
+        WHERE x1 > x2 OR y1 > y2
+        """,
+        # box() ordena las esquinas por sí mismo, así que el índice no depende
+        # de que la normalización anterior se haya hecho
+        """
+        ALTER TABLE objects ADD COLUMN IF NOT EXISTS bbox box
+            GENERATED ALWAYS AS (box(point(x1, y1), point(x2, y2))) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_objects_bbox ON objects USING gist (bbox)",
+        "ANALYZE objects",
+    ]),
+    (11, "Índice para las ventanas temporales de un video (tipo 6)", [
+        # Rango de segundos de un video sin filtrar por objeto; con objeto se
+        # usa idx_objects_name_video_sec y la coincidencia (tipo 7) lee la
+        # clave primaria de object_counts
+        """
+        CREATE INDEX IF NOT EXISTS idx_objects_video_sec
+            ON objects (video_name, sec) INCLUDE (object_name)
+        """,
+        "ANALYZE objects",
+    ]),
+    (12, "Índices para la consulta combinada de escenario y objeto (tipo 8)", [
+        # Lado de scenarios del semi-join: videos con unos atributos de escenario
+        """
+        CREATE INDEX IF NOT EXISTS idx_scenarios_attributes
+            ON scenarios (environment_type, weather, time_of_day, crowd_level, lighting) INCLUDE (video_name)
+        """,
+        # Existencia de una descripción del mismo objeto en el mismo segundo
+        """
+        CREATE INDEX IF NOT EXISTS idx_features_video_sec_object
+            ON features (video_name, sec, object_name)
+        """,
+        "ANALYZE scenarios",
+        "ANALYZE features",
+    ]),
+    (13, "Marca de agua de la última recarga para conservar las filas ingeridas por la API", [
+        # Último ingest_id cargado desde el CSV; las filas con un id mayor
+        # llegaron por la API (o por COPY) después y se conservan en la recarga
+        "ALTER TABLE load_manifest ADD COLUMN IF NOT EXISTS ingest_watermark BIGINT",
+        # Las filas anteriores a esta migración se consideran cargadas desde el CSV
+        """
+        UPDATE load_manifest SET ingest_watermark = (SELECT COALESCE(MAX(ingest_id), 0) FROM objects)
+        WHERE table_name = 'objects'
+        """,
+        """
+        UPDATE load_manifest SET ingest_watermark = (SELECT COALESCE(MAX(ingest_id), 0) FROM features)
+        WHERE table_name = 'features'
+        """,
+    ]),
+    (14, "Versión de reescritura de objects para el motor columnar de la API", [
+        # Avanza solo con los cambios que no son añadidos (UPDATE, DELETE,
+        # TRUNCATE y la retención de particiones): el motor columnar trae
+        # las filas nuevas por ingest_id y con esta versión sabe cuándo
+        # tiene que recargar la tabla entera
+        "CREATE SEQUENCE IF NOT EXISTS data_rewrite_seq",
+        """
+        CREATE OR REPLACE FUNCTION bump_rewrite_version() RETURNS trigger AS $$
+        BEGIN
+            PERFORM nextval('data_rewrite_seq');
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE TRIGGER trg_objects_rewrite_version
+            AFTER UPDATE OR DELETE OR TRUNCATE ON objects
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_rewrite_version()
+        """,
+    ]),
+    (15, "Estado de las reglas de alerta para avanzar la marca de agua sin solapamiento fijo", [
+        # Máximo ingest_id leído en la última evaluación y el xmax de su
+        # instantánea: cuando terminan las transacciones en curso entonces,
+        # la marca de agua puede avanzar hasta ese máximo
+        "ALTER TABLE alert_rule_state ADD COLUMN IF NOT EXISTS scanned_to BIGINT",
+        "ALTER TABLE alert_rule_state ADD COLUMN IF NOT EXISTS scanned_xmax BIGINT",
+    ]),
+]
+
+# Función para marcar que los datos han cambiado
+def bump_data_version(cursor):
+    """
+    Avanza la versión de datos para que la API invalide su caché de resultados.
+    """
+    execute_query(cursor, "SELECT nextval('data_version_seq')", fetch=False)
+
+# Función para aplicar las migraciones pendientes
+def run_migrations(conn):
+    """
+    Aplica las migraciones del esquema que aún no se han ejecutado.
+    La versión aplicada se guarda en la tabla schema_version, de modo que
+    volver a ejecutar el script no repite ninguna migración.
+    
+    Args:
+        conn: Conexión a PostgreSQL
+        
+    Returns:
+        Versión del esquema tras aplicar las migraciones
+    """
+    autocommit = conn.autocommit
+    conn.autocommit = False
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version INT PRIMARY KEY,
+                        description TEXT,
+                        applied_at TIMESTAMP NOT NULL DEFAULT now()
+                    )
+                """)
+                cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+                current = cursor.fetchone()[0]
+        print(f"Versión actual del esquema: {current}")
+
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            print(f"Aplicando migración {version}: {description}")
+            # Cada migración se aplica en su propia transacción
+            with conn:
+                with conn.cursor() as cursor:
+                    for query in statements:
+                        cursor.execute(query)
+                    cursor.execute(
+                        "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                        (version, description)
+                    )
+            current = version
+            print(f"Migración {version} aplicada.")
+
+        return current
+    finally:
+        conn.autocommit = autocommit
+
+# Columnas de cada tabla en el orden de los archivos CSV. Se indican
+# explícitamente en el COPY porque las tablas tienen columnas adicionales
+# (ingest_id) que se rellenan con su valor por defecto.
+TABLE_COLUMNS = {
+    "objects": ["object_name", "video_name", "x1", "y1", "x2", "y2", "color", "proximity", "sec"],
+    "scenarios": ["video_name", "environment_type", "description", "weather", "time_of_day",
+                  "terrain", "crowd_level", "lighting"],
+    "features": ["video_name", "sec", "object_name", "description", "color1", "color2",
+                 "size", "orientation", "type"],
+}
+
+# Esquinas del bounding box de objects: (x1, y1) la superior izquierda y
+# (x2, y2) la inferior derecha una vez normalizadas
+BBOX_COLUMNS = ["x1", "y1", "x2", "y2"]
+
+# Consulta que agrega una tabla con las columnas de objects en conteos por
+# (object_name, video_name, sec), con el mismo formato que object_counts
+# (las columnas se pasan a texto por si objects usa el almacenamiento compacto)
+def object_counts_query(source):
+    return (
+        f"SELECT object_name::text, video_name::text, sec, COUNT(*) FROM {source} "
+        "WHERE object_name IS NOT NULL AND video_name IS NOT NULL AND sec IS NOT NULL "
+        "GROUP BY object_name, video_name, sec"
+    )
+
+# Función para reconstruir la tabla resumen del tipo 3
+def rebuild_object_counts(cursor, query=None):
+    """
+    Sustituye el contenido de object_counts por el resultado de `query`
+    (por defecto, la agregación completa de objects). Los lectores siguen
+    viendo los conteos anteriores hasta que se confirma la transacción.
+    
+    Returns:
+        Número de grupos de la tabla resumen
+    """
+    cursor.execute("LOCK TABLE object_counts IN EXCLUSIVE MODE")
+    cursor.execute("DELETE FROM object_counts")
+    cursor.execute(
+        f"INSERT INTO object_counts (object_name, video_name, sec, object_count) "
+        f"{query or object_counts_query('objects')}"
+    )
+    return cursor.rowcount
+
 # Función para cargar datos de muestra
 def insert_sample_data(cursor):
     """
@@ -258,31 +800,920 @@ def insert_sample_data(cursor):
     for query in features_data:
         execute_query(cursor, query, fetch=False)
 
-# Función para cargar datos desde archivos CSV
-def load_data_from_csv(cursor, table_name, file_path):
+# Clase para leer solo un rango de bytes de un archivo CSV
+class ChunkReader:
+    """
+    Objeto tipo archivo que expone solo los bytes [start, end) de un archivo.
+    Se usa para pasar un fragmento del CSV a copy_expert sin copiarlo en memoria.
     """
-    Carga datos desde un archivo CSV a una tabla PostgreSQL.
+
+    def __init__(self, file_path, start, end):
+        self.file = open(file_path, 'rb')
+        self.file.seek(start)
+        self.remaining = end - start
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    readline = read
+
+    def close(self):
+        self.file.close()
+
+# Función para dividir un CSV en fragmentos
+def split_csv_chunks(file_path, chunk_bytes):
+    """
+    Divide un archivo CSV (sin la cabecera) en rangos de bytes que terminan
+    en un salto de línea. Supone un registro por línea, como en los volcados
+    de los detectores.
     
     Args:
-        cursor: Cursor de la conexión PostgreSQL
+        file_path: Ruta al archivo CSV
+        chunk_bytes: Tamaño aproximado de cada fragmento en bytes
+        
+    Returns:
+        Lista de tuplas (inicio, fin) en bytes
+    """
+    size = os.path.getsize(file_path)
+    chunks = []
+    with open(file_path, 'rb') as f:
+        # Saltar la cabecera
+        f.readline()
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            if f.tell() < size:
+                f.readline()
+            end = f.tell()
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+# Función para ordenar las esquinas de los bounding boxes
+def normalize_bboxes(cursor, table_name, after_ingest_id=0):
+    """
+    Intercambia las esquinas de los bounding boxes que llegan en orden
+    inverso (x2 < x1 o y2 < y1) en las filas con ingest_id mayor que
+    `after_ingest_id`, es decir, solo en las filas recién cargadas.
+    
+    Returns:
+        Número de filas corregidas
+    """
+    cursor.execute(f"""
+        UPDATE {table_name} SET x1 = LEAST(x1, x2), x2 = GREATEST(x1, x2),
+                               y1 = LEAST(y1, y2), y2 = GREATEST(y1, y2)
+        WHERE ingest_id > %s AND (x1 > x2 OR y1 > y2)
+    """, (after_ingest_id,))
+    return cursor.rowcount
+
+# Función para obtener las definiciones de los índices de una tabla
+def get_index_definitions(cursor, table_name):
+    """
+    Devuelve el nombre y la definición de los índices de una tabla que no
+    pertenecen a restricciones (PRIMARY KEY, UNIQUE).
+    """
+    cursor.execute("""
+        SELECT i.indexname, i.indexdef
+        FROM pg_indexes i
+        WHERE i.schemaname = current_schema() AND i.tablename = %s
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint c WHERE c.conname = i.indexname
+          )
+        ORDER BY i.indexname
+    """, (table_name,))
+    return cursor.fetchall()
+
+# Función para copiar un fragmento de CSV en una tabla
+def copy_chunk(db_params, table_name, columns, file_path, chunk):
+    """
+    Carga un fragmento del CSV con COPY en su propia conexión y transacción.
+    
+    Returns:
+        Número de filas cargadas
+    """
+    conn = connect_to_postgres(**db_params)
+    reader = ChunkReader(file_path, *chunk)
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.copy_expert(f"COPY {table_name} ({columns}) FROM STDIN WITH CSV", reader)
+                return cursor.rowcount
+    finally:
+        reader.close()
+        conn.close()
+
+# Función para cargar una tabla completa desde CSV
+def load_table(db_params, table_name, file_path, chunk_bytes, chunk_workers, columns=None):
+    """
+    Carga un archivo CSV en una tabla dentro de una única transacción,
+    eliminando los índices antes de la carga y reconstruyéndolos después.
+    
+    Si el archivo supera `chunk_bytes`, sus fragmentos se copian en paralelo,
+    cada uno en su propia conexión, a una tabla intermedia UNLOGGED; después
+    se pasan a la tabla definitiva en la transacción de carga. El resultado no
+    depende del orden en que terminen los fragmentos.
+    
+    Args:
+        db_params: Parámetros de conexión
         table_name: Nombre de la tabla donde cargar los datos
         file_path: Ruta al archivo CSV
+        chunk_bytes: Tamaño de cada fragmento en bytes
+        chunk_workers: Número de fragmentos que se copian a la vez
+        columns: Columnas del CSV (por defecto TABLE_COLUMNS[table_name])
+        
+    Returns:
+        Número de filas cargadas
     """
-    if not os.path.exists(file_path):
-        print(f"El archivo {file_path} no existe. Cargando datos de muestra en su lugar.")
-        return False
+    start = time.time()
+    chunks = split_csv_chunks(file_path, chunk_bytes)
+    column_list = columns or TABLE_COLUMNS[table_name]
+    columns = ", ".join(column_list)
+    staging = f"{table_name}_load"
+
+    conn = connect_to_postgres(**db_params)
+    try:
+        if len(chunks) > 1:
+            # Copiar los fragmentos en paralelo a la tabla intermedia
+            with conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+                    cursor.execute(
+                        f"CREATE UNLOGGED TABLE {staging} AS SELECT {columns} FROM {table_name} WITH NO DATA"
+                    )
+            loaded = 0
+            with ThreadPoolExecutor(max_workers=chunk_workers) as executor:
+                futures = [executor.submit(copy_chunk, db_params, staging, columns, file_path, chunk) for chunk in chunks]
+                for done, future in enumerate(as_completed(futures), start=1):
+                    loaded += future.result()
+                    elapsed = time.time() - start
+                    print(f"[{table_name}] fragmento {done}/{len(chunks)}: {loaded} filas, "
+                          f"{loaded / elapsed:,.0f} filas/s")
+
+        # Transacción de carga: quitar índices, cargar, reconstruir índices
+        with conn:
+            with conn.cursor() as cursor:
+                has_bbox = set(BBOX_COLUMNS) <= set(column_list)
+                if has_bbox:
+                    # Las filas anteriores a la carga ya tienen las esquinas ordenadas
+                    cursor.execute(f"SELECT COALESCE(MAX(ingest_id), 0) FROM {table_name}")
+                    last_ingest_id = cursor.fetchone()[0]
+
+                indexes = get_index_definitions(cursor, table_name)
+                for index_name, _ in indexes:
+                    cursor.execute(f"DROP INDEX {index_name}")
+
+                if len(chunks) > 1:
+                    cursor.execute(
+                        f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {staging}"
+                    )
+                    rows = cursor.rowcount
+                elif chunks:
+                    reader = ChunkReader(file_path, *chunks[0])
+                    try:
+                        cursor.copy_expert(f"COPY {table_name} ({columns}) FROM STDIN WITH CSV", reader)
+                    finally:
+                        reader.close()
+                    rows = cursor.rowcount
+                else:
+                    rows = 0
+
+                if has_bbox and rows:
+                    fixed = normalize_bboxes(cursor, table_name, last_ingest_id)
+                    print(f"[{table_name}] {fixed} bounding boxes con las esquinas reordenadas")
+
+                for index_name, index_def in indexes:
+                    print(f"[{table_name}] reconstruyendo índice {index_name}")
+                    cursor.execute(index_def)
+                cursor.execute(f"ANALYZE {table_name}")
+
+        if len(chunks) > 1:
+            with conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+    finally:
+        conn.close()
+
+    elapsed = time.time() - start
+    print(f"[{table_name}] {rows} filas cargadas en {elapsed:.2f} s ({rows / max(elapsed, 1e-9):,.0f} filas/s)")
+    return rows
+
+# Esquemas de particionado disponibles para objects y features
+PARTITION_SCHEMES = {
+    "list": "LIST (object_name)",
+    "range": "RANGE (ingested_at)",
+}
+
+# Función para obtener la clave de particionado de una tabla
+def get_partition_key(cursor, table_name):
+    """
+    Devuelve la clave de particionado de una tabla (p. ej. "LIST (object_name)")
+    o None si la tabla no está particionada.
+    """
+    cursor.execute("SELECT pg_get_partkeydef(to_regclass(%s))", (table_name,))
+    return cursor.fetchone()[0]
+
+# Función para obtener las particiones de una tabla
+def get_partitions(cursor, table_name):
+    """Devuelve los nombres de las particiones de una tabla."""
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    """, (table_name,))
+    return [row[0] for row in cursor.fetchall()]
+
+# Función para obtener las claves de partición presentes en una tabla
+def distinct_partition_keys(cursor, source, partition_key):
+    """
+    Devuelve los valores de clave de partición que aparecen en `source`:
+    los valores distintos para LIST o el inicio de cada mes para RANGE.
+    """
+    column = partition_key[partition_key.index("(") + 1:-1]
+    if partition_key.startswith("LIST"):
+        cursor.execute(f"SELECT DISTINCT {column} FROM {source} WHERE {column} IS NOT NULL")
+    else:
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', {column})::text FROM {source}")
+    return [row[0] for row in cursor.fetchall()]
+
+# Función para repartir las filas de la partición por defecto
+def split_default_partition(cursor, table_name):
+    """
+    Crea las particiones de las claves que hayan caído en la partición por
+    defecto (valores nuevos o meses sin partición) y mueve allí sus filas.
+    
+    Returns:
+        Número de particiones creadas
+    """
+    partition_key = get_partition_key(cursor, table_name)
+    if partition_key is None:
+        return 0
+    keys = distinct_partition_keys(cursor, f"{table_name}_default", partition_key)
+    for key in keys:
+        cursor.execute("SELECT ensure_partition(%s, %s)", (table_name, key))
+    if keys:
+        print(f"[{table_name}] {len(keys)} particiones nuevas creadas desde la partición por defecto")
+    return len(keys)
+
+# Función para obtener las columnas de una tabla que admiten valores
+def get_writable_columns(cursor, table_name):
+    """
+    Devuelve las columnas de una tabla en su orden, sin las columnas
+    generadas (no se pueden escribir en un INSERT).
+    """
+    cursor.execute("""
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+        ORDER BY attnum
+    """, (table_name,))
+    return [row[0] for row in cursor.fetchall()]
+
+# Función para convertir una tabla en tabla particionada
+def partition_table(conn, table_name, scheme):
+    """
+    Convierte una tabla en tabla particionada con el esquema indicado
+    ("list" por object_name o "range" mensual por ingested_at).
+    
+    Se crea una partición por cada clave existente y una partición por
+    defecto para las claves que aún no tienen la suya. Los índices y
+    disparadores de la tabla se recrean sobre la tabla particionada. La
+    conversión se hace en una sola transacción; si la tabla ya está
+    particionada no se modifica.
+    
+    Args:
+        conn: Conexión a PostgreSQL
+        table_name: Tabla a particionar
+        scheme: "none", "list" o "range"
+        
+    Returns:
+        True si la tabla se convirtió
+    """
+    with conn:
+        with conn.cursor() as cursor:
+            current = get_partition_key(cursor, table_name)
+            if scheme == "none":
+                if current:
+                    print(f"La tabla '{table_name}' ya está particionada por {current}; no se deshace.")
+                return False
+            wanted = PARTITION_SCHEMES[scheme]
+            if current:
+                if current != wanted:
+                    print(f"La tabla '{table_name}' ya está particionada por {current}; no se cambia a {wanted}.")
+                return False
+
+            print(f"Particionando la tabla '{table_name}' por {wanted}...")
+            start = time.time()
+            source = f"{table_name}_unpartitioned"
+            indexes = get_index_definitions(cursor, table_name)
+            triggers = get_trigger_definitions(cursor, table_name)
+
+            cursor.execute(f"ALTER TABLE {table_name} RENAME TO {source}")
+            cursor.execute(
+                f"CREATE TABLE {table_name} (LIKE {source} INCLUDING DEFAULTS INCLUDING GENERATED) "
+                f"PARTITION BY {wanted}"
+            )
+            cursor.execute(f"CREATE TABLE {table_name}_default PARTITION OF {table_name} DEFAULT")
+            for key in distinct_partition_keys(cursor, source, wanted):
+                cursor.execute("SELECT ensure_partition(%s, %s)", (table_name, key))
+            columns = ", ".join(get_writable_columns(cursor, source))
+            cursor.execute(f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {source}")
+            rows = cursor.rowcount
+            cursor.execute(f"DROP TABLE {source}")
+
+            # Los índices sobre la tabla particionada se crean en cada partición
+            for _, index_def in indexes:
+                cursor.execute(index_def)
+            for trigger_def in triggers:
+                cursor.execute(trigger_def)
+            cursor.execute(f"ANALYZE {table_name}")
+    print(f"Tabla '{table_name}' particionada: {rows} filas en {time.time() - start:.2f} s")
+    return True
+
+# Función para crear por adelantado las particiones de rango
+def create_upcoming_partitions(cursor, table_name, months=1):
+    """
+    Crea las particiones del mes actual y de los `months` siguientes en las
+    tablas particionadas por rango, para que las filas nuevas no caigan en
+    la partición por defecto.
+    """
+    partition_key = get_partition_key(cursor, table_name)
+    if partition_key is None or not partition_key.startswith("RANGE"):
+        return
+    for offset in range(months + 1):
+        cursor.execute(
+            "SELECT ensure_partition(%s, (now() + %s * interval '1 month')::text)",
+            (table_name, offset)
+        )
+
+# Función para eliminar las particiones antiguas
+def drop_expired_partitions(cursor, table_name, retention_months):
+    """
+    Elimina las particiones mensuales anteriores al periodo de retención con
+    DETACH y DROP, sin borrar filas una a una.
     
+    Args:
+        cursor: Cursor de PostgreSQL
+        table_name: Tabla particionada por rango
+        retention_months: Meses que se conservan (0 para no eliminar nada)
+        
+    Returns:
+        Lista de particiones eliminadas
+    """
+    if retention_months <= 0:
+        return []
+    partition_key = get_partition_key(cursor, table_name)
+    if partition_key is None or not partition_key.startswith("RANGE"):
+        return []
+    cursor.execute(
+        "SELECT to_char(date_trunc('month', now()) - %s * interval '1 month', 'YYYY_MM')",
+        (retention_months,)
+    )
+    cutoff = cursor.fetchone()[0]
+    pattern = re.compile(rf"^{re.escape(table_name)}_p_(\d{{4}}_\d{{2}})$")
+    dropped = []
+    for partition in get_partitions(cursor, table_name):
+        match = pattern.match(partition)
+        if match and match.group(1) < cutoff:
+            if table_name == "objects":
+                # DETACH no dispara los disparadores de object_counts: descontar a mano
+                cursor.execute(f"""
+                    UPDATE object_counts c SET object_count = c.object_count - gone.count
+                    FROM ({object_counts_query(partition)}) gone
+                    WHERE c.object_name = gone.object_name AND c.video_name = gone.video_name
+                      AND c.sec = gone.sec
+                """)
+                cursor.execute("DELETE FROM object_counts WHERE object_count <= 0")
+            cursor.execute(f"ALTER TABLE {table_name} DETACH PARTITION {partition}")
+            cursor.execute(f"DROP TABLE {partition}")
+            if table_name == "objects":
+                # Tampoco dispara trg_objects_rewrite_version: avisar al motor columnar
+                cursor.execute("SELECT nextval('data_rewrite_seq')")
+            dropped.append(partition)
+    if dropped:
+        print(f"[{table_name}] particiones eliminadas por retención: {', '.join(dropped)}")
+    return dropped
+
+# Función para comprobar la poda de particiones de la consulta tipo 2
+def report_partition_pruning(cursor, object_name):
+    """
+    Muestra qué particiones de objects lee la consulta tipo 2 de la API (el
+    tipo 3 lee la tabla resumen object_counts, que no está particionada).
+    La consulta se prepara con plan genérico, como las sentencias preparadas
+    de la API, así que la poda se hace al ejecutar ("Subplans Removed").
+    """
+    queries = {
+        "tipo 2": "SELECT video_name, sec FROM objects WHERE object_name = $1",
+    }
+    cursor.execute("SET plan_cache_mode = force_generic_plan")
     try:
-        with open(file_path, 'r') as f:
-            # Preparar para saltar la primera línea (encabezado)
-            next(f)
-            # Usar copy_expert para cargar los datos CSV directamente
-            cursor.copy_expert(f"COPY {table_name} FROM STDIN WITH CSV", f)
-        print(f"Datos cargados exitosamente en la tabla '{table_name}' desde '{file_path}'.")
-        return True
-    except Exception as e:
-        print(f"Error al cargar datos en la tabla {table_name} desde CSV: {e}")
-        return False
+        for label, query in queries.items():
+            cursor.execute(f"PREPARE pruning_check AS {query}")
+            cursor.execute("EXPLAIN (ANALYZE, COSTS OFF, TIMING OFF) EXECUTE pruning_check (%s)", (object_name,))
+            plan = [row[0] for row in cursor.fetchall()]
+            cursor.execute("DEALLOCATE pruning_check")
+            scanned = sorted(set(re.findall(r" on (\w+)", "\n".join(plan))))
+            removed = [line.strip() for line in plan if "Subplans Removed" in line]
+            print(f"Consulta {label} ('{object_name}'): particiones leídas {scanned} {' '.join(removed)}")
+    finally:
+        cursor.execute("RESET plan_cache_mode")
+
+# Columnas de baja cardinalidad que el almacenamiento compacto guarda como
+# etiquetas enum (4 bytes) en lugar de VARCHAR(255), y el tipo de cada una.
+# Las columnas del mismo dominio comparten tipo entre tablas.
+COMPACT_COLUMNS = {
+    "objects": {
+        "object_name": "object_name_label", "video_name": "video_name_label",
+        "color": "color_label", "proximity": "proximity_label",
+    },
+    "features": {
+        "video_name": "video_name_label", "object_name": "object_name_label",
+        "color1": "color_label", "color2": "color_label", "size": "size_label",
+        "orientation": "orientation_label", "type": "type_label",
+    },
+}
+
+# Longitud máxima de una etiqueta de enum en PostgreSQL
+MAX_LABEL_BYTES = 63
+
+# Función para obtener las columnas enum de una tabla
+def get_enum_columns(cursor, table_name):
+    """Devuelve un diccionario {columna: tipo enum} de las columnas enum de una tabla."""
+    cursor.execute("""
+        SELECT a.attname, t.typname
+        FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid
+        WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+          AND t.typtype = 'e'
+    """, (table_name,))
+    return dict(cursor.fetchall())
+
+# Primera etiqueta de un enum que sigue a un valor en el orden del texto
+# (enumlabel es de tipo name, con collation "C": se compara con la de la base de datos)
+NEXT_LABEL_SQL = """
+    SELECT enumlabel::text FROM pg_enum
+    WHERE enumtypid = %s::regtype AND enumlabel::text COLLATE "default" > %s
+    ORDER BY enumlabel::text COLLATE "default"
+    LIMIT 1
+"""
+
+# Función para añadir etiquetas a un tipo enum
+def add_labels(cursor, type_name, values):
+    """
+    Añade a un tipo enum las etiquetas que le falten, cada una delante de la
+    primera etiqueta existente que la sigue en el orden del texto (collation
+    de la base de datos), de modo que el orden del enum coincide siempre con
+    el del texto aunque las etiquetas lleguen en cargas distintas. Debe
+    ejecutarse fuera de una transacción: una etiqueta nueva no puede usarse
+    hasta que se confirma.
+    
+    Returns:
+        Número de etiquetas añadidas
+    """
+    cursor.execute("SELECT enumlabel FROM pg_enum WHERE enumtypid = %s::regtype", (type_name,))
+    existing = {row[0] for row in cursor.fetchall()}
+    missing = [value for value in set(values) if value is not None and value not in existing]
+    if not missing:
+        return 0
+    # Ordenar con la collation de la base de datos, no con la de Python
+    cursor.execute("SELECT value FROM unnest(%s::text[]) value ORDER BY value", (missing,))
+    for (value,) in cursor.fetchall():
+        cursor.execute(NEXT_LABEL_SQL, (type_name, value))
+        following = cursor.fetchone()
+        if following is None:
+            cursor.execute(f"ALTER TYPE {type_name} ADD VALUE IF NOT EXISTS %s", (value,))
+        else:
+            cursor.execute(f"ALTER TYPE {type_name} ADD VALUE IF NOT EXISTS %s BEFORE %s", (value, following[0]))
+    return len(missing)
+
+# Función para leer los valores distintos de algunas columnas de un CSV
+def csv_column_values(file_path, table_name, columns):
+    """Devuelve un diccionario {columna: conjunto de valores} de las columnas indicadas del CSV."""
+    positions = {column: TABLE_COLUMNS[table_name].index(column) for column in columns}
+    values = {column: set() for column in columns}
+    with open(file_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            for column, position in positions.items():
+                if position < len(row) and row[position] != "":
+                    values[column].add(row[position])
+    return values
+
+# Función para registrar las etiquetas de un CSV antes de cargarlo
+def ensure_csv_labels(cursor, table_name, file_path):
+    """
+    Añade a los tipos enum de una tabla compacta los valores nuevos del CSV,
+    para que el COPY no falle con etiquetas desconocidas.
+    """
+    enum_columns = get_enum_columns(cursor, table_name)
+    if not enum_columns:
+        return
+    added = 0
+    for column, values in csv_column_values(file_path, table_name, enum_columns).items():
+        added += add_labels(cursor, enum_columns[column], values)
+    if added:
+        print(f"[{table_name}] {added} etiquetas nuevas registradas")
+
+# Función para medir el tamaño y la latencia de las consultas tipo 2/3
+def storage_report(cursor, object_name, repeat=20):
+    """
+    Mide el tamaño de tablas e índices de objects y features (sumando sus
+    particiones) y la mediana de latencia de las consultas tipo 2 y 3.
+    
+    Returns:
+        Diccionario {métrica: valor}
+    """
+    report = {}
+    for table in ("objects", "features"):
+        cursor.execute("""
+            SELECT COALESCE(SUM(pg_table_size(relid)), 0), COALESCE(SUM(pg_indexes_size(relid)), 0)
+            FROM pg_partition_tree(%s::regclass)
+        """, (table,))
+        report[f"{table}_table_mb"], report[f"{table}_index_mb"] = (
+            round(size / 1024 / 1024, 2) for size in cursor.fetchone()
+        )
+    queries = {
+        "type2_ms": ("SELECT video_name, sec FROM objects WHERE object_name = %s", (object_name,)),
+        "type3_ms": (
+            "SELECT video_name, sec, object_count FROM object_counts "
+            "WHERE object_name = %s ORDER BY object_count DESC",
+            (object_name,)
+        ),
+    }
+    for metric, (query, params) in queries.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            cursor.execute(query, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        report[metric] = round(sorted(timings)[len(timings) // 2], 3)
+    return report
+
+# Función para convertir objects y features al almacenamiento compacto
+def compact_table(cursor, table_name):
+    """
+    Convierte las columnas de baja cardinalidad de una tabla a etiquetas enum.
+    
+    Se crean los tipos que falten con las etiquetas presentes en la tabla, en
+    el orden del texto (add_labels mantiene ese orden también para las
+    etiquetas que se añadan después), así que ORDER BY sobre la columna enum
+    ordena igual que sobre el texto, y todas las
+    columnas se convierten en un único ALTER TABLE (una sola reescritura). Se
+    omiten las columnas que ya son enum, la clave de particionado y las que
+    tienen valores vacíos o más largos que una etiqueta de enum. Debe ejecutarse con
+    autocommit, ya que las etiquetas se añaden fuera de transacción.
+    
+    Returns:
+        Lista de columnas convertidas
+    """
+    current = get_enum_columns(cursor, table_name)
+    partition_key = get_partition_key(cursor, table_name) or ""
+    pending = {}
+    for column, type_name in COMPACT_COLUMNS[table_name].items():
+        if column in current:
+            continue
+        if f"({column})" in partition_key:
+            print(f"[{table_name}] la columna {column} es la clave de particionado; se mantiene como texto")
+            continue
+        cursor.execute(f"SELECT DISTINCT {column} FROM {table_name} WHERE {column} IS NOT NULL")
+        values = [row[0] for row in cursor.fetchall()]
+        if any(value == "" or len(value.encode("utf-8")) > MAX_LABEL_BYTES for value in values):
+            print(f"[{table_name}] la columna {column} tiene valores vacíos o demasiado largos; se mantiene como texto")
+            continue
+        cursor.execute("SELECT to_regtype(%s)", (type_name,))
+        if cursor.fetchone()[0] is None:
+            cursor.execute(f"CREATE TYPE {type_name} AS ENUM ()")
+        add_labels(cursor, type_name, values)
+        pending[column] = type_name
+
+    if pending:
+        print(f"[{table_name}] convirtiendo {', '.join(pending)} a etiquetas enum...")
+        alters = ", ".join(
+            f"ALTER COLUMN {column} TYPE {type_name} USING {column}::text::{type_name}"
+            for column, type_name in pending.items()
+        )
+        cursor.execute(f"ALTER TABLE {table_name} {alters}")
+        cursor.execute(f"ANALYZE {table_name}")
+    return list(pending)
+
+# Función para mostrar el informe antes/después del almacenamiento compacto
+def print_storage_report(before, after):
+    """Muestra las métricas de storage_report antes y después de la conversión."""
+    print("\n----- ALMACENAMIENTO COMPACTO -----")
+    print(f"{'métrica':<20}{'antes':>12}{'después':>12}{'ratio':>8}")
+    for metric, value in before.items():
+        ratio = f"{after[metric] / value:.2f}" if value else "-"
+        print(f"{metric:<20}{value:>12}{after[metric]:>12}{ratio:>8}")
+
+# Función para calcular el hash de un archivo
+def file_sha256(file_path):
+    """Devuelve el SHA-256 del contenido de un archivo."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Función para obtener las definiciones de los disparadores de una tabla
+def get_trigger_definitions(cursor, table_name):
+    """
+    Devuelve las sentencias CREATE TRIGGER de los disparadores de usuario de una tabla.
+    """
+    cursor.execute("""
+        SELECT pg_get_triggerdef(t.oid)
+        FROM pg_trigger t
+        WHERE t.tgrelid = %s::regclass AND NOT t.tgisinternal
+        ORDER BY t.tgname
+    """, (table_name,))
+    return [row[0] for row in cursor.fetchall()]
+
+# Función para adaptar una definición de índice o disparador a otra tabla
+def retarget_definition(definition, table_name, target, name=None, new_name=None):
+    """
+    Cambia la tabla (y opcionalmente el nombre del objeto) de una sentencia
+    CREATE INDEX o CREATE TRIGGER obtenida del catálogo.
+    """
+    if name is not None:
+        definition = re.sub(rf"\b{re.escape(name)}\b", new_name, definition, count=1)
+    return re.sub(rf" ON (\w+\.)?{re.escape(table_name)} ", f" ON {target} ", definition, count=1)
+
+# Función para recargar una tabla mediante su tabla de staging
+def reload_table(db_params, table_name, file_path, digest, chunk_bytes, chunk_workers, lock_timeout):
+    """
+    Recarga una tabla con el contenido de un archivo CSV sin bloquear a los lectores.
+    
+    El archivo se carga en `{tabla}_new`, que tiene las mismas columnas y
+    valores por defecto que la tabla activa. Después se construyen sus índices
+    y disparadores, se analiza y, en una transacción corta, se renombra
+    `{tabla}_new` a `{tabla}` y se elimina la tabla anterior. Para objects, los
+    conteos de object_counts se calculan antes y se sustituyen en la misma
+    transacción. Si la tabla activa está particionada, la de staging se crea
+    con las mismas particiones. Los lectores ven la tabla anterior o la nueva
+    completa, nunca una carga a medias; la espera por el bloqueo del
+    intercambio está limitada por `lock_timeout`.
+    
+    Las filas de la tabla activa con ingest_id mayor que la marca de agua de
+    la recarga anterior no vienen del CSV (llegaron por /ingest/detections o
+    por COPY, también durante la recarga) y se copian a `{tabla}_new` con la
+    tabla activa bloqueada, justo antes del intercambio. Reciben ids nuevos,
+    mayores que los del CSV, así que la nueva marca de agua sigue separando
+    las filas cargadas de las ingeridas. Si la tabla tiene filas pero ninguna
+    recarga anterior registrada, no se puede saber cuáles son del CSV y la
+    recarga se rechaza.
+    
+    Args:
+        db_params: Parámetros de conexión
+        table_name: Tabla activa
+        file_path: Ruta al archivo CSV
+        digest: SHA-256 del archivo, que se guarda en load_manifest
+        chunk_bytes: Tamaño de cada fragmento en bytes
+        chunk_workers: Número de fragmentos que se copian a la vez
+        lock_timeout: Tiempo máximo de espera por el bloqueo del intercambio (p. ej. "5s")
+        
+    Returns:
+        Número de filas de la nueva tabla
+        
+    Raises:
+        RuntimeError: Si la tabla tiene filas y no hay marca de agua de una recarga anterior
+    """
+    staging = f"{table_name}_new"
+    old = f"{table_name}_old"
+
+    conn = connect_to_postgres(**db_params)
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                # Solo objects y features reciben filas de la API (columna ingest_id)
+                columns = get_writable_columns(cursor, table_name)
+                watermark = None
+                if "ingest_id" in columns:
+                    cursor.execute("SELECT ingest_watermark FROM load_manifest WHERE table_name = %s",
+                                   (table_name,))
+                    row = cursor.fetchone()
+                    watermark = row[0] if row else None
+                    if watermark is None:
+                        cursor.execute(f"SELECT 1 FROM {table_name} LIMIT 1")
+                        if cursor.fetchone() is not None:
+                            raise RuntimeError(
+                                f"La tabla {table_name} tiene filas y no hay marca de agua de una recarga "
+                                "anterior: la recarga sustituiría las filas ingeridas por la API. "
+                                "Use LOAD_MODE=append o vacíe la tabla antes de recargarla."
+                            )
+                        watermark = 0
+                cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+                cursor.execute(f"DROP TABLE IF EXISTS {old}")
+                partition_key = get_partition_key(cursor, table_name)
+                if partition_key is None:
+                    cursor.execute(f"CREATE TABLE {staging} (LIKE {table_name} INCLUDING DEFAULTS INCLUDING GENERATED)")
+                else:
+                    # Misma clave y mismas particiones que la tabla activa
+                    cursor.execute(
+                        f"CREATE TABLE {staging} (LIKE {table_name} INCLUDING DEFAULTS INCLUDING GENERATED) "
+                        f"PARTITION BY {partition_key}"
+                    )
+                    cursor.execute("""
+                        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+                        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                        WHERE i.inhparent = %s::regclass
+                    """, (table_name,))
+                    for partition, bound in cursor.fetchall():
+                        suffix = partition[len(table_name):]
+                        cursor.execute(f"CREATE TABLE {staging}{suffix} PARTITION OF {staging} {bound}")
+
+        rows = load_table(db_params, staging, file_path, chunk_bytes, chunk_workers,
+                          columns=TABLE_COLUMNS[table_name])
+
+        # Índices y disparadores de la tabla activa, construidos sobre la de staging
+        with conn:
+            with conn.cursor() as cursor:
+                split_default_partition(cursor, staging)
+                partitions = get_partitions(cursor, staging)
+                indexes = get_index_definitions(cursor, table_name)
+                for index_name, index_def in indexes:
+                    print(f"[{table_name}] construyendo índice {index_name}_new")
+                    cursor.execute(retarget_definition(index_def, table_name, staging,
+                                                       index_name, f"{index_name}_new"))
+                for trigger_def in get_trigger_definitions(cursor, table_name):
+                    cursor.execute(retarget_definition(trigger_def, table_name, staging))
+                cursor.execute(f"ANALYZE {staging}")
+                if table_name == "objects":
+                    # Conteos del tipo 3 de la nueva tabla, calculados antes del intercambio
+                    cursor.execute("DROP TABLE IF EXISTS object_counts_load")
+                    cursor.execute(f"CREATE UNLOGGED TABLE object_counts_load AS {object_counts_query(staging)}")
+
+        # Intercambio: solo renombrados, con espera de bloqueo limitada
+        start = time.time()
+        carried = 0
+        new_watermark = None
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+                cursor.execute(f"LOCK TABLE {table_name} IN ACCESS EXCLUSIVE MODE")
+                if watermark is not None:
+                    cursor.execute(f"SELECT COALESCE(MAX(ingest_id), 0) FROM {staging}")
+                    new_watermark = cursor.fetchone()[0]
+                    # Filas ingeridas desde la recarga anterior, con ingest_id nuevo
+                    carry_columns = ", ".join(column for column in columns if column != "ingest_id")
+                    cursor.execute(
+                        f"INSERT INTO {staging} ({carry_columns}) "
+                        f"SELECT {carry_columns} FROM {table_name} WHERE ingest_id > %s",
+                        (watermark,)
+                    )
+                    carried = cursor.rowcount
+                    if carried:
+                        print(f"[{table_name}] {carried} filas ingeridas por la API conservadas")
+                    if carried and table_name == "objects":
+                        cursor.execute(
+                            "INSERT INTO object_counts_load "
+                            f"{object_counts_query(f'(SELECT * FROM {table_name} WHERE ingest_id > {int(watermark)}) carried')}"
+                        )
+                cursor.execute(f"ALTER TABLE {table_name} RENAME TO {old}")
+                cursor.execute(f"ALTER TABLE {staging} RENAME TO {table_name}")
+                for index_name, _ in indexes:
+                    cursor.execute(f"ALTER INDEX {index_name} RENAME TO {index_name}_old")
+                    cursor.execute(f"ALTER INDEX {index_name}_new RENAME TO {index_name}")
+                cursor.execute(f"DROP TABLE {old}")
+                for partition in partitions:
+                    cursor.execute(f"ALTER TABLE {partition} RENAME TO {table_name}{partition[len(staging):]}")
+                if table_name == "objects":
+                    # Un mismo grupo puede venir del CSV y de las filas conservadas
+                    rebuild_object_counts(
+                        cursor,
+                        "SELECT object_name, video_name, sec, SUM(count) FROM object_counts_load "
+                        "GROUP BY object_name, video_name, sec"
+                    )
+                    cursor.execute("DROP TABLE object_counts_load")
+                cursor.execute("""
+                    INSERT INTO load_manifest (table_name, file_path, sha256, row_count, ingest_watermark)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (table_name) DO UPDATE SET
+                        file_path = EXCLUDED.file_path, sha256 = EXCLUDED.sha256,
+                        row_count = EXCLUDED.row_count, ingest_watermark = EXCLUDED.ingest_watermark,
+                        loaded_at = now()
+                """, (table_name, file_path, digest, rows, new_watermark))
+        print(f"[{table_name}] tabla intercambiada en {(time.time() - start) * 1000:.1f} ms")
+
+        # Invalidar la caché de la API una vez confirmada la nueva tabla
+        with conn:
+            with conn.cursor() as cursor:
+                bump_data_version(cursor)
+    finally:
+        conn.close()
+    return rows
+
+# Función para obtener los hashes guardados en el manifiesto
+def get_manifest(db_params):
+    """Devuelve un diccionario {tabla: sha256} con la última carga de cada tabla."""
+    conn = connect_to_postgres(**db_params)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT table_name, sha256 FROM load_manifest")
+            return dict(cursor.fetchall())
+    finally:
+        conn.close()
+
+# Función para añadir un archivo CSV a una tabla y registrarlo en el manifiesto
+def append_table(db_params, table_name, file_path, digest, chunk_bytes, chunk_workers):
+    """
+    Añade las filas de un archivo CSV a la tabla activa y guarda su hash en
+    load_manifest, para que otra ejecución con el mismo archivo lo omita.
+    
+    La marca de agua de la recarga no se modifica: las filas añadidas tienen
+    ingest_id nuevo y una recarga posterior las trata como filas ingeridas.
+    
+    Returns:
+        Número de filas cargadas
+    """
+    rows = load_table(db_params, table_name, file_path, chunk_bytes, chunk_workers)
+    conn = connect_to_postgres(**db_params)
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO load_manifest (table_name, file_path, sha256, row_count)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (table_name) DO UPDATE SET
+                        file_path = EXCLUDED.file_path, sha256 = EXCLUDED.sha256,
+                        row_count = EXCLUDED.row_count, loaded_at = now()
+                """, (table_name, file_path, digest, rows))
+    finally:
+        conn.close()
+    return rows
+
+# Función para cargar todas las tablas en paralelo
+def load_tables_parallel(db_params, data_files, reload=True):
+    """
+    Carga los archivos CSV de todas las tablas a la vez, cada tabla en su
+    propia conexión.
+    
+    Por defecto cada tabla se sustituye por el contenido de su archivo a
+    través de su tabla de staging, conservando las filas ingeridas por la
+    API; en una base de datos nueva la marca de agua es 0 y la recarga
+    equivale a la carga inicial. Con `reload=False` las filas se añaden a las
+    tablas activas. En ambos modos los archivos cuyo hash coincide con el del
+    manifiesto se omiten, así que ejecutar el cargador varias veces no
+    duplica filas.
+    
+    Args:
+        db_params: Parámetros de conexión
+        data_files: Diccionario {tabla: ruta del CSV}
+        reload: Recargar mediante las tablas de staging (por defecto) o añadir filas
+        
+    Returns:
+        Diccionario {tabla: filas cargadas} con las tablas cargadas correctamente
+    """
+    chunk_bytes = int(os.environ.get("LOAD_CHUNK_BYTES", str(256 * 1024 * 1024)))
+    chunk_workers = int(os.environ.get("LOAD_CHUNK_WORKERS", "4"))
+    lock_timeout = os.environ.get("LOAD_SWAP_LOCK_TIMEOUT", "5s")
+
+    loaded = {}
+    existing = {table: path for table, path in data_files.items() if os.path.exists(path)}
+    for table, path in data_files.items():
+        if table not in existing:
+            print(f"El archivo {path} no existe. Se omite la tabla '{table}'.")
+
+    manifest = get_manifest(db_params)
+    digests = {}
+    for table, path in list(existing.items()):
+        digests[table] = file_sha256(path)
+        if manifest.get(table) == digests[table]:
+            print(f"El archivo {path} no ha cambiado. Se omite la tabla '{table}'.")
+            del existing[table]
+
+    # Almacenamiento compacto: registrar antes de cargar las etiquetas nuevas de cada CSV
+    if existing:
+        conn = connect_to_postgres(**db_params)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                for table, path in existing.items():
+                    ensure_csv_labels(cursor, table, path)
+        finally:
+            conn.close()
+
+    with ThreadPoolExecutor(max_workers=max(1, len(existing))) as executor:
+        futures = {}
+        for table, path in existing.items():
+            if reload:
+                future = executor.submit(reload_table, db_params, table, path, digests[table],
+                                         chunk_bytes, chunk_workers, lock_timeout)
+            else:
+                future = executor.submit(append_table, db_params, table, path, digests[table],
+                                         chunk_bytes, chunk_workers)
+            futures[future] = table
+        for future in as_completed(futures):
+            table = futures[future]
+            try:
+                loaded[table] = future.result()
+                print(f"Datos cargados exitosamente en la tabla '{table}' desde '{existing[table]}'.")
+            except Exception as e:
+                print(f"Error al cargar datos en la tabla {table} desde CSV: {e}")
+    return loaded
 
 # Función principal
 def main():
@@ -290,9 +1721,16 @@ def main():
     Función principal que configura la base de datos PostgreSQL.
     
     1. Establece conexión con PostgreSQL
-    2. Crea las tablas necesarias
-    3. Carga datos de archivos CSV si están disponibles, o inserta datos de muestra
-    4. Ejecuta consultas de prueba
+    2. Crea las tablas necesarias, aplica las migraciones del esquema y
+       particiona objects/features según OBJECTS_PARTITIONING/FEATURES_PARTITIONING
+    3. Recarga las tablas cuyos archivos CSV cambiaron (o, con LOAD_MODE=append,
+       añade sus filas), o inserta datos de muestra si no hay archivos
+    4. Convierte objects/features al almacenamiento compacto si STORAGE_MODE=compact
+    5. Mantiene las particiones (claves nuevas, meses siguientes y retención)
+    6. Ejecuta consultas de prueba
+    
+    Con --rebuild-object-counts solo aplica las migraciones y reconstruye la
+    tabla resumen object_counts.
     """
     # Parámetros de conexión
     host = os.environ.get("DB_HOST", "postgres")  # Nombre del servicio en Docker
@@ -301,12 +1739,13 @@ def main():
     password = os.environ.get("DB_PASSWORD", "postgres")
     dbname = os.environ.get("DB_NAME", "videodata")
 
-    # Rutas relativas de los archivos CSV
+    # Rutas de los archivos CSV (DATA_DIR permite cargar p. ej. los datos de generate_data.py)
     base_dir = os.path.dirname(os.path.abspath(__file__))
+    data_dir = os.environ.get("DATA_DIR", os.path.join(base_dir, "data_sd"))
     data_files = {
-        "objects": os.path.join(base_dir, "data_sd", "objects_data.csv"),
-        "scenarios": os.path.join(base_dir, "data_sd", "scenarios_data.csv"),
-        "features": os.path.join(base_dir, "data_sd", "features_data.csv"),
+        "objects": os.path.join(data_dir, "objects_data.csv"),
+        "scenarios": os.path.join(data_dir, "scenarios_data.csv"),
+        "features": os.path.join(data_dir, "features_data.csv"),
     }
 
     # Intentar crear la base de datos si no existe
@@ -325,19 +1764,78 @@ def main():
     print("Creando tablas...")
     create_tables(cursor)
 
-    # Verificar si se pueden cargar datos desde archivos CSV
-    csv_data_loaded = False
-    
-    # Cargar datos en las tablas desde archivos CSV si existen
+    # Aplicar migraciones antes de la carga
+    print("Aplicando migraciones del esquema...")
+    try:
+        version = run_migrations(conn)
+        print(f"Esquema en la versión {version}.")
+    except Exception as e:
+        print(f"Error al aplicar las migraciones: {e}")
+        sys.exit(1)
+
+    # Reconstrucción completa de la tabla resumen del tipo 3 (recuperación):
+    #   python deploy_postgres.py --rebuild-object-counts
+    if "--rebuild-object-counts" in sys.argv[1:]:
+        print("Reconstruyendo object_counts...")
+        conn.autocommit = False
+        with conn:
+            with conn.cursor() as rebuild_cursor:
+                # Bloquear las escrituras en objects mientras se recalculan los conteos
+                rebuild_cursor.execute("LOCK TABLE objects IN SHARE MODE")
+                groups = rebuild_object_counts(rebuild_cursor)
+                rebuild_cursor.execute("ANALYZE object_counts")
+        conn.autocommit = True
+        print(f"object_counts reconstruida: {groups} grupos.")
+        bump_data_version(cursor)
+        cursor.close()
+        conn.close()
+        return
+
+    # Particionado opcional de objects y features (none, list o range)
+    for table in ("objects", "features"):
+        scheme = os.environ.get(f"{table.upper()}_PARTITIONING", "none").lower()
+        try:
+            partition_table(conn, table, scheme)
+        except Exception as e:
+            print(f"Error al particionar la tabla {table}: {e}")
+            sys.exit(1)
+
+    # Cargar datos en las tablas desde archivos CSV si existen (tablas en paralelo)
+    reload = os.environ.get("LOAD_MODE", "reload").lower() != "append"
     print("Intentando cargar datos desde archivos CSV...")
-    for table, file_path in data_files.items():
-        if load_data_from_csv(cursor, table, file_path):
-            csv_data_loaded = True
+    db_params = {"host": host, "port": port, "user": user, "password": password, "dbname": dbname}
+    load_tables_parallel(db_params, data_files, reload=reload)
     
-    # Si no se cargaron datos desde CSV, insertar datos de muestra
-    if not csv_data_loaded:
-        print("No se encontraron archivos CSV válidos. Insertando datos de muestra...")
-        insert_sample_data(cursor)
+    # Si no hay archivos CSV y la base de datos está vacía, insertar datos de muestra
+    if not any(os.path.exists(path) for path in data_files.values()):
+        if not execute_query(cursor, "SELECT 1 FROM objects LIMIT 1"):
+            print("No se encontraron archivos CSV válidos. Insertando datos de muestra...")
+            insert_sample_data(cursor)
+
+    # Almacenamiento compacto opcional (STORAGE_MODE=compact), tras la carga
+    if os.environ.get("STORAGE_MODE", "standard").lower() == "compact":
+        sample = execute_query(cursor, "SELECT object_name::text FROM objects LIMIT 1")
+        before = storage_report(cursor, sample[0][0]) if sample else None
+        converted = [compact_table(cursor, table) for table in COMPACT_COLUMNS]
+        if before and any(converted):
+            print_storage_report(before, storage_report(cursor, sample[0][0]))
+
+    # Mantenimiento de particiones: claves nuevas, meses siguientes y retención
+    for table in ("objects", "features"):
+        if get_partition_key(cursor, table) is None:
+            continue
+        split_default_partition(cursor, table)
+        create_upcoming_partitions(cursor, table)
+        drop_expired_partitions(cursor, table, int(os.environ.get(f"{table.upper()}_RETENTION_MONTHS", "0")))
+
+    # Invalidar la caché de la API tras la carga
+    bump_data_version(cursor)
+
+    # Comprobar que la consulta tipo 2 solo lee las particiones necesarias
+    if get_partition_key(cursor, "objects") is not None:
+        sample = execute_query(cursor, "SELECT object_name FROM objects LIMIT 1")
+        if sample:
+            report_partition_pruning(cursor, sample[0][0])
 
     # Consultas de prueba
     test_queries = [
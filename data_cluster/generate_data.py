@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+import os
+import csv
+import sys
+import time
+import struct
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+
+# Columnas de cada archivo, en el mismo orden que los CSV de data_sd
+OBJECT_COLUMNS = ["object_name", "video_name", "x1", "y1", "x2", "y2", "rgb_color", "proximity", "sec"]
+SCENARIO_COLUMNS = ["video_name", "environment_type", "description", "weather", "time_of_day",
+                    "terrain", "crowd_level", "lighting"]
+FEATURE_COLUMNS = ["video_name", "sec", "object_name", "description", "color1", "color2",
+                   "size", "orientation", "type"]
+
+# Videos generados por bloque: cada bloque usa su propia semilla derivada,
+# así que el resultado no depende del número de procesos
+VIDEOS_PER_CHUNK = 2000
+
+# Desplazamiento máximo en píxeles que se aplica a cada esquina de un bounding box de muestra
+BBOX_JITTER = 20
+
+# Cabecera y fin del formato binario de COPY de PostgreSQL
+COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+COPY_BINARY_TRAILER = struct.pack(">h", -1)
+_INT4 = struct.Struct(">ii")
+_BBOX = struct.Struct(">iiiiiiii")
+
+# Función para leer un CSV como lista de diccionarios
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+# Función para aprender las distribuciones de los CSV de muestra
+def learn_model(data_dir):
+    """
+    Aprende de los CSV de muestra las distribuciones que se reproducen:
+
+    - escenarios: filas completas (el entorno, el clima y la descripción van juntos)
+    - duración de cada video (último segundo con detecciones)
+    - segundos con detecciones por video y detecciones por segundo
+    - detecciones: filas completas (clase, color, proximidad y bounding box
+      van juntos, con el orden de esquinas tal como llega de los detectores)
+    - descripciones por clase de objeto y cuántas hay por detección
+
+    Returns:
+        Diccionario con los valores y pesos de cada distribución
+    """
+    objects = read_csv(os.path.join(data_dir, "objects_data.csv"))
+    scenarios = read_csv(os.path.join(data_dir, "scenarios_data.csv"))
+    features = read_csv(os.path.join(data_dir, "features_data.csv"))
+    if not objects or not scenarios:
+        raise ValueError(f"Faltan datos de muestra en {data_dir}")
+
+    seconds = {}
+    per_second = {}
+    for row in objects:
+        seconds.setdefault(row["video_name"], set()).add(int(row["sec"]))
+        key = (row["video_name"], row["sec"])
+        per_second[key] = per_second.get(key, 0) + 1
+
+    # Diccionarios de cadenas: cada columna de texto se codifica como índice
+    strings = {}
+    def code(value):
+        return strings.setdefault(value, len(strings))
+
+    object_rows = np.array([
+        [code(row["object_name"]), code(row["rgb_color"]), code(row["proximity"]),
+         int(row["x1"]), int(row["y1"]), int(row["x2"]), int(row["y2"])]
+        for row in objects
+    ], dtype=np.int64)
+    scenario_rows = np.array([[code(row[column]) for column in SCENARIO_COLUMNS[1:]] for row in scenarios],
+                             dtype=np.int64)
+    feature_rows = np.array([[code(row[column]) for column in FEATURE_COLUMNS[2:]] for row in features],
+                            dtype=np.int64).reshape(len(features), len(FEATURE_COLUMNS) - 2)
+
+    # Descripciones por detección de cada clase (0 si la clase no tiene ninguna)
+    object_counts = np.bincount(object_rows[:, 0], minlength=len(strings))
+    feature_counts = np.bincount(feature_rows[:, 0], minlength=len(strings)) if len(features) else \
+        np.zeros(len(strings), dtype=np.int64)
+    feature_rate = np.where(object_counts > 0, feature_counts / np.maximum(object_counts, 1), 0.0)
+
+    # Filas de features de cada clase, ordenadas para elegir por rango
+    order = np.argsort(feature_rows[:, 0], kind="stable") if len(features) else np.array([], dtype=np.int64)
+    feature_rows = feature_rows[order]
+    feature_offsets = np.searchsorted(feature_rows[:, 0], np.arange(len(strings) + 1)) if len(features) else \
+        np.zeros(len(strings) + 1, dtype=np.int64)
+
+    return {
+        "strings": [value for value, _ in sorted(strings.items(), key=lambda item: item[1])],
+        "object_rows": object_rows,
+        "scenario_rows": scenario_rows,
+        "feature_rows": feature_rows,
+        "feature_offsets": feature_offsets,
+        "feature_rate": feature_rate,
+        "durations": np.array([max(secs) + 1 for secs in seconds.values()], dtype=np.int64),
+        "active_seconds": np.array([len(secs) for secs in seconds.values()], dtype=np.int64),
+        "per_second": np.array(list(per_second.values()), dtype=np.int64),
+        "frame_width": int(object_rows[:, [3, 5]].max()),
+        "frame_height": int(object_rows[:, [4, 6]].max()),
+    }
+
+# Función para estimar los videos necesarios para un número de filas de objects
+def videos_for_rows(model, rows):
+    expected = model["active_seconds"].mean() * model["per_second"].mean()
+    return max(int(np.ceil(rows / expected)), 1)
+
+# Función para generar las columnas de un bloque de videos
+def generate_chunk(model, seed, chunk, first_video, videos):
+    """
+    Genera las filas de `videos` videos consecutivos como arrays de índices.
+
+    Args:
+        model: Distribuciones aprendidas por learn_model
+        seed: Semilla global
+        chunk: Número de bloque (forma parte de la semilla del bloque)
+        first_video: Índice del primer video del bloque
+        videos: Número de videos del bloque
+
+    Returns:
+        Diccionario con los arrays de escenarios, objetos y features
+    """
+    rng = np.random.default_rng([seed, chunk])
+    video_ids = np.arange(first_video, first_video + videos)
+
+    # Escenario y duración de cada video
+    scenarios = model["scenario_rows"][rng.integers(0, len(model["scenario_rows"]), videos)]
+    durations = rng.choice(model["durations"], videos)
+
+    # Segundos con detecciones de cada video (pueden repetirse, como en los datos reales)
+    active = rng.choice(model["active_seconds"], videos)
+    slot_video = np.repeat(np.arange(videos), active)
+    slot_sec = (rng.random(len(slot_video)) * durations[slot_video]).astype(np.int64)
+
+    # Detecciones por segundo y filas completas de muestra con un pequeño desplazamiento
+    per_slot = rng.choice(model["per_second"], len(slot_video))
+    row_slot = np.repeat(np.arange(len(slot_video)), per_slot)
+    sample = model["object_rows"][rng.integers(0, len(model["object_rows"]), len(row_slot))]
+    bbox = sample[:, 3:7] + rng.integers(-BBOX_JITTER, BBOX_JITTER + 1, (len(row_slot), 4))
+    bbox[:, [0, 2]] = np.clip(bbox[:, [0, 2]], 0, model["frame_width"])
+    bbox[:, [1, 3]] = np.clip(bbox[:, [1, 3]], 0, model["frame_height"])
+    objects = {
+        "object": sample[:, 0], "color": sample[:, 1], "proximity": sample[:, 2], "bbox": bbox,
+        "video": video_ids[slot_video[row_slot]], "sec": slot_sec[row_slot],
+    }
+
+    # Descripciones de las detecciones según la tasa de su clase
+    per_object = rng.poisson(model["feature_rate"][objects["object"]])
+    feature_source = np.repeat(np.arange(len(per_object)), per_object)
+    feature_class = objects["object"][feature_source]
+    offsets = model["feature_offsets"]
+    first, count = offsets[feature_class], offsets[feature_class + 1] - offsets[feature_class]
+    picked = first + (rng.random(len(feature_source)) * count).astype(np.int64)
+    features = {
+        "video": objects["video"][feature_source], "sec": objects["sec"][feature_source],
+        "rows": model["feature_rows"][picked] if len(picked) else np.zeros((0, len(FEATURE_COLUMNS) - 2), np.int64),
+    }
+
+    return {"scenarios": {"video": video_ids, "rows": scenarios}, "objects": objects, "features": features}
+
+# Función para escapar un valor como campo CSV
+def csv_field(value):
+    if any(char in value for char in ',"\n\r') or value != value.strip():
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+# Función para codificar un valor de texto como campo del formato binario de COPY
+def binary_field(value):
+    data = value.encode("utf-8")
+    return struct.pack(">i", len(data)) + data
+
+# Función para obtener el nombre de un video generado
+def video_name(seed, index):
+    return f"SYN_{seed}_{index:09d}"
+
+# Función para convertir un bloque en texto CSV o binario de COPY
+def encode_chunk(model, seed, data, binary):
+    """
+    Codifica las filas de un bloque en el formato de salida.
+
+    Returns:
+        Diccionario {tabla: bytes}
+    """
+    strings = model["strings"]
+    if binary:
+        values = [binary_field(value) for value in strings]
+        videos = {index: binary_field(video_name(seed, index)) for index in data["scenarios"]["video"].tolist()}
+
+        scenarios = b"".join(
+            b"".join([struct.pack(">h", len(SCENARIO_COLUMNS)), videos[video]] + [values[c] for c in row])
+            for video, row in zip(data["scenarios"]["video"].tolist(), data["scenarios"]["rows"].tolist())
+        )
+        objects = data["objects"]
+        count = struct.pack(">h", len(OBJECT_COLUMNS))
+        objects_out = b"".join(
+            b"".join((count, values[name], videos[video],
+                      _BBOX.pack(4, x1, 4, y1, 4, x2, 4, y2), values[color], values[proximity], _INT4.pack(4, sec)))
+            for name, video, (x1, y1, x2, y2), color, proximity, sec in zip(
+                objects["object"].tolist(), objects["video"].tolist(), objects["bbox"].tolist(),
+                objects["color"].tolist(), objects["proximity"].tolist(), objects["sec"].tolist())
+        )
+        features = data["features"]
+        count = struct.pack(">h", len(FEATURE_COLUMNS))
+        features_out = b"".join(
+            b"".join([count, videos[video], _INT4.pack(4, sec)] + [values[c] for c in row])
+            for video, sec, row in zip(features["video"].tolist(), features["sec"].tolist(),
+                                       features["rows"].tolist())
+        )
+        return {"scenarios": scenarios, "objects": objects_out, "features": features_out}
+
+    values = [csv_field(value) for value in strings]
+    videos = {index: video_name(seed, index) for index in data["scenarios"]["video"].tolist()}
+
+    scenarios = "".join(
+        videos[video] + "," + ",".join(values[c] for c in row) + "\n"
+        for video, row in zip(data["scenarios"]["video"].tolist(), data["scenarios"]["rows"].tolist())
+    )
+    objects = data["objects"]
+    objects_out = "".join(
+        f"{values[name]},{videos[video]},{x1},{y1},{x2},{y2},{values[color]},{values[proximity]},{sec}\n"
+        for name, video, (x1, y1, x2, y2), color, proximity, sec in zip(
+            objects["object"].tolist(), objects["video"].tolist(), objects["bbox"].tolist(),
+            objects["color"].tolist(), objects["proximity"].tolist(), objects["sec"].tolist())
+    )
+    features = data["features"]
+    features_out = "".join(
+        f"{videos[video]},{sec}," + ",".join(values[c] for c in row) + "\n"
+        for video, sec, row in zip(features["video"].tolist(), features["sec"].tolist(),
+                                   features["rows"].tolist())
+    )
+    return {"scenarios": scenarios.encode("utf-8"), "objects": objects_out.encode("utf-8"),
+            "features": features_out.encode("utf-8")}
+
+# Estado de cada proceso de generación (se fija una vez con init_worker)
+_worker = {}
+
+def init_worker(model, seed, binary):
+    _worker.update(model=model, seed=seed, binary=binary)
+
+def build_chunk(args):
+    chunk, first_video, videos = args
+    data = generate_chunk(_worker["model"], _worker["seed"], chunk, first_video, videos)
+    rows = {"scenarios": videos, "objects": len(data["objects"]["sec"]), "features": len(data["features"]["sec"])}
+    return encode_chunk(_worker["model"], _worker["seed"], data, _worker["binary"]), rows
+
+# Función para generar el conjunto de datos completo
+def generate(data_dir, output_dir, videos, seed, binary, workers):
+    """
+    Genera los archivos de scenarios, objects y features de `videos` videos.
+    Los bloques se generan en paralelo y se escriben en orden, de modo que
+    la misma semilla y el mismo número de videos producen los mismos archivos.
+
+    Returns:
+        Diccionario {tabla: filas escritas}
+    """
+    model = learn_model(data_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    extension = "bin" if binary else "csv"
+    headers = {"scenarios": SCENARIO_COLUMNS, "objects": OBJECT_COLUMNS, "features": FEATURE_COLUMNS}
+    files = {table: open(os.path.join(output_dir, f"{table}_data.{extension}"), "wb") for table in headers}
+    totals = dict.fromkeys(headers, 0)
+
+    try:
+        for table, f in files.items():
+            f.write(COPY_BINARY_HEADER if binary else (",".join(headers[table]) + "\n").encode("utf-8"))
+
+        chunks = [(chunk, first, min(VIDEOS_PER_CHUNK, videos - first))
+                  for chunk, first in enumerate(range(0, videos, VIDEOS_PER_CHUNK))]
+        start = time.time()
+        with Pool(workers, initializer=init_worker, initargs=(model, seed, binary)) as pool:
+            for done, (encoded, rows) in enumerate(pool.imap(build_chunk, chunks), start=1):
+                for table, data in encoded.items():
+                    files[table].write(data)
+                    totals[table] += rows[table]
+                elapsed = time.time() - start
+                print(f"Bloque {done}/{len(chunks)}: {totals['objects']:,} filas de objects, "
+                      f"{totals['objects'] / max(elapsed, 1e-9):,.0f} filas/s")
+
+        if binary:
+            for f in files.values():
+                f.write(COPY_BINARY_TRAILER)
+    finally:
+        for f in files.values():
+            f.close()
+    return totals
+
+def main():
+    """
+    Genera un conjunto de datos sintético con el mismo esquema que los CSV de
+    data_sd y las distribuciones aprendidas de ellos (clases de objeto, colores,
+    proximidad, segundos, tamaños de bounding box y densidad por video).
+
+    Los CSV resultantes se cargan con deploy_postgres.py indicando DATA_DIR;
+    los archivos binarios se cargan con COPY ... FROM ... WITH (FORMAT binary).
+    """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Generador de datos sintéticos a partir de los CSV de muestra')
+    parser.add_argument('--rows', type=int, default=1000000,
+                        help='Filas aproximadas de objects (se ignora si se indica --videos)')
+    parser.add_argument('--videos', type=int, default=None, help='Número exacto de videos')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla (mismos parámetros, mismos archivos)')
+    parser.add_argument('--format', choices=['csv', 'binary'], default='csv',
+                        help='CSV o formato binario de COPY')
+    parser.add_argument('--input-dir', type=str, default=os.path.join(base_dir, 'data_sd'),
+                        help='Directorio con los CSV de muestra')
+    parser.add_argument('--output-dir', type=str, default=os.path.join(base_dir, 'data_synthetic'),
+                        help='Directorio de salida')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Procesos de generación')
+    args = parser.parse_args()
+
+    if os.path.abspath(args.input_dir) == os.path.abspath(args.output_dir):
+        print("El directorio de salida no puede ser el de los datos de muestra.")
+        sys.exit(1)
+
+    videos = args.videos or videos_for_rows(learn_model(args.input_dir), args.rows)
+    print(f"Generando {videos:,} videos en {args.output_dir} (semilla {args.seed}, formato {args.format})...")
+    start = time.time()
+    totals = generate(args.input_dir, args.output_dir, videos, args.seed, args.format == 'binary', args.workers)
+    elapsed = time.time() - start
+    print(f"Generadas {totals['objects']:,} filas de objects, {totals['features']:,} de features y "
+          f"{totals['scenarios']:,} de scenarios en {elapsed:.1f} s")
+
+if __name__ == "__main__":
+    main()
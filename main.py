@@ -1,9 +1,18 @@
 # main.py
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.api import router
 import uvicorn
 import os
 from app.logger_config import setup_logger
+from app.db import init_pool, close_pool, get_pool
+from app.queries import get_plan_cache_stats, configure_label_columns
+from app.cache import get_result_cache
+from app.notifications import start_dispatcher, stop_dispatcher, get_dispatcher, get_transport_stats
+from app.alert_engine import start_rule_scheduler, stop_rule_scheduler
+from app.ingest import start_ingest_buffer, stop_ingest_buffer, get_ingest_buffer
+from app.columnar import start_columnar_engine, stop_columnar_engine, get_columnar_engine
+from app.metrics import render_metrics, MetricsMiddleware
 
 # Configurar el logger
 logger = setup_logger(__name__)
@@ -18,6 +27,40 @@ app = FastAPI(
 # Incluir el router de la API
 app.include_router(router)
 
+# Latencia por endpoint y peticiones en curso para /metrics
+app.add_middleware(MetricsMiddleware)
+
+@app.on_event("startup")
+async def startup():
+    """
+    Crea el pool de conexiones a PostgreSQL y arranca la cola de envío de alertas,
+    el planificador de reglas de alerta continuas, el buffer de ingesta y,
+    si está activado, el motor columnar
+    """
+    init_pool()
+    # Adaptar las consultas si objects usa el almacenamiento compacto
+    try:
+        with get_pool().connection() as conn:
+            configure_label_columns(conn)
+    except Exception as e:
+        logger.warning("No se pudo detectar el almacenamiento de objects: %s", e)
+    await start_dispatcher()
+    await start_rule_scheduler()
+    await start_ingest_buffer()
+    await start_columnar_engine()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """
+    Escribe la ingesta pendiente, envía las alertas pendientes y cierra el pool
+    de conexiones al detener la aplicación
+    """
+    await stop_columnar_engine()
+    await stop_ingest_buffer()
+    await stop_rule_scheduler()
+    await stop_dispatcher()
+    close_pool()
+
 @app.get("/")
 async def root():
     """
@@ -32,6 +75,64 @@ async def healthcheck():
     """
     return {"status": "healthy"}
 
+@app.get("/pool_stats")
+async def pool_stats():
+    """
+    Endpoint con las estadísticas del pool de conexiones (en uso, inactivas, tiempos de espera)
+    """
+    return get_pool().stats()
+
+@app.get("/alert_dispatch_stats")
+async def alert_dispatch_stats():
+    """
+    Endpoint con las métricas de la cola de envío de alertas (encoladas, enviadas, fallos)
+    y del transporte SMTP (sesiones abiertas, reconexiones)
+    """
+    return {**get_dispatcher().get_stats(), "smtp": get_transport_stats()}
+
+@app.get("/ingest_stats")
+async def ingest_stats():
+    """
+    Endpoint con las métricas del buffer de ingesta (filas aceptadas, escritas, lotes)
+    """
+    return get_ingest_buffer().get_stats()
+
+@app.get("/columnar_stats")
+async def columnar_stats():
+    """
+    Endpoint con las métricas del motor columnar en memoria (filas, memoria, refrescos)
+    """
+    engine = get_columnar_engine()
+    if engine is None:
+        return {"enabled": False}
+    return {"enabled": True, **engine.get_stats()}
+
+@app.get("/query_stats")
+async def query_stats():
+    """
+    Endpoint con los contadores de sentencias preparadas (preparaciones frente a reutilizaciones)
+    """
+    return get_plan_cache_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Endpoint con las métricas en el formato de texto de Prometheus: latencia por
+    endpoint, por tipo de consulta y por fase, filas devueltas, alertas activadas,
+    correos enviados, uso del pool y peticiones en curso
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache_stats")
+async def cache_stats():
+    """
+    Endpoint con las métricas de la caché de resultados (aciertos, fallos, expulsiones)
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
 # Iniciar la aplicación si se ejecuta directamente
 if __name__ == "__main__":
     # Obtener puerto de variable de entorno o usar el predeterminado 8000
@@ -40,7 +141,7 @@ if __name__ == "__main__":
     # Configurar host para permitir conexiones externas en Docker
     host = os.environ.get("HOST", "0.0.0.0")
     
-    logger.info(f"Iniciando servidor en {host}:{port}")
+    logger.info("Iniciando servidor en %s:%s", host, port)
     
     # Iniciar el servidor
     uvicorn.run(app, host=host, port=port)
\ No newline at end of file